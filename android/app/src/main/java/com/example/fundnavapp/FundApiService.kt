@@ -1,21 +1,39 @@
 package com.example.fundnavapp
 
+import com.google.gson.JsonElement
+import com.google.gson.JsonObject
+import com.google.gson.JsonParser
+import okhttp3.Cache
 import okhttp3.OkHttpClient
 import okhttp3.Request
 import okhttp3.Response
+import java.io.File
 import java.io.IOException
 import java.util.concurrent.TimeUnit
 
-class FundApiService {
+// backendUrl 为空时直接抓取东财/新浪；配置后（python -m src.api_server）改走后端接口
+class FundApiService(
+    private val backendUrl: String = BuildConfig.FUND_API_URL,
+    cacheDir: File? = null
+) {
 
     private val okHttpClient: OkHttpClient = OkHttpClient.Builder()
         .connectTimeout(10, TimeUnit.SECONDS)
         .readTimeout(10, TimeUnit.SECONDS)
         .writeTimeout(10, TimeUnit.SECONDS)
+        .apply {
+            // HTTP缓存：后端返回 ETag，过期后以 If-None-Match 重新校验（304 无响应体）
+            if (cacheDir != null) cache(Cache(File(cacheDir, "fund_api"), 5L * 1024 * 1024))
+        }
         .build()
 
+    val usesBackend: Boolean
+        get() = backendUrl.isNotEmpty()
+
     // 获取基金持仓数据
     fun getFundHoldings(fundCode: String): FundHoldingsResponse? {
+        if (usesBackend) return getBackendHoldings(fundCode)
+
         val url = "http://fundf10.eastmoney.com/FundArchivesDatas.aspx"
         val params = "type=jjcc&code=$fundCode&topline=10"
         val fullUrl = "$url?$params"
@@ -262,6 +280,76 @@ class FundApiService {
         return NavEstimation(estimatedChange, totalWeight, details)
     }
 
+    // 估算单只基金：后端模式一次请求，否则抓取实时行情后本地估算
+    fun getFundEstimation(fundCode: String, holdings: List<Holding>): NavEstimation? {
+        return if (usesBackend) getEstimates(listOf(fundCode))[fundCode] else estimateNavChange(holdings)
+    }
+
+    // 批量估算（仅后端模式）：所有基金一次请求
+    fun getEstimates(fundCodes: List<String>): Map<String, NavEstimation> {
+        val results = mutableMapOf<String, NavEstimation>()
+        if (!usesBackend || fundCodes.isEmpty()) return results
+
+        val body = getBackendJson("/api/v1/estimates?codes=${fundCodes.joinToString(",")}&details=1") ?: return results
+        for (element in body.getAsJsonArray("funds")) {
+            val fund = element.asJsonObject
+            if (!fund.get("ok").asBoolean) continue
+            val details = fund.getAsJsonArray("details").map {
+                val item = it.asJsonObject
+                HoldingDetail(
+                    item.get("code").asString,
+                    item.get("name").asString,
+                    item.get("weight").asDouble,
+                    item.get("price").doubleOrZero(),
+                    item.get("change").doubleOrZero()
+                )
+            }
+            results[fund.get("code").asString] = NavEstimation(
+                fund.get("change").doubleOrZero(),
+                fund.get("weight").doubleOrZero(),
+                details
+            )
+        }
+        return results
+    }
+
+    private fun getBackendHoldings(fundCode: String): FundHoldingsResponse? {
+        val body = getBackendJson("/api/v1/funds/$fundCode/holdings") ?: return null
+        val holdings = body.getAsJsonArray("holdings").map {
+            val item = it.asJsonObject
+            Holding(
+                item.get("code").asString,
+                item.get("name").asString,
+                item.get("weight").asDouble,
+                item.get("quote_code").asString
+            )
+        }
+        return FundHoldingsResponse(body.get("name").asString, holdings, body.get("report_date").asString)
+    }
+
+    private fun getBackendJson(path: String): JsonObject? {
+        // OkHttp 自动携带 Accept-Encoding: gzip 并透明解压
+        val request = Request.Builder()
+            .url(backendUrl.trimEnd('/') + path)
+            .build()
+
+        try {
+            okHttpClient.newCall(request).execute().use { response ->
+                val responseBody = response.body?.string()
+                if (response.isSuccessful && responseBody != null) {
+                    return JsonParser.parseString(responseBody).asJsonObject
+                }
+            }
+        } catch (e: Exception) {
+            e.printStackTrace()
+        }
+
+        return null
+    }
+
+    private fun JsonElement?.doubleOrZero(): Double =
+        if (this == null || isJsonNull) 0.0 else asDouble
+
     // 数据类
     data class FundHoldingsResponse(
         val fundName: String,
@@ -36,7 +36,7 @@ class FundDetailActivity : AppCompatActivity() {
     private lateinit var navTrendChart: LineChart
     private lateinit var realtimeChart: LineChart
     private lateinit var refreshButton: android.widget.Button
-    private val fundApiService = FundApiService()
+    private val fundApiService by lazy { FundApiService(cacheDir = cacheDir) }
 
     override fun onCreate(savedInstanceState: Bundle?) {
         super.onCreate(savedInstanceState)
@@ -106,9 +106,11 @@ class FundDetailActivity : AppCompatActivity() {
             try {
                 // 从API获取基金持仓数据
                 val holdingsResponse = fundApiService.getFundHoldings(fundCode)
-                if (holdingsResponse != null) {
+                val estimation = holdingsResponse?.let {
                     // 估算净值变化
-                    val estimation = fundApiService.estimateNavChange(holdingsResponse.holdings)
+                    fundApiService.getFundEstimation(fundCode, it.holdings)
+                }
+                if (holdingsResponse != null && estimation != null) {
                     val estimatedChange = estimation.estimatedChange
                     val estimatedNav = 1.2 * (1 + estimatedChange / 100) // 基础净值1.2
 
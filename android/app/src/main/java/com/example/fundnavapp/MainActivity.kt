@@ -22,7 +22,7 @@ class MainActivity : AppCompatActivity() {
     private lateinit var addButton: FloatingActionButton
     private lateinit var refreshButton: ImageButton
     private val fundRepository = FundRepository(this)
-    private val fundApiService = FundApiService()
+    private val fundApiService by lazy { FundApiService(cacheDir = cacheDir) }
 
     override fun onCreate(savedInstanceState: Bundle?) {
         super.onCreate(savedInstanceState)
@@ -111,14 +111,24 @@ class MainActivity : AppCompatActivity() {
     private fun loadFunds() {
         GlobalScope.launch(Dispatchers.IO) {
             val funds = fundRepository.getAllFunds()
+            // 后端模式：一次请求取回全部基金的估算
+            val backendEstimates = if (fundApiService.usesBackend) {
+                fundApiService.getEstimates(funds.map { it.fundCode })
+            } else {
+                emptyMap()
+            }
             // 为每个基金从API获取当日涨幅和当日收益
             val updatedFunds = funds.map {
                 try {
-                    // 从API获取基金持仓数据
-                    val holdingsResponse = fundApiService.getFundHoldings(it.fundCode)
-                    if (holdingsResponse != null && holdingsResponse.holdings.isNotEmpty()) {
-                        // 估算净值变化
-                        val estimation = fundApiService.estimateNavChange(holdingsResponse.holdings)
+                    val estimation = if (fundApiService.usesBackend) {
+                        backendEstimates[it.fundCode]
+                    } else {
+                        // 从API获取基金持仓数据并估算净值变化
+                        fundApiService.getFundHoldings(it.fundCode)
+                            ?.takeIf { response -> response.holdings.isNotEmpty() }
+                            ?.let { response -> fundApiService.estimateNavChange(response.holdings) }
+                    }
+                    if (estimation != null) {
                         val dailyChange = estimation.estimatedChange
                         // 使用BigDecimal进行精确计算，避免浮点数精度问题
                         val bdAmount = java.math.BigDecimal(it.currentAmount.toString())
@@ -1,114 +1,32 @@
 import streamlit as st
 import pandas as pd
+import altair as alt
 import time
 from datetime import datetime
 import logging
-import sqlite3
 import os
 
-from src.data_fetcher import get_fund_holdings, get_realtime_stock_prices, get_fund_history_nav
-from src.valuation import estimate_nav_change
-
-# Database setup
-db_path = 'funds.db'
-
-def init_db():
-    """Initialize the SQLite database and create tables if they don't exist."""
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    
-    # Create funds table with fund_code as unique key
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS funds (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        fund_code TEXT UNIQUE NOT NULL,
-        fund_name TEXT,
-        current_amount REAL NOT NULL,
-        current_holding_profit REAL NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    # Create index on fund_code for faster lookup
-    c.execute('CREATE INDEX IF NOT EXISTS idx_fund_code ON funds (fund_code)')
-    
-    conn.commit()
-    conn.close()
-
-# Initialize database on app start
-init_db()
-
-def get_all_funds():
-    """Get all funds from the database."""
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute('SELECT * FROM funds ORDER BY fund_code')
-    funds = [dict(row) for row in c.fetchall()]
-    conn.close()
-    return funds
+from src import fund_store
+from src.holdings_store import get_fund_holdings_cached, invalidate_holdings
+from src.importer import REPORT_COLUMNS, decode, failures_csv, import_positions
+from src.intraday_store import append_points, latest_trade_date, read_intraday, trading_results
+from src.market_hours import EDGE_INTERVAL, next_refresh_delay
+from src import metrics
+from src.history_store import load_fund_history, read_fund_history
+from src.pipeline import failed_result, refresh_funds
+from src.snapshot_store import get_collector_status, load_snapshots
 
 def add_fund(fund_code, current_amount, fund_name=''):
-    """Add a new fund to the database."""
-    # Get fund name from API if not provided
+    """Add a new fund to the database, looking its name up if not provided."""
     if not fund_name:
         try:
-            result_data = get_fund_holdings(fund_code)
+            result_data = get_fund_holdings_cached(fund_code)
             if result_data:
-                if len(result_data) == 3:
-                    fund_name = result_data[0]
-                else:
-                    fund_name = result_data[0]
+                fund_name = result_data[0]
         except Exception as e:
             logging.warning(f"Error fetching fund name for {fund_code}: {e}")
             # Keep empty fund name if API call fails
-    
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    try:
-        c.execute('''
-        INSERT OR REPLACE INTO funds (fund_code, fund_name, current_amount, current_holding_profit, updated_at)
-        VALUES (?, ?, ?, 0, CURRENT_TIMESTAMP)
-        ''', (fund_code, fund_name, current_amount))
-        conn.commit()
-        return True
-    except Exception as e:
-        logging.error(f"Error adding fund {fund_code}: {e}")
-        return False
-    finally:
-        conn.close()
-
-def delete_fund(fund_code):
-    """Delete a fund from the database."""
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    try:
-        c.execute('DELETE FROM funds WHERE fund_code = ?', (fund_code,))
-        conn.commit()
-        return True
-    except Exception as e:
-        logging.error(f"Error deleting fund {fund_code}: {e}")
-        return False
-    finally:
-        conn.close()
-
-def update_fund(fund_code, current_amount, current_holding_profit, fund_name=''):
-    """Update a fund in the database."""
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    try:
-        c.execute('''
-        UPDATE funds SET fund_name = ?, current_amount = ?, current_holding_profit = ?, updated_at = CURRENT_TIMESTAMP
-        WHERE fund_code = ?
-        ''', (fund_name, current_amount, current_holding_profit, fund_code))
-        conn.commit()
-        return True
-    except Exception as e:
-        logging.error(f"Error updating fund {fund_code}: {e}")
-        return False
-    finally:
-        conn.close()
+    return fund_store.add_fund(fund_code, current_amount, fund_name)
 
 # Configure page
 st.set_page_config(page_title="基金净值估算器", layout="wide")
@@ -123,8 +41,8 @@ st.sidebar.header("配置")
 with st.sidebar:
     st.subheader("基金管理")
     
-    # View all funds
-    funds = get_all_funds()
+    # View all funds (read once per rerun; the dashboard below uses the same rows)
+    funds = fund_store.get_all_funds()
     
     if funds:
         st.write("### 现有基金")
@@ -136,7 +54,7 @@ with st.sidebar:
                     st.write(f"**当前持有收益:** ¥{fund['current_holding_profit']:.2f}")
                 with col2:
                     if st.button(f"删除 {fund['fund_code']}", key=f"delete_{fund['fund_code']}"):
-                        if delete_fund(fund['fund_code']):
+                        if fund_store.delete_fund(fund['fund_code']):
                             st.success(f"基金 {fund['fund_code']} 已删除")
                             st.rerun()
                         else:
@@ -165,83 +83,97 @@ with st.sidebar:
             else:
                 st.error("请输入基金代码")
 
-auto_refresh = st.sidebar.checkbox("自动刷新 (每60秒)", value=False)
+    # Bulk import from CSV / broker exports
+    st.write("### 批量导入")
+    with st.form("import_funds_form", clear_on_submit=True):
+        import_file = st.file_uploader("持仓文件 (CSV / 券商导出)", type=['csv', 'txt', 'tsv'],
+                                       help="需含基金代码与持仓金额列，基金名称可选；缺少名称的基金会自动查询")
+        if st.form_submit_button("导入") and import_file is not None:
+            with st.spinner("正在校验并查询基金名称..."):
+                result = import_positions(decode(import_file.getvalue()))
+            # Kept across the rerun below so the report stays visible
+            st.session_state['import_report'] = result
+            st.rerun()
+    report = st.session_state.get('import_report')
+    if report:
+        st.success(f"已导入 {report['imported']} 只基金：新增 {len(report['added'])} 只，"
+                   f"更新 {len(report['updated'])} 只已持有基金的持仓金额（持有收益保留）")
+        if report['failures']:
+            st.warning(f"{len(report['failures'])} 行未导入")
+            st.dataframe(pd.DataFrame(report['failures'], columns=REPORT_COLUMNS), hide_index=True)
+            st.download_button("下载失败明细", failures_csv(report['failures']).encode('utf-8-sig'),
+                               file_name="import_failures.csv", mime="text/csv")
+
+auto_refresh = st.sidebar.checkbox("自动刷新 (按交易时段)", value=False,
+                                   help="开盘时每60秒，开收盘前后每15秒，休市时暂停到下次开盘前")
 refresh_btn = st.sidebar.button("立即刷新")
+if st.sidebar.button("重新拉取持仓", help="忽略本地持仓缓存，下次刷新时重新下载季报持仓"):
+    invalidate_holdings()
 
-# Main Logic
-from concurrent.futures import ThreadPoolExecutor, as_completed
+collector_status = get_collector_status()
+if collector_status and collector_status['active']:
+    last_run = datetime.fromtimestamp(collector_status['last_run_at']).strftime("%H:%M:%S")
+    st.sidebar.caption(f"数据来源：后台采集进程（最近一次 {last_run}）")
+else:
+    st.sidebar.caption("数据来源：当前页面实时抓取（运行 `python -m src.collector` 可切换为后台采集）")
+
+@st.cache_resource
+def start_metrics_endpoint():
+    # Once per server process, not per rerun
+    return metrics.start_configured_server()
+
+start_metrics_endpoint()
+metrics.enable(st.sidebar.checkbox("性能诊断", value=metrics.is_enabled(),
+                                   help="记录各阶段耗时、请求数、流量、缓存命中率与错误数"))
+diagnostics_panel = st.sidebar.empty()
+
+def render_diagnostics():
+    """Sidebar panel with this process's refresh metrics."""
+    if not metrics.is_enabled():
+        diagnostics_panel.empty()
+        return
+    snap = metrics.snapshot()
+    with diagnostics_panel.container():
+        with st.expander("诊断信息", expanded=True):
+            if snap['stages']:
+                st.dataframe(pd.DataFrame([
+                    {'阶段': stage, '次数': s['count'],
+                     '平均(ms)': s['avg'] * 1000 if s['avg'] is not None else None,
+                     '最大(ms)': s['max'] * 1000, '错误': int(s['errors'])}
+                    for stage, s in snap['stages'].items()
+                ]).style.format({'平均(ms)': "{:.1f}", '最大(ms)': "{:.1f}"}, na_rep="--"), hide_index=True)
+            else:
+                st.caption("暂无数据，刷新后显示。")
+
+            requests_by_host, bytes_by_host = {}, {}
+            for labels, value in snap['counters'].get('http_requests_total', []):
+                requests_by_host[labels['host']] = requests_by_host.get(labels['host'], 0) + value
+            for labels, value in snap['counters'].get('http_bytes_total', []):
+                bytes_by_host[labels['host']] = bytes_by_host.get(labels['host'], 0) + value
+            if requests_by_host:
+                st.dataframe(pd.DataFrame([
+                    {'主机': host, '请求': int(count), '流量(KB)': bytes_by_host.get(host, 0) / 1024,
+                     '限流': snap['hosts'].get(host, {}).get('throttled', 0),
+                     '并发上限': snap['hosts'].get(host, {}).get('concurrency_limit')}
+                    for host, count in requests_by_host.items()
+                ]).style.format({'流量(KB)': "{:.1f}"}), hide_index=True)
+
+            for cache, c in snap['cache'].items():
+                st.caption(f"缓存 {cache}：命中率 {c['ratio']:.0%}（{int(c['hits'])}/{int(c['hits'] + c['misses'])}）")
+            if collector_status and collector_status['active']:
+                st.caption("后台采集进程的指标请通过其 FUND_NAV_METRICS_PORT 端点查看。")
 
+            col1, col2 = st.columns(2)
+            col1.download_button("导出 Prometheus", metrics.render_prometheus(), file_name="fund_nav_metrics.prom",
+                                 mime="text/plain")
+            col2.button("清零", on_click=metrics.reset)
+
+# Main Logic
 @st.cache_data(ttl=3600)
 def fetch_history_cached(code, days):
-    return get_fund_history_nav(code, days)
-
-def process_single_fund(code, position_amount=10000.0):
-    """Background worker to fetch data for a single fund."""
-    try:
-        # 1. Fetch Holdings
-        result_data = get_fund_holdings(code)
-        
-        if not result_data:
-            return {
-                '基金代码': code,
-                '基金名称': '--',
-                '持仓日期': '--',
-                '状态': '获取持仓失败',
-                '估算涨跌': None,
-                '重仓股权重': None,
-                '持仓金额': position_amount,
-                '估算收益': None,
-                'Details': []
-            }
-            
-        # Unpack tuple
-        if len(result_data) == 3:
-             fund_name, holdings, report_date = result_data
-        else:
-             fund_name, holdings = result_data
-             report_date = "--"
-        
-        # 2. Fetch Prices
-        stock_fetch_codes = [h.get('fetch_code', h['code']) for h in holdings]
-        prices = get_realtime_stock_prices(stock_fetch_codes)
-        
-        # 3. Estimate
-        valuation = estimate_nav_change(holdings, prices)
-        
-        # 4. Calculate estimated profit
-        estimated_change = valuation['estimated_change']
-        estimated_profit = position_amount * (estimated_change / 100) if estimated_change is not None else None
-        
-        # 5. Fetch History (Last 365 days for flexibility)
-        # Cached to avoid heavy network io
-        history_df = fetch_history_cached(code, days=365)
-        
-        return {
-            '基金代码': code,
-            '基金名称': fund_name,
-            '持仓日期': report_date,
-            '状态': '成功',
-            '估算涨跌': estimated_change,
-            '重仓股权重': valuation['total_weight_used'],
-            '持仓金额': position_amount,
-            '估算收益': estimated_profit,
-            'Details': valuation['details'],
-            'History': history_df, # Add history
-            '更新时间': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-    except Exception as e:
-        logging.error(f"Error processing {code}: {e}")
-        return {
-            '基金代码': code,
-            '基金名称': 'Error',
-            '持仓日期': '--',
-            '状态': f'Error: {str(e)}',
-            '估算涨跌': None,
-            '重仓股权重': None,
-            '持仓金额': position_amount,
-            '估算收益': None,
-            'Details': []
-        }
+    # Incremental: usually a single page request on top of the local store.
+    # Runs on the pipeline's shared worker pool, so backfill pages go sequentially.
+    return load_fund_history(code, days, max_workers=1)
 
 def color_change(val):
     """Return CSS color based on value positive/negative."""
@@ -258,56 +190,197 @@ def color_change(val):
     except (ValueError, TypeError):
         return ''
 
-def process_funds(funds_with_amounts):
+@st.cache_data(ttl=600)
+def read_history_cached(code, days):
+    # Local read only; the collector keeps the history store in sync
+    return read_fund_history(code, days)
+
+def load_snapshot_results(funds_with_amounts):
+    """Builds dashboard rows from the collector's latest snapshots (no network)."""
+    snapshots = load_snapshots([code for code, _, _ in funds_with_amounts])
     results = []
-    total = len(funds_with_amounts)
+    for code, current_amount, source in funds_with_amounts:
+        item = snapshots.get(code)
+        if not item:
+            results.append(failed_result(code, current_amount, '等待后台采集'))
+            continue
+        # Position may have changed since the collector ran
+        item['持仓金额'] = current_amount
+        if item['估算涨跌'] is not None:
+            item['估算收益'] = current_amount * (item['估算涨跌'] / 100)
+        # History is read when the fund's details are shown
+        results.append(item)
+    return results
+
+def process_funds(funds_with_amounts):
     progress_bar = st.progress(0)
     status_text = st.empty()
     
     status_text.text("正在并发获取数据...")
     
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        # Create map of future -> (code, current_amount, source) for each fund
-        futures_map = {executor.submit(process_single_fund, code, current_amount): (code, current_amount, source) for code, current_amount, source in funds_with_amounts}
-        
-        completed_count = 0
-        
-        # Process completed futures
-        for future in as_completed(futures_map):
-            completed_count += 1
-            progress_bar.progress(completed_count / len(futures_map))
-            try:
-                data = future.result()
-                # No need to calculate estimated total holding profit and remaining amount
-                results.append(data)
-            except Exception as e:
-                code, current_amount, source = futures_map[future]
-                logging.error(f"Future blocked for {code}: {e}")
-                # Add error entry
-                results.append({
-                    '基金代码': code,
-                    '基金名称': '--',
-                    '持仓日期': '--',
-                    '状态': f'处理失败: {str(e)}',
-                    '估算涨跌': None,
-                    '重仓股权重': None,
-                    '持仓金额': current_amount,
-                    '估算收益': None,
-                    'Details': []
-                })
+    def on_progress(done, total):
+        progress_bar.progress(done / total)
+    
+    # Holdings for every fund first, then one de-duplicated quote fetch for the whole book
+    results = refresh_funds(
+        [(code, current_amount) for code, current_amount, source in funds_with_amounts],
+        progress_callback=on_progress,
+        # Cached to avoid heavy network io
+        history_fetcher=lambda code: fetch_history_cached(code, days=365),
+    )
                 
     status_text.empty()
     progress_bar.empty()
     
-    # Sort results to match input order
-    code_to_index = {code: i for i, (code, _, _) in enumerate(funds_with_amounts)}
-    results.sort(key=lambda x: code_to_index.get(x['基金代码'], 999))
-    
     return results
 
+# Chart specs are built once per process; each render only binds its data
+@st.cache_resource
+def intraday_chart_spec():
+    return alt.Chart().mark_line(color='#FFA500').encode(
+        x=alt.X('Time', title='时间'),
+        y=alt.Y('Estimate', title='估算涨跌(%)', scale=alt.Scale(zero=False))
+    ).properties(height=250)
+
+@st.cache_resource
+def history_chart_spec():
+    return alt.Chart().mark_line().encode(
+        x=alt.X('date', title='日期', axis=alt.Axis(format='%m-%d')),
+        y=alt.Y('nav', title='单位净值', scale=alt.Scale(zero=False)),
+        tooltip=['date', 'nav']
+    ).properties(height=250)
+
+def highlight_change(val):
+    if val is None or not isinstance(val, (int, float)):
+        return ''
+    color = '#d63031' if val > 0 else '#00b894' if val < 0 else ''
+    return f'color: {color}'
+
+def render_fund_detail(item):
+    """Metrics, charts and holdings table of one fund."""
+    if item['状态'] != '成功':
+        st.error(f"获取数据失败: {item.get('状态', 'Unknown Error')}")
+        return
+
+    # --- Metrics Row ---
+    c1, c2, c3, c4, c5, c6, c7 = st.columns(7)
+    with c1:
+        st.metric("实时估算涨跌", f"{item['估算涨跌']:+.2f}%", delta=None)
+    with c2:
+        st.metric("持仓覆盖占比" if len(item['Details']) > 10 else "前十大持仓占比",
+                  f"{item['重仓股权重']:.2f}%")
+    with c3:
+        st.metric("持仓报告期", item['持仓日期'])
+    with c4:
+        st.metric("持仓金额", f"{item['持仓金额']:.2f}元")
+    with c5:
+        st.metric("估算收益", f"{item['估算收益']:+.2f}元" if item['估算收益'] is not None else "--")
+    with c6:
+        st.metric("更新时间", item.get('更新时间', '--'))
+    with c7:
+        st.metric("数据状态", item.get('状态', '--'))
+
+    st.divider()
+
+    # --- Charts Area (Tabs) ---
+    chart_tab1, chart_tab2 = st.tabs(["📉 实时分时走势", "📅 历史净值趋势"])
+    f_code = item['基金代码']
+
+    with chart_tab1:
+        # Intraday Chart
+        df_intra = read_intraday(f_code)
+        intra_caption = None
+        if df_intra.empty:
+            # Before today's first point (or on a closed day), show the last recorded session
+            last_date = latest_trade_date(f_code)
+            if last_date:
+                df_intra = read_intraday(f_code, last_date)
+                intra_caption = f"最近交易日：{last_date}"
+        if not df_intra.empty:
+            st.altair_chart(intraday_chart_spec().properties(data=df_intra), use_container_width=True)
+            if intra_caption:
+                st.caption(intra_caption)
+        else:
+            st.info("暂无今日实时数据，请等待刷新...")
+
+    with chart_tab2:
+        # Historical Chart (snapshot results carry none: read the local store)
+        hist_df = item.get('History')
+        if hist_df is None:
+            hist_df = read_history_cached(f_code, days=365)
+        if hist_df is not None and not hist_df.empty:
+            # Date Range Selector
+            range_map = {'1周': 7, '1月': 30, '3月': 90, '6月': 180, '1年': 365}
+            selected_range = st.radio(
+                "时间范围",
+                list(range_map.keys()),
+                index=1,
+                key=f"range_{f_code}",
+                horizontal=True,
+                label_visibility="collapsed"
+            )
+
+            days_limit = range_map[selected_range]
+
+            # Dates are sorted midnights: slice from the first one in range
+            start_date = (pd.Timestamp.now() - pd.Timedelta(days=days_limit)).ceil('D')
+            chart_df = hist_df.iloc[hist_df['date'].searchsorted(start_date):]
+            st.altair_chart(history_chart_spec().properties(data=chart_df), use_container_width=True)
+        else:
+            st.warning("暂无历史数据")
+
+    if len(item['Details']) > 10:
+        st.caption(f"注意：估值基于最新前十大重仓股与年报/半年报完整持仓（共 {len(item['Details'])} 只），并已归一化处理。")
+    else:
+        st.caption("注意：估值仅基于已披露的前十大重仓股，并已归一化处理。")
+    if item.get('过期行情'):
+        st.warning(f"{item['过期行情']} 只重仓股行情获取失败，使用缓存数据（最早 {item.get('行情时间')}）")
+    elif item.get('行情时间'):
+        st.caption(f"行情时间：{item['行情时间']}")
+
+    # --- Holdings Table ---
+    # A toggle rather than an expander: a collapsed expander still builds and styles its table
+    if st.toggle("查看重仓股详情", key=f"holdings_{f_code}"):
+        df_det = pd.DataFrame(item['Details'])
+
+        if not df_det.empty:
+            df_det = df_det[['code', 'name', 'weight', 'price', 'change']]
+            df_det.columns = ['代码', '名称', '权重(%)', '现价', '涨跌(%)']
+            # Fill None values in numeric columns to prevent format errors
+            numeric_cols = ['权重(%)', '现价', '涨跌(%)']
+            for col in numeric_cols:
+                if col in df_det.columns:
+                    df_det[col] = df_det[col].fillna(0.0)
+
+            st.dataframe(
+                df_det.style.map(highlight_change, subset=['涨跌(%)'])
+                            .format({'权重(%)': "{:.2f}", '现价': "{:.2f}", '涨跌(%)': "{:+.2f}"}),
+                use_container_width=True
+            )
+        else:
+            st.info("暂无持仓详情。")
+
+@st.fragment
+def render_details(data):
+    """
+    Detail panel for the selected fund only. As a fragment, picking another
+    fund or chart range reruns just this panel (with the data of the last full
+    run) instead of the whole refresh.
+    """
+    st.subheader("详细信息")
+    by_code = {d['基金代码']: d for d in data}
+    selected = st.selectbox(
+        "选择基金",
+        list(by_code),
+        format_func=lambda code: f"{code} - {by_code[code].get('基金名称') or '未命名'}",
+        key="detail_fund",
+        label_visibility="collapsed"
+    )
+    if selected:
+        render_fund_detail(by_code[selected])
+
 # Only get funds from database
-db_funds = get_all_funds()
-funds_with_amounts = [(fund['fund_code'], fund['current_amount'], 'database') for fund in db_funds]
+funds_with_amounts = [(fund['fund_code'], fund['current_amount'], 'database') for fund in funds]
 
 codes = [item[0] for item in funds_with_amounts]
 
@@ -320,7 +393,11 @@ dashboard = st.empty()
 
 def render_dashboard():
     with dashboard.container():
-        data = process_funds(funds_with_amounts)
+        # Read the collector's snapshots when it is running; otherwise fetch in this session
+        if collector_status and collector_status['active']:
+            data = load_snapshot_results(funds_with_amounts)
+        else:
+            data = process_funds(funds_with_amounts)
         
         if not data:
             st.error("未找到数据。")
@@ -346,140 +423,32 @@ def render_dashboard():
         else:
             st.warning("未找到数据。")
         
-        # Update Intraday History Logic (Restored)
-        for item in data:
-            if item['状态'] == '成功' and item['估算涨跌'] is not None:
-                f_code = item['基金代码']
-                if 'fund_intraday' not in st.session_state:
-                    st.session_state['fund_intraday'] = {}
-                
-                if f_code not in st.session_state['fund_intraday']:
-                    st.session_state['fund_intraday'][f_code] = pd.DataFrame(columns=['Time', 'Estimate'])
-                
-                current_time = datetime.now().strftime("%H:%M")
-                
-                # Simple append
-                new_row = pd.DataFrame({'Time': [current_time], 'Estimate': [item['估算涨跌']]})
-                st.session_state['fund_intraday'][f_code] = pd.concat([st.session_state['fund_intraday'][f_code], new_row], ignore_index=True)
-        
-        # Detail Expander
-        st.subheader("详细信息")
-        tabs = st.tabs([f"{d['基金代码']}" for d in data])
+        # Record this refresh in the intraday store (the collector records its own
+        # cycles); only funds whose markets are trading, not off-hours repeats
+        if not (collector_status and collector_status['active']):
+            append_points(trading_results(data))
+        metrics.export_configured()
+        render_diagnostics()
         
-        for i, tab in enumerate(tabs):
-            with tab:
-                item = data[i]
-                if item['状态'] == '成功':
-                    # --- Metrics Row ---
-                    c1, c2, c3, c4, c5, c6, c7 = st.columns(7)
-                    with c1:
-                        st.metric("实时估算涨跌", f"{item['估算涨跌']:+.2f}%", delta=None)
-                    with c2:
-                         st.metric("前十大持仓占比", f"{item['重仓股权重']:.2f}%")
-                    with c3:
-                         st.metric("持仓报告期", item['持仓日期'])
-                    with c4:
-                         st.metric("持仓金额", f"{item['持仓金额']:.2f}元")
-                    with c5:
-                         st.metric("估算收益", f"{item['估算收益']:+.2f}元" if item['估算收益'] is not None else "--")
-                    with c6:
-                         st.metric("更新时间", item.get('更新时间', '--'))
-                    with c7:
-                         st.metric("数据状态", item.get('状态', '--'))
-                    
-                    st.divider()
-                    
-                    # --- Charts Area (Tabs) ---
-                    chart_tab1, chart_tab2 = st.tabs(["📉 实时分时走势", "📅 历史净值趋势"])
-                    
-                    with chart_tab1:
-                         # Intraday Chart
-                         f_code = item['基金代码']
-                         if 'fund_intraday' in st.session_state and f_code in st.session_state['fund_intraday']:
-                             df_intra = st.session_state['fund_intraday'][f_code]
-                             if not df_intra.empty:
-                                 # Use Altair for consistency
-                                 import altair as alt
-                                 chart_intra = alt.Chart(df_intra).mark_line(color='#FFA500').encode(
-                                     x=alt.X('Time', title='时间'),
-                                     y=alt.Y('Estimate', title='估算涨跌(%)', scale=alt.Scale(zero=False))
-                                 ).properties(height=250)
-                                 st.altair_chart(chart_intra, use_container_width=True)
-                             else:
-                                 st.info("暂无今日实时数据，请等待刷新...")
-                         else:
-                             st.info("数据收集中...")
-                    
-                    with chart_tab2:
-                        # Historical Chart
-                        if 'History' in item and item['History'] is not None and not item['History'].empty:
-                            # Date Range Selector
-                            range_map = {'1周': 7, '1月': 30, '3月': 90, '6月': 180, '1年': 365}
-                            selected_range = st.radio(
-                                "时间范围", 
-                                list(range_map.keys()), 
-                                index=1, 
-                                key=f"range_{item['基金代码']}",
-                                horizontal=True,
-                                label_visibility="collapsed"
-                            )
-                            
-                            days_limit = range_map[selected_range]
-                            hist_df = item['History']
-                            
-                            # Filter
-                            start_date = pd.Timestamp.now() - pd.Timedelta(days=days_limit)
-                            chart_df = hist_df[hist_df['date'] >= start_date]
-                            
-                            import altair as alt
-                            chart_hist = alt.Chart(chart_df).mark_line().encode(
-                                x=alt.X('date', title='日期', axis=alt.Axis(format='%m-%d')),
-                                y=alt.Y('nav', title='单位净值', scale=alt.Scale(zero=False)),
-                                tooltip=['date', 'nav']
-                            ).properties(height=250)
-                            st.altair_chart(chart_hist, use_container_width=True)
-                        else:
-                            st.warning("暂无历史数据")
-
-                    st.caption("注意：估值仅基于已披露的前十大重仓股，并已归一化处理。")
-                    
-                    # --- Holdings Table ---
-                    with st.expander("查看重仓股详情", expanded=False):
-                        details = item['Details']
-                        df_det = pd.DataFrame(details)
-                        
-                        if not df_det.empty:
-                            df_det = df_det[['code', 'name', 'weight', 'price', 'change']]
-                            df_det.columns = ['代码', '名称', '权重(%)', '现价', '涨跌(%)']
-                            # Fill None values in numeric columns to prevent format errors
-                            numeric_cols = ['权重(%)', '现价', '涨跌(%)']
-                            for col in numeric_cols:
-                                if col in df_det.columns:
-                                    df_det[col] = df_det[col].fillna(0.0)
-                            
-                            # Style highlights
-                            def highlight_change(val):
-                                if val is None or not isinstance(val, (int, float)):
-                                    return ''
-                                color = '#d63031' if val > 0 else '#00b894' if val < 0 else ''
-                                return f'color: {color}'
-                                
-                            st.dataframe(
-                                df_det.style.map(highlight_change, subset=['涨跌(%)'])
-                                            .format({'权重(%)': "{:.2f}", '现价': "{:.2f}", '涨跌(%)': "{:+.2f}"}),
-                                use_container_width=True
-                            )
-                        else:
-                            st.info("暂无持仓详情。")
-                else:
-                    st.error(f"获取数据失败: {item.get('状态', 'Unknown Error')}")
+        # Details of one fund at a time, rerun on their own when its widgets change
+        render_details(data)
 
 # Main Loop Logic
 if auto_refresh:
-    while True:
-        render_dashboard()
-        time.sleep(60)
-        st.rerun()
+    render_dashboard()
+    delay, reason = next_refresh_delay()
+    st.session_state['refresh_due'] = time.time() + delay
+
+    # A short timer rerun checks the deadline, so an idle schedule doesn't hold the script open
+    @st.fragment(run_every=max(1.0, min(delay, EDGE_INTERVAL)))
+    def refresh_timer():
+        remaining = st.session_state['refresh_due'] - time.time()
+        if remaining <= 0:
+            st.rerun(scope='app')
+        st.caption(f"下次刷新：{int(remaining)} 秒后（{reason}）")
+
+    with st.sidebar:
+        refresh_timer()
 else:
     render_dashboard()
 
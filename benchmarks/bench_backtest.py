@@ -0,0 +1,76 @@
+"""
+Benchmark: estimator backtest over a synthetic fund universe.
+
+Generates closes for a shared security universe, quarterly top-10 snapshots
+per fund and official NAVs driven by each fund's full (hidden) portfolio plus
+noise, then times ``run_backtest`` and ``summarize``.
+
+    python -m benchmarks.bench_backtest [--funds 3000] [--days 500] [--universe 5000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from src.backtest import run_backtest, summarize
+
+
+def make_universe(n_funds, n_days, universe, seed=11):
+    rng = np.random.default_rng(seed)
+    codes = [f"sh{600000 + i}" for i in range(universe)]
+    days = pd.bdate_range(end='2026-09-30', periods=n_days)
+    returns = rng.normal(0, 1.8, size=(n_days, universe))
+    closes = pd.DataFrame(20 * np.cumprod(1 + returns / 100, axis=0), index=days, columns=codes)
+    # ~1% of closes missing (suspensions)
+    closes = closes.mask(rng.random(closes.shape) < 0.01)
+
+    quarter_ends = pd.date_range(end=days[-1], periods=n_days // 63 + 2, freq='QE')
+    snapshots = {}
+    navs = np.empty((n_days, n_funds))
+    picker = random.Random(seed)
+    for f in range(n_funds):
+        code = f"{f:06d}"
+        held = picker.sample(range(universe), 60)
+        weights = rng.dirichlet(np.ones(60)) * 90
+        order = np.argsort(-weights)
+        snapshots[code] = [
+            (q.strftime('%Y-%m-%d'), [{'code': codes[held[i]][2:], 'name': codes[held[i]],
+                                      'weight': float(weights[i]), 'fetch_code': codes[held[i]]} for i in order[:10]])
+            for q in quarter_ends
+        ]
+        daily = np.nan_to_num(returns[:, held]) @ weights / 100 + rng.normal(0, 0.15, n_days)
+        navs[:, f] = np.cumprod(1 + daily / 100)
+    return snapshots, closes, pd.DataFrame(navs, index=days, columns=list(snapshots))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--funds', type=int, default=3000)
+    parser.add_argument('--days', type=int, default=500)
+    parser.add_argument('--universe', type=int, default=5000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    snapshots, closes, navs = make_universe(args.funds, args.days, args.universe)
+    generated = time.perf_counter()
+    result = run_backtest(snapshots, closes, navs)
+    backtested = time.perf_counter()
+    report = summarize(result)
+    summarized = time.perf_counter()
+
+    snapshot_count = sum(len(s) for s in snapshots.values())
+    print(f"{args.funds} funds x {args.days} days, {snapshot_count} snapshots")
+    print(f"generate {generated - start:.2f}s  backtest {backtested - generated:.2f}s  "
+          f"summarize {summarized - backtested:.2f}s")
+    print(f"median MAE {report['mae'].median():.3f}pp  median bias {report['bias'].median():+.3f}pp  "
+          f"median hit-rate {report['hit_rate'].median():.1%}")
+
+
+if __name__ == '__main__':
+    main()
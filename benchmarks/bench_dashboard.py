@@ -0,0 +1,131 @@
+"""
+Benchmark: dashboard rerun time for large books.
+
+Fills a throwaway database with ``--funds`` funds as the collector leaves it
+(snapshots with ``--holdings`` holdings each, a year of NAV history, a session
+of intraday points and a live heartbeat), so reruns read local data only, then
+drives ``app.py`` with Streamlit's ``AppTest`` and reports the median time of:
+
+* ``rerun``: a full script run, as on every refresh;
+* ``select``: picking another fund in the detail panel;
+* ``range``: switching the history chart's range;
+* ``holdings``: opening the selected fund's holdings table.
+
+``AppTest`` reruns the whole script on every widget change, so the last three
+include a full rerun; in a browser the detail panel is a fragment and reruns
+alone.
+
+Target: a full rerun of 200 funds stays under ``--target-ms`` (500 ms by
+default); the run exits non-zero otherwise. ``--app`` benchmarks another copy
+of the dashboard, e.g. ``git show HEAD~1:app.py > /tmp/app_old.py``.
+
+    python -m benchmarks.bench_dashboard [--funds 200] [--holdings 10] [--reruns 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Never touch the real funds.db: the stores read this at import time
+os.environ['FUND_NAV_DB'] = os.path.join(tempfile.mkdtemp(prefix='fund_nav_bench_'), 'bench.db')
+
+import numpy as np
+import pandas as pd
+
+
+def build_book(codes, holdings):
+    from src.db import transaction
+    from src.intraday_store import append_points
+    from src.snapshot_store import record_heartbeat, save_snapshots
+
+    rng = np.random.default_rng(7)
+    now = datetime.now()
+    results = []
+    for code in codes:
+        changes = rng.normal(0, 1.5, holdings)
+        weights = rng.dirichlet(np.ones(holdings)) * 60
+        details = [{'code': f"{600000 + j:06d}", 'name': f"股票{j}", 'weight': float(w),
+                    'price': float(rng.uniform(5, 200)), 'change': float(c)}
+                   for j, (w, c) in enumerate(zip(weights, changes))]
+        estimate = float(np.dot(weights, changes) / weights.sum())
+        results.append({'基金代码': code, '基金名称': f"基金{code}", '持仓日期': '2026-06-30',
+                        '估算涨跌': estimate, '重仓股权重': float(weights.sum()), '持仓金额': 10000.0,
+                        '估算收益': 100 * estimate, '状态': '成功', 'Details': details,
+                        '更新时间': now.strftime("%H:%M:%S"), '行情时间': now.strftime("%Y-%m-%d %H:%M:%S"),
+                        '过期行情': 0})
+    save_snapshots(results)
+    record_heartbeat(3600, len(codes), 1.0)
+
+    for minute in range(30):
+        append_points(results, now=now.replace(hour=10, minute=minute))
+
+    dates = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=250).strftime('%Y-%m-%d').tolist()
+    with transaction() as conn:
+        conn.executemany('INSERT OR REPLACE INTO funds (fund_code, fund_name, current_amount, current_holding_profit) '
+                         'VALUES (?, ?, 10000, 0)', [(code, f"基金{code}") for code in codes])
+        for code in codes:
+            navs = np.cumprod(1 + rng.normal(0, 0.01, len(dates))).tolist()
+            conn.executemany('INSERT OR REPLACE INTO fund_nav_history VALUES (?, ?, ?)',
+                             zip([code] * len(dates), dates, navs))
+
+
+def timed_runs(at, reruns, action):
+    timings = []
+    for i in range(reruns):
+        start = time.perf_counter()
+        action(i).run()
+        timings.append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--funds', type=int, default=200)
+    parser.add_argument('--holdings', type=int, default=10, help="Holdings per fund")
+    parser.add_argument('--reruns', type=int, default=5)
+    parser.add_argument('--app', default=os.path.join(ROOT, 'app.py'), help="Dashboard script to run")
+    parser.add_argument('--target-ms', type=float, default=500, help="Budget for a full rerun")
+    args = parser.parse_args()
+
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(args.app, default_timeout=600)
+    codes = [f"{100000 + i:06d}" for i in range(args.funds)]
+    build_book(codes, args.holdings)
+    start = time.perf_counter()
+    at.run()
+    print(f"{args.funds} funds x {args.holdings} holdings; first run {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    results = {'rerun': timed_runs(at, args.reruns, lambda i: at)}
+    def widget(elements, prefix):
+        # Widgets differ between dashboard versions (skip what this one lacks) and
+        # keys carry the selected fund's code: look them up again after every run
+        return next((w for w in elements if w.key and w.key.startswith(prefix)), None)
+
+    if widget(at.selectbox, 'detail_fund'):
+        results['select'] = timed_runs(at, args.reruns,
+                                       lambda i: widget(at.selectbox, 'detail_fund').set_value(codes[i + 1]))
+    ranges = ['1周', '3月', '1年']
+    if widget(at.radio, 'range_'):
+        results['range'] = timed_runs(at, args.reruns, lambda i: widget(at.radio, 'range_').set_value(ranges[i % 3]))
+    if widget(at.toggle, 'holdings_'):
+        results['holdings'] = timed_runs(at, args.reruns, lambda i: widget(at.toggle, 'holdings_').set_value(i % 2 == 0))
+
+    print(f"{'action':>10}{'median ms':>11}")
+    for name, ms in results.items():
+        print(f"{name:>10}{ms:>11.0f}")
+    if results['rerun'] > args.target_ms:
+        print(f"Full rerun {results['rerun']:.0f}ms exceeds the {args.target_ms:.0f}ms target")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
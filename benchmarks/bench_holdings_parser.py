@@ -0,0 +1,121 @@
+"""
+Benchmark: single-pass holdings parser vs the previous inline regex parser.
+
+Validates ``parse_holdings_page`` against the jjcc fixtures in
+``benchmarks/fixtures/jjcc`` (A-share + HK, US QDII, ETF feeder without a stock
+table, Beijing listings / rows without quote links), then times both parsers.
+
+    python -m benchmarks.bench_holdings_parser [--iterations 2000]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.holdings_parser import decode_payload, parse_holdings_page
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'jjcc')
+
+
+def legacy_parse(content):
+    """The parser previously inlined in get_fund_holdings, kept as the baseline."""
+    holdings = []
+    name_match = re.search(r"title='(.*?)'", content)
+    fund_name = name_match.group(1) if name_match else None
+    date_match = re.search(r"截止至：<font class='px12'>(.*?)</font>", content)
+    report_date = date_match.group(1) if date_match else "--"
+    match = re.search(r'content:"(.*?)",\s*\w+\s*[:=]', content, re.DOTALL)
+    html_table = match.group(1) if match else ""
+    if html_table and "暂无数据" not in html_table and len(html_table) > 50:
+        for row_html in re.findall(r"<tr>(.*?)</tr>", html_table, re.DOTALL):
+            if "th" in row_html: continue
+            link_match = re.search(r"unify/r/(\d+)\.([a-zA-Z0-9]+)", row_html)
+            stock_code = "Unknown"
+            market_id = None
+            if link_match:
+                market_id = link_match.group(1)
+                stock_code = link_match.group(2)
+            else:
+                cols = re.findall(r"<td.*?>(.*?)</td>", row_html, re.DOTALL)
+                if len(cols) > 1:
+                    stock_code = re.sub(r"<.*?>", "", cols[1]).strip()
+            cols = re.findall(r"<td.*?>(.*?)</td>", row_html, re.DOTALL)
+            if len(cols) < 7: continue
+            stock_name = re.sub(r"<.*?>", "", cols[2]).strip()
+            weight_str = re.sub(r"<.*?>", "", cols[6]).strip().replace('%', '').replace(',', '')
+            if not weight_str or weight_str == '--': continue
+            try:
+                weight = float(weight_str)
+            except ValueError:
+                continue
+            if market_id:
+                mid = int(market_id)
+                if mid == 0: sina_code = f"sz{stock_code}"
+                elif mid == 1: sina_code = f"sh{stock_code}"
+                elif mid == 116: sina_code = f"rt_hk{stock_code.zfill(5)}"
+                elif mid >= 100: sina_code = f"gb_{stock_code.lower()}"
+                else: sina_code = f"sh{stock_code}" if stock_code.startswith(('6', '9')) else f"sz{stock_code}"
+            else:
+                if re.search(r'[a-zA-Z]', stock_code): sina_code = f"gb_{stock_code.lower()}"
+                elif len(stock_code) < 6: sina_code = f"rt_hk{stock_code.zfill(5)}"
+                elif stock_code.startswith(('6', '5')): sina_code = f"sh{stock_code}"
+                elif stock_code.startswith(('4', '8')): sina_code = f"bj{stock_code}"
+                else: sina_code = f"sz{stock_code}"
+            holdings.append({'code': stock_code, 'name': stock_name, 'weight': weight, 'fetch_code': sina_code})
+    return {'fund_name': fund_name, 'report_date': report_date, 'holdings': holdings}
+
+
+def load_fixtures():
+    fixtures = []
+    for filename in sorted(os.listdir(FIXTURE_DIR)):
+        if not filename.endswith('.txt'):
+            continue
+        code = filename[:-4]
+        with open(os.path.join(FIXTURE_DIR, filename), 'rb') as f:
+            raw = f.read()
+        with open(os.path.join(FIXTURE_DIR, code + '.json'), encoding='utf-8') as f:
+            expected = json.load(f)
+        fixtures.append((code, raw, expected))
+    return fixtures
+
+
+def validate(fixtures):
+    for code, raw, expected in fixtures:
+        got = parse_holdings_page(decode_payload(raw))
+        assert got == expected, f"{code}: parsed result does not match fixture\n{got}\n!=\n{expected}"
+        legacy = legacy_parse(decode_payload(raw))
+        note = '' if legacy == expected else '  (legacy parser differs)'
+        print(f"  {code}: {len(got['holdings'])} holdings, report {got['report_date']}  ok{note}")
+
+
+def bench(parse, pages, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for content in pages:
+            parse(content)
+    return iterations * len(pages) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    print("Validating fixtures:")
+    validate(fixtures)
+
+    pages = [decode_payload(raw) for _, raw, _ in fixtures]
+    legacy_pps = bench(legacy_parse, pages, args.iterations)
+    new_pps = bench(parse_holdings_page, pages, args.iterations)
+    print(f"\n{'parser':<10}{'pages/s':>12}")
+    print(f"{'legacy':<10}{legacy_pps:>12.0f}")
+    print(f"{'new':<10}{new_pps:>12.0f}   ({new_pps / legacy_pps:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: bare ``requests.get`` vs the shared pooled client.
+
+Starts a local keep-alive HTTP stub and measures requests/sec for both
+clients, sequentially and from a thread pool the size of the fetcher pools.
+
+    python -m benchmarks.bench_http_client [--requests 2000] [--workers 10] [--connect-latency-ms 30]
+"""
+import argparse
+import gzip
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from src.http_client import http_get
+from src.rate_limiter import configure_host
+
+# Roughly the size of a Sina quote batch
+PAYLOAD = ('var hq_str_sh600519="贵州茅台,1500.00,1498.00,1510.00,1520.00,1490.00";\n' * 20).encode('gbk')
+PAYLOAD_GZ = gzip.compress(PAYLOAD)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; avoid Nagle + delayed-ACK stalls on keep-alive
+    disable_nagle_algorithm = True
+    # Simulated cost of opening a connection (TCP handshake to a remote host)
+    connect_latency = 0.0
+
+    def setup(self):
+        super().setup()
+        if self.connect_latency:
+            time.sleep(self.connect_latency)
+
+    def do_GET(self):
+        body = PAYLOAD
+        self.send_response(200)
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = PAYLOAD_GZ
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Type', 'application/javascript; charset=GBK')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(fetch, url, n, workers):
+    start = time.perf_counter()
+    if workers <= 1:
+        for _ in range(n):
+            fetch(url).content
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda _: fetch(url).content, range(n)))
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=10)
+    parser.add_argument('--connect-latency-ms', type=float, default=0.0,
+                        help='Delay added to every new connection to model a remote RTT')
+    args = parser.parse_args()
+    StubHandler.connect_latency = args.connect_latency_ms / 1000
+
+    server = start_stub()
+    host = f"127.0.0.1:{server.server_address[1]}"
+    url = f"http://{host}/list=sh600519"
+    # Measure pooling alone, not the per-host rate limit
+    configure_host(host, rate=1e6, burst=1e6, max_concurrency=args.workers)
+
+    bare = lambda u: requests.get(u, timeout=5)
+    pooled = lambda u: http_get(u)
+
+    # Warm up both paths (imports, first connections)
+    run(bare, url, 20, 1)
+    run(pooled, url, 20, 1)
+
+    print(f"{'mode':<12}{'bare req/s':>14}{'pooled req/s':>16}{'speedup':>10}")
+    for label, workers in (('sequential', 1), (f'{args.workers} threads', args.workers)):
+        bare_rps = run(bare, url, args.requests, workers)
+        pooled_rps = run(pooled, url, args.requests, workers)
+        print(f"{label:<12}{bare_rps:>14.0f}{pooled_rps:>16.0f}{pooled_rps / bare_rps:>9.1f}x")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark: bulk import of a broker export against the local replay stub.
+
+Writes a GBK, tab-separated export of ``--funds`` positions without names, the
+worst case since every fund needs an upstream lookup. A few rows have
+spreadsheet-mangled codes, a few are duplicates, and ``--invalid`` rows are
+broken. The export is imported into a throwaway database through
+``src.importer``, cold (empty holdings cache) and again warm.
+
+Target: a cold import of 500 funds finishes within ``--target-s`` (30 s by
+default); the run exits non-zero otherwise.
+
+    python -m benchmarks.bench_import [--funds 500] [--latency-ms 20] [--host-rate 0]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Never touch the real funds.db: the stores read this at import time
+os.environ['FUND_NAV_DB'] = os.path.join(tempfile.mkdtemp(prefix='fund_nav_bench_'), 'bench.db')
+
+from benchmarks.bench_refresh import UPSTREAM_HOSTS
+from benchmarks.upstream_stub import reset_counters, start_stub
+from src.async_fetcher import MAX_CONCURRENCY
+from src.fund_store import load_positions
+from src.http_client import configure
+from src.importer import decode, import_positions
+from src.rate_limiter import configure_host
+
+
+def build_export(size, invalid):
+    lines = ['证券代码\t证券名称\t参考市值\t币种']
+    for i in range(size):
+        code = f"{200000 + i:06d}"
+        if i % 50 == 0:
+            code = f'="{code}"'
+        lines.append(f"{code}\t\t{1000 + i:,.2f}\t人民币")
+    # Same fund held in a second account
+    lines += [f"{200000 + i:06d}\t\t500.00\t人民币" for i in range(0, size, 100)]
+    lines += [f"ABC{i:03d}\t\t100\t人民币" for i in range(invalid)]
+    return '\n'.join(lines).encode('gbk')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--funds', type=int, default=500)
+    parser.add_argument('--invalid', type=int, default=5, help="Rows with broken codes")
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="Base latency added to every response")
+    parser.add_argument('--jitter-ms', type=float, default=10.0, help="Uniform extra latency")
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENCY, help="Name lookups in flight")
+    parser.add_argument('--host-rate', type=float, default=0.0,
+                        help="Per-host request rate limit; 0 lifts it so only the import path is measured")
+    parser.add_argument('--target-s', type=float, default=30.0, help="Budget for the cold import")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+
+    server, base_url = start_stub(args.latency_ms / 1000, args.jitter_ms / 1000)
+    configure(upstream=base_url)
+    for host in UPSTREAM_HOSTS:
+        if args.host_rate:
+            configure_host(host, rate=args.host_rate)
+        else:
+            configure_host(host, rate=1e6, burst=1e6)
+
+    data = build_export(args.funds, args.invalid)
+    timings = {}
+    for phase in ('cold', 'warm'):
+        reset_counters()
+        start = time.perf_counter()
+        result = import_positions(decode(data), concurrency=args.concurrency)
+        timings[phase] = time.perf_counter() - start
+        requests = sum(v for k, v in reset_counters().items() if k != 'injected_errors')
+        print(f"{phase:<5} {timings[phase]:>7.2f}s  imported {result['imported']}  "
+              f"rejected {len(result['failures'])}  {requests} requests")
+    server.shutdown()
+
+    stored = len(load_positions())
+    if stored != args.funds:
+        print(f"Expected {args.funds} funds in the database, found {stored}")
+        sys.exit(1)
+    if timings['cold'] > args.target_s:
+        print(f"Cold import {timings['cold']:.1f}s exceeds the {args.target_s:.0f}s target")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: reading a year of NAV history for many funds, SQLite vs the
+memory-mapped NAV columns.
+
+Fills a temporary database with ``--records`` trading days per fund, mirrors it
+with ``src.nav_columns.rebuild``, then times per-fund reads through SQLite
+(the previous read path), through the columns as DataFrames, and as raw
+zero-copy arrays, reporting the RSS growth of each.
+
+    python -m benchmarks.bench_nav_history [--funds 1000] [--records 1500]
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+
+def rss_mb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--funds', type=int, default=1000)
+    parser.add_argument('--records', type=int, default=1500)
+    parser.add_argument('--days', type=int, default=365, help="Calendar days read per fund")
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    from src import nav_columns
+    from src.db import connection, transaction
+    from src.history_store import read_fund_history, read_fund_history_columns
+
+    dates = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=args.records).strftime('%Y-%m-%d').tolist()
+    codes = [f"{i:06d}" for i in range(args.funds)]
+    rng = np.random.default_rng(3)
+    with transaction(db_path) as conn:
+        for code in codes:
+            navs = np.cumprod(1 + rng.normal(0, 0.01, args.records)).tolist()
+            conn.executemany('INSERT INTO fund_nav_history VALUES (?, ?, ?)', zip([code] * args.records, dates, navs))
+    start = time.perf_counter()
+    nav_columns.rebuild(db_path)
+    print(f"{args.funds} funds x {args.records} records; rebuild {time.perf_counter() - start:.2f}s")
+
+    start_date = (pd.Timestamp.now() - pd.Timedelta(days=args.days)).strftime("%Y-%m-%d")
+
+    def sqlite_read(code):
+        # The read path before the NAV columns
+        with connection(db_path) as conn:
+            df = pd.read_sql_query('SELECT nav_date AS date, nav FROM fund_nav_history '
+                                   'WHERE fund_code = ? AND nav_date >= ? ORDER BY nav_date',
+                                   conn, params=(code, start_date))
+        df['date'] = pd.to_datetime(df['date'])
+        return df
+
+    print(f"{'path':>12}{'total ms':>10}{'per fund us':>13}{'rows':>10}{'RSS +MB':>9}")
+    for name, read, count in [
+        ('sqlite', sqlite_read, len),
+        ('dataframe', lambda code: read_fund_history(code, args.days, db_path), len),
+        ('arrays', lambda code: read_fund_history_columns(code, args.days, db_path), lambda r: len(r[0])),
+    ]:
+        read(codes[0])
+        before = rss_mb()
+        start = time.perf_counter()
+        results = [read(code) for code in codes]
+        elapsed = time.perf_counter() - start
+        rows = sum(count(r) for r in results)
+        print(f"{name:>12}{elapsed * 1e3:>10.1f}{elapsed / len(codes) * 1e6:>13.1f}{rows:>10}{rss_mb() - before:>9.1f}")
+        del results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: fixed-concurrency fetching vs the adaptive per-host limiter against
+a throttling upstream.
+
+The local stub serves at most ``--capacity`` requests/sec and answers 429 above
+that, like EastMoney/Sina under load. The baseline fires requests from a fixed
+thread pool without limiting (the old behaviour: throttled requests become
+missing data); the limited run goes through ``http_get``, whose token bucket and
+AIMD concurrency limit settle just under the stub's capacity.
+
+    python -m benchmarks.bench_rate_limiter [--requests 600] [--workers 32] [--capacity 100]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from src.http_client import http_get
+from src.rate_limiter import configure_host, get_stats
+
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    capacity = 100.0
+    latency = 0.02
+    _lock = threading.Lock()
+    _tokens = 0.0
+    _refilled_at = time.monotonic()
+
+    @classmethod
+    def _admit(cls):
+        with cls._lock:
+            now = time.monotonic()
+            # One second of burst, like a typical upstream rate limiter
+            cls._tokens = min(cls.capacity, cls._tokens + (now - cls._refilled_at) * cls.capacity)
+            cls._refilled_at = now
+            if cls._tokens >= 1:
+                cls._tokens -= 1
+                return True
+            return False
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        if self._admit():
+            status, body = 200, b'ok'
+        else:
+            status, body = 429, b'slow down'
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ThrottlingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(fetch, url, n, workers):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        statuses = list(executor.map(lambda _: fetch(url).status_code, range(n)))
+    elapsed = time.perf_counter() - start
+    return sum(1 for s in statuses if s == 200), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=600)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--capacity', type=float, default=100.0, help='Requests/sec the stub accepts')
+    args = parser.parse_args()
+    ThrottlingHandler.capacity = args.capacity
+
+    server = start_stub()
+    host = f"127.0.0.1:{server.server_address[1]}"
+    url = f"http://{host}/"
+    # Start the limiter well above the stub's capacity so it has to find the limit itself
+    configure_host(host, rate=args.capacity * 4, burst=args.capacity / 4, max_concurrency=args.workers)
+
+    session = requests.Session()
+    print(f"{'mode':<10}{'ok':>8}{'failed':>8}{'seconds':>10}{'ok req/s':>10}")
+    for label, fetch in (('fixed', lambda u: session.get(u, timeout=5)), ('adaptive', http_get)):
+        time.sleep(1.5) # let the stub's bucket refill between runs
+        ok, elapsed = run(fetch, url, args.requests, args.workers)
+        print(f"{label:<10}{ok:>8}{args.requests - ok:>8}{elapsed:>10.2f}{ok / elapsed:>10.0f}")
+
+    stats = get_stats()[host]
+    print(f"\nlimiter: {stats['throttled']} throttled, {stats['retries']} retries, "
+          f"settled at {stats['rate']} req/s, concurrency {stats['concurrency_limit']}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+End-to-end refresh benchmark against the local replay stub.
+
+Points the shared HTTP client at ``benchmarks/upstream_stub.py`` and runs the
+same refresh the dashboard does (holdings, one quote fetch for the book,
+valuation, NAV history) for books of 10/100/1000 funds, twice each:
+
+* ``cold``: empty database, every holdings snapshot and history page fetched;
+* ``warm``: holdings served from the store, history synced incrementally.
+
+Everything runs against a throwaway database. Results are printed (or written
+with ``--output``) as JSON for tracking regressions between releases:
+
+    python -m benchmarks.bench_refresh [--sizes 10,100,1000] [--latency-ms 20]
+        [--jitter-ms 10] [--error-rate 0.01] [--host-rate 0] [--output bench.json]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Never touch the real funds.db: the stores read this at import time
+os.environ['FUND_NAV_DB'] = os.path.join(tempfile.mkdtemp(prefix='fund_nav_bench_'), 'bench.db')
+
+from benchmarks.upstream_stub import reset_counters, start_stub
+from src.async_fetcher import MAX_CONCURRENCY
+from src.history_store import load_fund_history
+from src.http_client import configure
+from src.pipeline import refresh_funds
+from src.rate_limiter import configure_host, get_stats, reset_stats
+
+UPSTREAM_HOSTS = ['fundf10.eastmoney.com', 'api.fund.eastmoney.com', 'hq.sinajs.cn', 'suggest3.sinajs.cn']
+
+
+def fund_codes(size):
+    # Disjoint code ranges so each size starts cold in the shared database
+    base = 100000 + size * 100
+    return [f"{base + i:06d}" for i in range(size)]
+
+
+def run_refresh(codes, history_days):
+    reset_counters()
+    reset_stats()
+    history_fetcher = (lambda code: load_fund_history(code, history_days, max_workers=1)) if history_days else None
+    started = time.perf_counter()
+    results = refresh_funds([(code, 10000.0) for code in codes], history_fetcher=history_fetcher)
+    elapsed = time.perf_counter() - started
+
+    requests_by_endpoint = reset_counters()
+    limiter = get_stats()
+    return {
+        'seconds': round(elapsed, 4),
+        'funds_per_second': round(len(codes) / elapsed, 2),
+        'ok': sum(1 for r in results if r['状态'] == '成功'),
+        'with_history': sum(1 for r in results if r.get('History') is not None),
+        'requests': requests_by_endpoint,
+        'total_requests': sum(v for k, v in requests_by_endpoint.items() if k != 'injected_errors'),
+        'throttled': sum(s['throttled'] for s in limiter.values()),
+        'retries': sum(s['retries'] for s in limiter.values()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10,100,1000', help="Comma-separated book sizes")
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="Base latency added to every response")
+    parser.add_argument('--jitter-ms', type=float, default=10.0, help="Uniform extra latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Probability of an injected 503")
+    parser.add_argument('--history-days', type=int, default=365, help="0 skips NAV history")
+    parser.add_argument('--host-rate', type=float, default=0.0,
+                        help="Per-host request rate limit; 0 lifts it so only the client pipeline is measured")
+    parser.add_argument('--output', help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+    # Fetchers log every feeder resolution at INFO
+    logging.getLogger().setLevel(logging.ERROR)
+
+    server, base_url = start_stub(args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate)
+    configure(upstream=base_url)
+    if args.host_rate:
+        for host in UPSTREAM_HOSTS:
+            configure_host(host, rate=args.host_rate)
+    else:
+        for host in UPSTREAM_HOSTS:
+            configure_host(host, rate=1e6, burst=1e6)
+
+    report = {
+        'benchmark': 'refresh',
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': {
+            'latency_ms': args.latency_ms,
+            'jitter_ms': args.jitter_ms,
+            'error_rate': args.error_rate,
+            'history_days': args.history_days,
+            'host_rate': args.host_rate or None,
+            'max_concurrency': MAX_CONCURRENCY,
+        },
+        'results': [],
+    }
+    for size in (int(s) for s in args.sizes.split(',')):
+        codes = fund_codes(size)
+        for phase in ('cold', 'warm'):
+            result = run_refresh(codes, args.history_days)
+            report['results'].append(dict(funds=size, phase=phase, **result))
+            print(f"{size:>6} funds {phase:<5} {result['seconds']:>8.2f}s {result['funds_per_second']:>8.1f} funds/s "
+                  f"{result['total_requests']:>7} requests", file=sys.stderr)
+
+    server.shutdown()
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: per-fund estimate_nav_change loop vs the vectorized batch engine.
+
+Generates a synthetic book (10 holdings per fund drawn from a shared universe,
+~5% of quotes missing), checks both paths agree, and reports timings.
+``--per-fund 300`` models full interim/annual report holdings.
+
+    python -m benchmarks.bench_valuation [--funds 1000 10000] [--universe 5000] [--per-fund 10]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from src.valuation import (build_weight_matrix, estimate_nav_change, estimate_nav_changes,
+                           estimate_nav_changes_batch, quote_vectors)
+
+
+def make_book(n_funds, universe, per_fund=10, seed=7):
+    rng = random.Random(seed)
+    codes = [f"sh{600000 + i}" for i in range(universe)]
+    holdings_map = {}
+    for f in range(n_funds):
+        holdings_map[f"{f:06d}"] = [
+            {'code': c[2:], 'name': c, 'weight': round(rng.uniform(1, 10), 2), 'fetch_code': c}
+            for c in rng.sample(codes, per_fund)
+        ]
+    prices = {c: {'name': c, 'price': rng.uniform(5, 500), 'change': rng.uniform(-10, 10)}
+              for c in codes if rng.random() > 0.05}
+    return holdings_map, prices
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--funds', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--universe', type=int, default=5000)
+    parser.add_argument('--per-fund', type=int, default=10, help="Holdings per fund")
+    args = parser.parse_args()
+
+    print(f"{'funds':>7}{'loop ms':>11}{'batch ms':>11}{'matrix ms':>11}{'kernel ms':>11}{'+details ms':>13}")
+    for n in args.funds:
+        holdings_map, prices = make_book(n, args.universe, args.per_fund)
+
+        loop_s, loop = timed(lambda: {c: estimate_nav_change(h, prices) for c, h in holdings_map.items()})
+        batch_s, batch = timed(lambda: estimate_nav_changes(holdings_map, prices, with_details=False))
+        matrix_s, matrix = timed(lambda: build_weight_matrix(holdings_map))
+        quotes = quote_vectors(matrix['security_codes'], prices)
+        kernel_s, _ = timed(lambda: estimate_nav_changes_batch(matrix, quotes))
+        detail_s, detailed = timed(lambda: estimate_nav_changes(holdings_map, prices))
+
+        expected = np.array([loop[c]['estimated_change'] for c in holdings_map])
+        got = np.array([batch[c]['estimated_change'] for c in holdings_map])
+        assert np.allclose(expected, got), "batch estimate diverges from estimate_nav_change"
+        sample = next(iter(holdings_map))
+        assert detailed[sample]['details'] == loop[sample]['details'], "detail view diverges"
+
+        print(f"{n:>7}{loop_s * 1e3:>11.1f}{batch_s * 1e3:>11.1f}{matrix_s * 1e3:>11.1f}"
+              f"{kernel_s * 1e3:>11.2f}{detail_s * 1e3:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""
+Local replay stub for every upstream endpoint the fetchers use.
+
+Serves EastMoney (jjcc, zqcc, jbgk, lsjz) and Sina (hq list, suggest)
+responses rendered from the recorded templates in
+``benchmarks/fixtures/upstream`` for any fund code, with deterministic
+synthetic content:
+
+* stock funds hold 10 securities drawn from a mixed A-share/HK/US universe
+  (``FULL_MIN``-``FULL_MAX`` when a large ``topline`` asks for the annual report);
+* every ``FEEDER_EVERY``-th fund is an ETF feeder (empty jjcc table, name from
+  jbgk, target from suggest);
+* NAV history is a deterministic walk of ``HISTORY_RECORDS`` trading days.
+
+Requests arrive as ``<stub>/<original host><path>`` (see ``configure(upstream=...)``
+in ``src.http_client``). Latency and error injection are class attributes of
+``UpstreamHandler``; per-endpoint request counts are kept in ``counters``.
+"""
+import os
+import random
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'upstream')
+
+FEEDER_EVERY = 10
+# Holdings per fund in a full-report (topline > 10) response
+FULL_MIN, FULL_MAX = 100, 500
+HISTORY_RECORDS = 1500
+HISTORY_END = date(2026, 1, 16)
+THEMES = ['黄金', '纳斯达克100', '沪深300', '中证500', '红利', '半导体', '医疗', '证券', '新能源车', '恒生科技']
+
+
+def _load_templates():
+    templates = {}
+    for filename in os.listdir(FIXTURE_DIR):
+        if filename.endswith('.tmpl'):
+            with open(os.path.join(FIXTURE_DIR, filename), encoding='utf-8') as f:
+                templates[filename[:-5]] = f.read().strip('\n')
+    return templates
+
+TEMPLATES = _load_templates()
+
+
+def fill(template, **values):
+    """Substitutes '{key}' placeholders (the templates contain literal JS braces)."""
+    for key, value in values.items():
+        template = template.replace('{' + key + '}', str(value))
+    return template
+
+
+def _seed(text):
+    return zlib.crc32(text.encode('utf-8'))
+
+
+def _build_universe(size=3000):
+    """(eastmoney market id, code, sina key) for a mixed A/HK/US security universe."""
+    rng = random.Random(42)
+    universe = []
+    for code in rng.sample(range(600000, 606000), size // 2):
+        universe.append(('1', str(code), f"sh{code}"))
+    for code in rng.sample(range(1, 3999), size * 2 // 5):
+        universe.append(('0', f"{code:06d}", f"sz{code:06d}"))
+    for code in rng.sample(range(1, 9999), size // 15):
+        universe.append(('116', f"{code:05d}", f"rt_hk{code:05d}"))
+    for i in range(size // 30):
+        symbol = 'US' + ''.join(chr(65 + (i // 26 ** k) % 26) for k in range(3))
+        universe.append(('105', symbol, f"gb_{symbol.lower()}"))
+    return universe
+
+UNIVERSE = _build_universe()
+
+
+def is_feeder(fund_code):
+    return int(fund_code) % FEEDER_EVERY == FEEDER_EVERY - 1
+
+
+def feeder_name(fund_code):
+    return f"华夏{THEMES[int(fund_code) // FEEDER_EVERY % len(THEMES)]}ETF联接A"
+
+
+def render_jjcc(fund_code, topline=10):
+    if is_feeder(fund_code):
+        return TEMPLATES['jjcc_empty']
+    rng = random.Random(_seed(fund_code))
+    top = rng.sample(UNIVERSE, 10)
+    weights = []
+    weight = rng.uniform(7.0, 10.0)
+    for _ in top:
+        weights.append(weight)
+        weight *= rng.uniform(0.8, 0.98)
+    holdings = list(zip(top, weights))
+    if topline > 10:
+        # Annual report: FULL_MIN..FULL_MAX holdings, the tail sharing what the top ten leave of ~90%
+        count = min(topline, rng.randint(FULL_MIN, FULL_MAX))
+        taken = set(top)
+        tail = [s for s in rng.sample(UNIVERSE, count + 10) if s not in taken][:count - 10]
+        raw = [1.0 / (i + 1) for i in range(len(tail))]
+        scale = max(rng.uniform(85.0, 95.0) - sum(weights), 1.0) / sum(raw)
+        holdings += [(s, min(weights[-1], r * scale)) for s, r in zip(tail, raw)]
+    rows = []
+    for rank, ((market, code, _), weight) in enumerate(holdings, 1):
+        rows.append(fill(TEMPLATES['jjcc_row'], rank=rank, market=market, code=code, name=f"证券{code}",
+                         fund_code=fund_code, weight=f"{weight:.2f}"))
+    head = fill(TEMPLATES['jjcc_head'], fund_code=fund_code, fund_name=f"基准精选混合{fund_code}")
+    return head + ''.join(rows) + TEMPLATES['jjcc_tail']
+
+
+def render_lsjz(fund_code, page_index, page_size):
+    rng = random.Random(_seed(fund_code))
+    base, drift = rng.uniform(0.8, 3.0), rng.uniform(-0.0004, 0.0008)
+    start = (page_index - 1) * page_size
+    records = []
+    day = HISTORY_END
+    # Walk back over weekdays to the first record of the page
+    skipped = 0
+    while skipped < start:
+        day -= timedelta(days=1)
+        if day.weekday() < 5:
+            skipped += 1
+    for i in range(start, min(start + page_size, HISTORY_RECORDS)):
+        while day.weekday() >= 5:
+            day -= timedelta(days=1)
+        nav = base * (1 + drift) ** (HISTORY_RECORDS - i)
+        records.append(fill(TEMPLATES['lsjz_record'], date=day.isoformat(), nav=f"{nav:.4f}",
+                            change=f"{drift * 100:.2f}"))
+        day -= timedelta(days=1)
+    return fill(TEMPLATES['lsjz'], records='[' + ','.join(records) + ']', total_count=HISTORY_RECORDS,
+                page_size=page_size, page_index=page_index)
+
+
+def render_quote(key):
+    rng = random.Random(_seed(key))
+    pre_close = round(rng.uniform(3, 300), 2)
+    change = rng.uniform(-3, 3)
+    price = round(pre_close * (1 + change / 100), 2)
+    values = dict(key=key, name=f"证券{key}", name_en=key.upper(), open=pre_close, pre_close=pre_close,
+                  price=price, high=max(price, pre_close), low=min(price, pre_close),
+                  diff=f"{price - pre_close:.2f}", change=f"{change:.2f}")
+    if key.startswith('rt_hk'):
+        return fill(TEMPLATES['hq_hk'], **values)
+    if key.startswith('gb_'):
+        return fill(TEMPLATES['hq_us'], **values)
+    return fill(TEMPLATES['hq_a'], **values)
+
+
+def render_suggest(name):
+    code = f"51{_seed(name) % 10000:04d}"
+    return fill(TEMPLATES['suggest'], name=name, code=code, market='sh')
+
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    # Injection settings (seconds / probability)
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+    error_status = 503
+
+    counters = {}
+    _lock = threading.Lock()
+
+    def _route(self):
+        parts = urlsplit(self.path)
+        host, _, path = parts.path.lstrip('/').partition('/')
+        query = {k: v[0] for k, v in parse_qs(parts.query, keep_blank_values=True).items()}
+
+        if host == 'fundf10.eastmoney.com' and path == 'FundArchivesDatas.aspx':
+            kind = query.get('type', '')
+            code = query.get('code', '')
+            if kind == 'jjcc':
+                return 'jjcc', render_jjcc(code, int(query.get('topline') or 10)), 'utf-8'
+            name = feeder_name(code) if is_feeder(code) else f"基准精选混合{code}"
+            return kind or 'archives', fill(TEMPLATES['zqcc'], fund_code=code, fund_name=name), 'utf-8'
+        if host == 'fundf10.eastmoney.com' and path.startswith('jbgk_'):
+            code = path[len('jbgk_'):].split('.')[0]
+            name = feeder_name(code) if is_feeder(code) else f"基准精选混合{code}"
+            return 'jbgk', fill(TEMPLATES['jbgk'], fund_code=code, fund_name=name), 'utf-8'
+        if host == 'api.fund.eastmoney.com' and path == 'f10/lsjz':
+            body = render_lsjz(query.get('fundCode', '000000'), int(query.get('pageIndex', 1)),
+                               int(query.get('pageSize', 20)))
+            return 'lsjz', body, 'utf-8'
+        if host == 'hq.sinajs.cn' and path.startswith('list='):
+            keys = [k for k in unquote(path[len('list='):]).split(',') if k]
+            return 'hq', '\n'.join(render_quote(k) for k in keys), 'gbk'
+        if host == 'suggest3.sinajs.cn' and path.startswith('suggest/'):
+            key = unquote(parse_qs(path.split('/', 1)[1]).get('key', [''])[0])
+            return 'suggest', render_suggest(key), 'gbk'
+        return None
+
+    def do_GET(self):
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+        route = self._route()
+        endpoint = route[0] if route else 'unknown'
+        failed = route is None or random.random() < self.error_rate
+        with self._lock:
+            self.counters[endpoint] = self.counters.get(endpoint, 0) + 1
+            if failed and route is not None:
+                self.counters['injected_errors'] = self.counters.get('injected_errors', 0) + 1
+
+        if failed:
+            status, body = (404 if route is None else self.error_status), b''
+        else:
+            status, body = 200, route[1].encode(route[2], errors='ignore')
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(latency=0.0, jitter=0.0, error_rate=0.0, error_status=503):
+    """Starts the stub on an ephemeral port; returns (server, base_url)."""
+    UpstreamHandler.latency = latency
+    UpstreamHandler.jitter = jitter
+    UpstreamHandler.error_rate = error_rate
+    UpstreamHandler.error_status = error_status
+    server = ThreadingHTTPServer(('127.0.0.1', 0), UpstreamHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def reset_counters():
+    with UpstreamHandler._lock:
+        counters = dict(UpstreamHandler.counters)
+        UpstreamHandler.counters.clear()
+    return counters
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve the replay stub until interrupted")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    UpstreamHandler.latency = args.latency_ms / 1000
+    UpstreamHandler.error_rate = args.error_rate
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), UpstreamHandler)
+    print(f"Stub listening; run the app with FUND_NAV_UPSTREAM=http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
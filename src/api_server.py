@@ -0,0 +1,424 @@
+"""
+JSON HTTP API over the estimation pipeline, for the Android app and other
+thin clients.
+
+Clients ask this service instead of scraping EastMoney/Sina themselves, so one
+warm server-side cache (plus the holdings/history stores underneath) serves
+every device. Responses are compact JSON with English keys, carry a weak
+ETag over the JSON body (``If-None-Match`` gets a bodiless 304, whatever the
+encoding) and are gzipped when the client accepts it.
+
+    GET  /api/v1/funds/<code>/estimate          estimate with per-holding details
+    GET  /api/v1/funds/<code>/holdings          latest disclosed holdings
+    GET  /api/v1/funds/<code>/history?days=365  official NAV series (columnar)
+    GET  /api/v1/estimates?codes=110011,000001[&amounts=5000,8000][&details=1]
+    POST /api/v1/estimates  {"funds": [{"code": "110011", "amount": 5000}], "details": false}
+    GET  /api/v1/stream?codes=110011,000001      server-sent events (see below)
+    GET  /healthz
+
+The bulk endpoint estimates every cache miss in one pipeline refresh, i.e. one
+quote fetch for the union of their holdings.
+
+The stream endpoint sends a ``snapshot`` event with the funds' current
+estimates, then a ``delta`` event whenever a refresh (every
+FUND_NAV_STREAM_INTERVAL seconds) moves one of them; see
+``src.estimate_stream``. Event ids are the sequence numbers, so browsers'
+automatic ``Last-Event-ID`` reconnects resume without a new snapshot.
+
+    python -m src.api_server [--host 0.0.0.0] [--port 8000]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from src.estimate_stream import EstimateBroadcaster
+from src.history_store import load_fund_history
+from src.full_holdings_store import get_estimation_holdings
+from src.metrics import cache_lookup, inc, start_configured_server
+from src.pipeline import refresh_funds
+
+# Quotes move constantly; holdings and official NAVs change at most daily
+ESTIMATE_TTL = float(os.environ.get('FUND_NAV_API_ESTIMATE_TTL', 30))
+HOLDINGS_TTL = 3600
+HISTORY_TTL = 3600
+# Failed lookups are retried sooner than successful ones expire
+FAILURE_TTL = 10
+CACHE_MAX_ENTRIES = 20000
+MAX_BULK_FUNDS = 500
+MAX_HISTORY_DAYS = 3650
+MAX_BODY_BYTES = 64 * 1024
+# Smaller bodies are sent uncompressed: gzip overhead outweighs the saving
+GZIP_MIN_BYTES = 1024
+# SSE comment line sent on idle streams so proxies keep the connection open
+SSE_KEEPALIVE = 15
+SSE_RETRY_MS = 5000
+
+_FUND_ROUTE_RE = re.compile(r'^/api/v1/funds/(\d{6})/(estimate|holdings|history)$')
+_CODE_RE = re.compile(r'^\d{6}$')
+
+class TTLCache:
+    """Thread-safe TTL cache with LRU eviction beyond `max_entries`."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl: float):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+_cache = TTLCache()
+
+def _round(value, digits: int = 4):
+    return round(value, digits) if isinstance(value, float) else value
+
+def estimate_payload(item: Dict) -> Dict:
+    """Compact form of a pipeline result row (position-independent)."""
+    ok = item['状态'] == '成功'
+    return {
+        'code': item['基金代码'],
+        'name': item['基金名称'],
+        'report_date': item['持仓日期'],
+        'ok': ok,
+        'status': 'ok' if ok else item['状态'],
+        'change': _round(item['估算涨跌']),
+        'weight': _round(item['重仓股权重'], 2),
+        'updated': item.get('更新时间'),
+        'quotes_as_of': item.get('行情时间'),
+        'stale_quotes': item.get('过期行情', 0),
+        'details': [{'code': d['code'], 'name': d['name'], 'weight': _round(d['weight'], 2),
+                     'price': _round(d['price']), 'change': _round(d['change'])}
+                    for d in item.get('Details') or []],
+    }
+
+def get_estimates(codes: List[str]) -> Dict[str, Dict]:
+    """Estimate payloads for `codes`; all cache misses are refreshed together."""
+    found = {}
+    missing = []
+    for code in dict.fromkeys(codes):
+        payload = _cache.get(('estimate', code))
+        cache_lookup('api_estimate', hit=payload is not None)
+        if payload is None:
+            missing.append(code)
+        else:
+            found[code] = payload
+    if missing:
+        for item in refresh_funds([(code, 0.0) for code in missing]):
+            payload = estimate_payload(item)
+            _cache.set(('estimate', payload['code']), payload, ESTIMATE_TTL if payload['ok'] else FAILURE_TTL)
+            found[payload['code']] = payload
+    return found
+
+def get_holdings(code: str) -> Optional[Dict]:
+    payload = _cache.get(('holdings', code))
+    cache_lookup('api_holdings', hit=payload is not None)
+    if payload is not None:
+        return payload or None
+    result_data = get_estimation_holdings(code)
+    if result_data:
+        fund_name, holdings, report_date = result_data
+        payload = {
+            'code': code,
+            'name': fund_name,
+            'report_date': report_date,
+            'holdings': [{'code': h['code'], 'name': h.get('name', ''), 'weight': _round(h.get('weight'), 2),
+                          'quote_code': h.get('fetch_code') or h['code']} for h in holdings],
+        }
+        _cache.set(('holdings', code), payload, HOLDINGS_TTL)
+        return payload
+    # Cache the miss briefly ({} marks "not found")
+    _cache.set(('holdings', code), {}, FAILURE_TTL)
+    return None
+
+def get_history(code: str, days: int) -> Optional[Dict]:
+    payload = _cache.get(('history', code, days))
+    cache_lookup('api_history', hit=payload is not None)
+    if payload is not None:
+        return payload or None
+    df = load_fund_history(code, days)
+    if df is None or df.empty:
+        _cache.set(('history', code, days), {}, FAILURE_TTL)
+        return None
+    payload = {
+        'code': code,
+        'days': days,
+        'dates': df['date'].dt.strftime('%Y-%m-%d').tolist(),
+        'navs': [round(float(v), 4) for v in df['nav']],
+    }
+    _cache.set(('history', code, days), payload, HISTORY_TTL)
+    return payload
+
+def bulk_payload(positions: List[Tuple[str, Optional[float]]], details: bool = False) -> Dict:
+    """Response for the bulk endpoint: one entry per position, in request order."""
+    estimates = get_estimates([code for code, _ in positions])
+    funds = []
+    for code, amount in positions:
+        entry = dict(estimates[code])
+        if not details:
+            del entry['details']
+        if amount is not None:
+            entry['amount'] = amount
+            entry['profit'] = round(amount * entry['change'] / 100, 2) if entry['change'] is not None else None
+        funds.append(entry)
+    # Newest estimate time rather than now, so an unchanged response keeps its ETag
+    updated = max((f['updated'] for f in funds if f.get('updated')), default=None)
+    return {'updated': updated, 'funds': funds}
+
+def _warm_cache(payload: Dict):
+    # Stream refreshes double as cache fills for the pull endpoints
+    _cache.set(('estimate', payload['code']), payload, ESTIMATE_TTL if payload['ok'] else FAILURE_TTL)
+
+_broadcaster = EstimateBroadcaster(estimate_payload, on_refresh=_warm_cache)
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def _parse_positions(codes: List, amounts: Optional[List] = None) -> List[Tuple[str, Optional[float]]]:
+    if not codes:
+        raise ApiError(400, "no fund codes given")
+    if len(codes) > MAX_BULK_FUNDS:
+        raise ApiError(400, f"at most {MAX_BULK_FUNDS} funds per request")
+    if amounts is not None and len(amounts) != len(codes):
+        raise ApiError(400, "codes and amounts differ in length")
+    positions = []
+    for i, code in enumerate(codes):
+        code = str(code).strip()
+        if not _CODE_RE.match(code):
+            raise ApiError(400, f"invalid fund code: {code}")
+        amount = None
+        if amounts is not None and amounts[i] not in (None, ''):
+            try:
+                amount = float(amounts[i])
+            except (TypeError, ValueError):
+                raise ApiError(400, f"invalid amount for {code}")
+            # NaN/inf would come back as non-standard JSON
+            if not math.isfinite(amount):
+                raise ApiError(400, f"invalid amount for {code}")
+        positions.append((code, amount))
+    return positions
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # Weak comparison: the same JSON matches whether it was sent gzipped or not
+    opaque = etag.replace('W/', '', 1)
+    return opaque in (tag.strip().replace('W/', '', 1) for tag in header.split(','))
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FundNavAPI/1'
+
+    def _send_json(self, status: int, payload: Dict, max_age: int = 0, endpoint: str = 'other'):
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        etag = 'W/"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        inc('api_requests_total', endpoint=endpoint, status=str(status))
+        if status == 200 and _etag_matches(self.headers.get('If-None-Match'), etag):
+            inc('api_not_modified_total', endpoint=endpoint)
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', f'max-age={max_age}')
+            self.send_header('Vary', 'Accept-Encoding')
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        if status == 200:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', f'max-age={max_age}')
+        self.send_header('Vary', 'Accept-Encoding')
+        if len(body) >= GZIP_MIN_BYTES and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=5)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        inc('api_bytes_total', len(body), endpoint=endpoint)
+        self.wfile.write(body)
+
+    def _send_error_json(self, error: ApiError, endpoint: str):
+        self._send_json(error.status, {'error': str(error)}, endpoint=endpoint)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        endpoint = 'unknown'
+        try:
+            if parts.path == '/healthz':
+                endpoint = 'healthz'
+                self._send_json(200, {'ok': True, 'cached': len(_cache),
+                                      'stream_subscribers': _broadcaster.subscriber_count()}, endpoint=endpoint)
+                return
+
+            if parts.path == '/api/v1/stream':
+                endpoint = 'stream'
+                codes = [code for code, _ in _parse_positions([c for c in query.get('codes', '').split(',') if c])]
+                last_id = self.headers.get('Last-Event-ID') or query.get('last_event_id')
+                try:
+                    last_seq = int(last_id) if last_id else None
+                except ValueError:
+                    last_seq = None
+                self._stream(codes, last_seq)
+                return
+
+            if parts.path == '/api/v1/estimates':
+                endpoint = 'bulk'
+                codes = [c for c in query.get('codes', '').split(',') if c]
+                amounts = query['amounts'].split(',') if 'amounts' in query else None
+                positions = _parse_positions(codes, amounts)
+                payload = bulk_payload(positions, details=query.get('details') in ('1', 'true'))
+                self._send_json(200, payload, max_age=int(ESTIMATE_TTL), endpoint=endpoint)
+                return
+
+            match = _FUND_ROUTE_RE.match(parts.path)
+            if not match:
+                raise ApiError(404, "not found")
+            code, endpoint = match.groups()
+            if endpoint == 'estimate':
+                self._send_json(200, get_estimates([code])[code], max_age=int(ESTIMATE_TTL), endpoint=endpoint)
+            elif endpoint == 'holdings':
+                payload = get_holdings(code)
+                if payload is None:
+                    raise ApiError(404, f"no holdings for {code}")
+                self._send_json(200, payload, max_age=HOLDINGS_TTL, endpoint=endpoint)
+            else:
+                try:
+                    days = min(max(int(query.get('days', 365)), 1), MAX_HISTORY_DAYS)
+                except ValueError:
+                    raise ApiError(400, "days must be an integer")
+                payload = get_history(code, days)
+                if payload is None:
+                    raise ApiError(404, f"no NAV history for {code}")
+                self._send_json(200, payload, max_age=HISTORY_TTL, endpoint=endpoint)
+        except ApiError as e:
+            self._send_error_json(e, endpoint)
+        except Exception as e:
+            logging.exception(f"Error serving {self.path}: {e}")
+            self._send_error_json(ApiError(500, "internal error"), endpoint)
+
+    def _stream(self, codes: List[str], last_seq: Optional[int]):
+        """Holds the connection open and writes SSE events until the client goes away."""
+        sub = _broadcaster.subscribe(codes, last_seq)
+        inc('api_requests_total', endpoint='stream', status='200')
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('X-Accel-Buffering', 'no')
+            # No Content-Length: the stream ends when the connection closes
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+            self.wfile.write(f'retry: {SSE_RETRY_MS}\n\n'.encode('utf-8'))
+            self.wfile.flush()
+            while True:
+                event = sub.get(timeout=SSE_KEEPALIVE)
+                if event is None:
+                    if sub.closed:
+                        break
+                    self.wfile.write(b': keepalive\n\n')
+                else:
+                    data = json.dumps(event['data'], ensure_ascii=False, separators=(',', ':'))
+                    self.wfile.write(f"id: {event['seq']}\nevent: {event['event']}\ndata: {data}\n\n".encode('utf-8'))
+                    inc('api_bytes_total', len(data), endpoint='stream')
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            _broadcaster.unsubscribe(sub)
+
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        endpoint = 'bulk'
+        try:
+            if parts.path != '/api/v1/estimates':
+                raise ApiError(404, "not found")
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                length = -1
+            if length < 0 or length > MAX_BODY_BYTES:
+                # The body stays unread: don't parse it as the next request
+                self.close_connection = True
+                if length < 0:
+                    raise ApiError(400, "invalid Content-Length")
+                raise ApiError(413, "request body too large")
+            try:
+                request = json.loads(self.rfile.read(length) or b'{}')
+                funds = request.get('funds') or [{'code': code} for code in request.get('codes', [])]
+                codes = [f['code'] for f in funds]
+                amounts = [f.get('amount') for f in funds]
+            except (ValueError, TypeError, KeyError, AttributeError):
+                raise ApiError(400, "expected {\"funds\": [{\"code\": ..., \"amount\": ...}]}")
+            payload = bulk_payload(_parse_positions(codes, amounts), details=bool(request.get('details')))
+            # POST responses are not cacheable, but the ETag still lets clients skip re-rendering
+            self._send_json(200, payload, endpoint=endpoint)
+        except ApiError as e:
+            self._send_error_json(e, endpoint)
+        except Exception as e:
+            logging.exception(f"Error serving {self.path}: {e}")
+            self._send_error_json(ApiError(500, "internal error"), endpoint)
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} {format % args}")
+
+def make_server(host: str = '127.0.0.1', port: int = 8000) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fund estimates, holdings and NAV history over HTTP")
+    parser.add_argument('--host', default='127.0.0.1', help="Use 0.0.0.0 to accept connections from devices")
+    parser.add_argument('--port', type=int, default=int(os.environ.get('FUND_NAV_API_PORT', 8000)))
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.INFO)
+
+    start_configured_server()
+    server = make_server(args.host, args.port)
+    logging.info(f"Fund NAV API listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
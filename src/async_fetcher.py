@@ -0,0 +1,97 @@
+"""
+asyncio front-end for the data fetchers.
+
+Every blocking request runs on one process-wide worker pool of
+``MAX_CONCURRENCY`` threads, created once and reused across refreshes. That
+pool is the global concurrency limit: no matter how many funds, sessions or
+event loops submit work, at most ``MAX_CONCURRENCY`` upstream requests are in
+flight, and no per-call thread pools are spun up underneath (history backfill
+pages run sequentially inside their worker).
+
+The fetchers themselves stay synchronous on top of the pooled keep-alive
+client, so the sync API in ``src.data_fetcher`` and this async API share the
+same connections, caches and parsing code.
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src.data_fetcher import QUOTE_BATCH_SIZE, _search_etf_code
+from src.full_holdings_store import get_estimation_holdings
+from src.history_store import load_fund_history
+from src.quote_store import fetch_price_batch_cached
+
+MAX_CONCURRENCY = int(os.environ.get('FUND_NAV_MAX_CONCURRENCY', 16))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix='fund-fetch')
+    return _executor
+
+def set_max_concurrency(workers: int):
+    """
+    Resizes the shared worker pool. Work already submitted to the old pool
+    finishes normally; new work goes to a pool of `workers` threads.
+    """
+    global MAX_CONCURRENCY, _executor
+    with _executor_lock:
+        MAX_CONCURRENCY = workers
+        old, _executor = _executor, None
+    if old is not None:
+        old.shutdown(wait=False)
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """Runs a blocking call on the shared, bounded worker pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+def run_sync(coro: Coroutine) -> Any:
+    """
+    Runs a coroutine to completion from synchronous code.
+    Works both with and without an event loop already running in this thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # Already inside a loop (e.g. notebooks): drive the coroutine on a helper thread
+    with ThreadPoolExecutor(max_workers=1) as helper:
+        return helper.submit(asyncio.run, coro).result()
+
+async def fetch_holdings(fund_code: str) -> Optional[Tuple[str, List[Dict], str]]:
+    """
+    Async get_fund_holdings (served from the holdings store when fresh), with
+    full holdings blended in when enabled.
+    """
+    return await run_blocking(get_estimation_holdings, fund_code)
+
+async def fetch_quotes(stock_codes: List[str], batch_size: int = QUOTE_BATCH_SIZE) -> Dict[str, Dict]:
+    """
+    Async get_realtime_stock_prices: one task per batch of `batch_size` codes,
+    served from the shared quote cache where fresh.
+    """
+    unique_codes = list(dict.fromkeys(c for c in stock_codes if c))
+    batches = [unique_codes[i:i + batch_size] for i in range(0, len(unique_codes), batch_size)]
+    results = {}
+    for batch_result in await asyncio.gather(*(run_blocking(fetch_price_batch_cached, b) for b in batches)):
+        results.update(batch_result)
+    return results
+
+async def fetch_history(fund_code: str, days: int = 365) -> Optional[pd.DataFrame]:
+    """Async NAV history (incremental sync against the history store)."""
+    return await run_blocking(load_fund_history, fund_code, days, max_workers=1)
+
+async def search_etf(etf_name: str) -> Optional[str]:
+    """Async Sina Suggest lookup for an ETF code by name (None if none matches; raises on fetch errors)."""
+    return await run_blocking(_search_etf_code, etf_name)
@@ -0,0 +1,234 @@
+"""
+Historical accuracy backtest of the NAV estimator.
+
+Replays the estimator over past trading days and compares each estimate with
+the official NAV change published that evening:
+
+* holdings: every snapshot kept in ``fund_holdings`` (one per report period),
+  each used from ``PUBLICATION_LAG_DAYS`` after its period end until the next
+  one takes over, as it would have been live (feeder snapshots, which carry no
+  period, apply throughout);
+* constituent closes: local CSV files with ``date,code,close`` rows, ``code``
+  being the Sina quote code (``sh600519``, ``rt_hk00700``, ``gb_aapl``);
+* official NAV: ``fund_nav_history`` (see ``src.history_store``).
+
+Data is held columnar: closes become a days x securities return matrix, every
+snapshot one row of the same sparse weight matrix the live batch engine uses,
+and each day is one call of ``estimate_nav_changes_batch`` over all snapshots
+at once. Changes to the estimator kernel are therefore measured as shipped.
+Per fund the report gives error (estimate minus official, in percentage
+points), bias, MAE, RMSE and hit-rate (same sign as the official move).
+
+Distribution days show up as large negative official moves; ``--max-error``
+drops such outliers from the statistics.
+
+    python -m src.backtest closes/ [--funds 110011 161725] [--start 2025-01-01] [-o report.csv]
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.db import connection
+from src.valuation import build_weight_matrix, estimate_nav_changes_batch
+
+# Quarterly reports are due within 15 working days of the period end
+PUBLICATION_LAG_DAYS = 21
+
+REPORT_COLUMNS = ['fund_code', 'days', 'bias', 'mae', 'rmse', 'max_abs_error', 'hit_rate', 'weight_used']
+
+def load_closes(paths: Iterable[str]) -> pd.DataFrame:
+    """
+    Reads close fixtures (files, or directories of *.csv / *.csv.gz) into a
+    days x securities frame of closes, indexed by date.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, '*.csv')) + glob.glob(os.path.join(path, '*.csv.gz')))
+        else:
+            files.append(path)
+    if not files:
+        raise ValueError("No close files found")
+    frames = [pd.read_csv(f, usecols=['date', 'code', 'close'], dtype={'code': str}) for f in files]
+    closes = pd.concat(frames, ignore_index=True)
+    closes['date'] = pd.to_datetime(closes['date'])
+    wide = closes.pivot_table(index='date', columns='code', values='close', aggfunc='last')
+    return wide.sort_index()
+
+def load_snapshots(fund_codes: Optional[List[str]] = None,
+                   db_path: Optional[str] = None) -> Dict[str, List[Tuple[str, List[Dict]]]]:
+    """Stored holdings snapshots: {fund_code: [(report_date, holdings), ...]} in period order."""
+    with connection(db_path) as conn:
+        query = 'SELECT fund_code, report_date, holdings_json FROM fund_holdings'
+        params = []
+        if fund_codes:
+            query += f" WHERE fund_code IN ({','.join('?' * len(fund_codes))})"
+            params = fund_codes
+        rows = conn.execute(query + ' ORDER BY fund_code, report_date', params).fetchall()
+    snapshots = {}
+    for row in rows:
+        snapshots.setdefault(row['fund_code'], []).append((row['report_date'], json.loads(row['holdings_json'])))
+    return snapshots
+
+def load_navs(fund_codes: List[str], start: Optional[str] = None, db_path: Optional[str] = None) -> pd.DataFrame:
+    """Stored official NAVs as a days x funds frame."""
+    with connection(db_path) as conn:
+        placeholders = ','.join('?' * len(fund_codes))
+        navs = pd.read_sql_query(
+            f'SELECT fund_code, nav_date, nav FROM fund_nav_history WHERE fund_code IN ({placeholders}) AND nav_date >= ?',
+            conn, params=list(fund_codes) + [start or ''])
+    navs['nav_date'] = pd.to_datetime(navs['nav_date'])
+    return navs.pivot(index='nav_date', columns='fund_code', values='nav').sort_index()
+
+def _available_from(report_date: str, lag_days: int) -> np.datetime64:
+    """First day a snapshot was known; undated (feeder) snapshots always apply."""
+    try:
+        return np.datetime64(report_date, 'D') + np.timedelta64(lag_days, 'D')
+    except ValueError:
+        return np.datetime64('1970-01-01', 'D')
+
+def run_backtest(snapshots: Dict[str, List[Tuple[str, List[Dict]]]], closes: pd.DataFrame, navs: pd.DataFrame,
+                 lag_days: int = PUBLICATION_LAG_DAYS) -> Dict:
+    """
+    Estimates every fund on every day of `closes` with the holdings in effect
+    that day and aligns the official NAV changes.
+
+    Returns:
+        Dict: {
+            'fund_codes': List[str],
+            'days': pd.DatetimeIndex,
+            'estimate': np.ndarray, # funds x days, % (NaN without holdings or quotes)
+            'actual': np.ndarray, # funds x days, official % change (NaN without a NAV)
+            'weight_used': np.ndarray # funds x days, quoted weight behind each estimate
+        }
+    """
+    fund_codes = [code for code in snapshots if snapshots[code]]
+    days = closes.index
+    # Daily returns in %, NaN where either close is missing (suspended, not yet listed)
+    returns = closes.pct_change(fill_method=None).to_numpy() * 100
+
+    rows = {}
+    for code in fund_codes:
+        for report_date, holdings in snapshots[code]:
+            rows[(code, report_date)] = holdings
+    matrix = build_weight_matrix(rows)
+    column_of = {code: j for j, code in enumerate(closes.columns)}
+    # Matrix columns -> return columns; securities without closes read an all-NaN column
+    positions = np.array([column_of.get(code, -1) for code in matrix['security_codes']], dtype=np.int64)
+    returns = np.concatenate([returns, np.full((len(days), 1), np.nan)], axis=1)
+    positions[positions < 0] = returns.shape[1] - 1
+
+    n_days = len(days)
+    row_estimate = np.full((n_days, len(rows)), np.nan)
+    row_weight = np.zeros((n_days, len(rows)))
+    for t in range(n_days):
+        batch = estimate_nav_changes_batch(matrix, {'change': returns[t, positions]})
+        has_weight = batch['total_weight_used'] > 0
+        row_estimate[t, has_weight] = batch['estimated_change'][has_weight]
+        row_weight[t] = batch['total_weight_used']
+
+    # Snapshot row in effect per fund and day
+    day_values = days.values.astype('datetime64[D]')
+    in_effect = np.full((len(fund_codes), n_days), -1, dtype=np.int64)
+    row = 0
+    for f, code in enumerate(fund_codes):
+        available = np.array([_available_from(report_date, lag_days) for report_date, _ in snapshots[code]])
+        order = np.argsort(available, kind='stable')
+        position = np.searchsorted(available[order], day_values, side='right') - 1
+        in_effect[f] = np.where(position >= 0, row + order[np.maximum(position, 0)], -1)
+        row += len(available)
+    day_index = np.broadcast_to(np.arange(n_days), in_effect.shape)
+    known = in_effect >= 0
+    estimate = np.where(known, row_estimate[day_index, np.maximum(in_effect, 0)], np.nan)
+    weight_used = np.where(known, row_weight[day_index, np.maximum(in_effect, 0)], 0.0)
+
+    # Official change on each fund's own NAV calendar (a QDII fund's extra or
+    # missing days must not blank its neighbours' changes), then aligned to the close days
+    long = navs.reindex(columns=fund_codes).stack().dropna()
+    nav_changes = long.groupby(level=1, sort=False).pct_change() * 100
+    actual = nav_changes.unstack().reindex(index=days, columns=fund_codes).to_numpy().T
+
+    return {'fund_codes': fund_codes, 'days': days, 'estimate': estimate, 'actual': actual,
+            'weight_used': weight_used}
+
+def summarize(result: Dict, max_error: Optional[float] = None) -> pd.DataFrame:
+    """Per-fund error statistics over the days with both an estimate and an official NAV."""
+    error = result['estimate'] - result['actual']
+    valid = ~np.isnan(error)
+    if max_error is not None:
+        valid &= np.abs(np.nan_to_num(error)) <= max_error
+    masked = np.where(valid, error, np.nan)
+    counts = valid.sum(axis=1)
+    moved = valid & (result['actual'] != 0)
+    hits = (np.sign(result['estimate']) == np.sign(result['actual'])) & moved
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        report = pd.DataFrame({
+            'fund_code': result['fund_codes'],
+            'days': counts,
+            'bias': np.nansum(masked, axis=1) / counts,
+            'mae': np.nansum(np.abs(masked), axis=1) / counts,
+            'rmse': np.sqrt(np.nansum(masked ** 2, axis=1) / counts),
+            'max_abs_error': np.max(np.where(valid, np.abs(error), -np.inf), axis=1, initial=-np.inf),
+            'hit_rate': hits.sum(axis=1) / moved.sum(axis=1),
+            'weight_used': np.where(valid, result['weight_used'], 0.0).sum(axis=1) / counts,
+        })
+    report.loc[report['days'] == 0, 'max_abs_error'] = np.nan
+    return report[REPORT_COLUMNS]
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest NAV estimates against official NAVs",
+                                     epilog=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('closes', nargs='+', help="Close CSV files or directories (date,code,close)")
+    parser.add_argument('--funds', nargs='+', help="Fund codes (default: every fund with stored holdings)")
+    parser.add_argument('--start', help="First day (YYYY-MM-DD)")
+    parser.add_argument('--end', help="Last day (YYYY-MM-DD)")
+    parser.add_argument('--lag', type=int, default=PUBLICATION_LAG_DAYS, help="Days from period end to disclosure")
+    parser.add_argument('--max-error', type=float, help="Ignore days with |error| above this (pp), e.g. dividends")
+    parser.add_argument('-o', '--output', help="Write the per-fund report as CSV")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.INFO)
+
+    started = time.time()
+    closes = load_closes(args.closes)
+    if args.start or args.end:
+        # One day before --start keeps the first day's return
+        first = closes.index.searchsorted(pd.Timestamp(args.start)) - 1 if args.start else 0
+        closes = closes.iloc[max(first, 0):]
+        if args.end:
+            closes = closes.loc[:args.end]
+    snapshots = load_snapshots(args.funds)
+    if not snapshots:
+        parser.error("no stored holdings for the requested funds")
+    navs = load_navs(list(snapshots), start=closes.index[0].strftime("%Y-%m-%d"))
+    loaded = time.time()
+
+    result = run_backtest(snapshots, closes, navs, args.lag)
+    report = summarize(result, args.max_error)
+    logging.info(f"{len(result['fund_codes'])} funds x {len(result['days'])} days: "
+                 f"loaded in {loaded - started:.1f}s, backtested in {time.time() - loaded:.1f}s")
+
+    scored = report[report['days'] > 0]
+    if scored.empty:
+        print("No overlapping estimates and official NAVs")
+    else:
+        all_errors = (result['estimate'] - result['actual']).ravel()
+        all_errors = all_errors[~np.isnan(all_errors)]
+        if args.max_error is not None:
+            all_errors = all_errors[np.abs(all_errors) <= args.max_error]
+        print(f"funds {len(scored)}  fund-days {len(all_errors)}  bias {all_errors.mean():+.3f}pp  "
+              f"MAE {np.abs(all_errors).mean():.3f}pp  RMSE {np.sqrt((all_errors ** 2).mean()):.3f}pp  "
+              f"median hit-rate {scored['hit_rate'].median():.1%}")
+        print(scored.sort_values('mae', ascending=False).head(10).to_string(index=False, float_format='%.3f'))
+    if args.output:
+        report.to_csv(args.output, index=False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+Headless batch estimation for large fund lists (e.g. a whole-market sweep from cron).
+
+Fund codes come from a file, stdin or the ``funds`` table. Results are written
+as JSONL (the dashboard's result dicts) or CSV (the overview table's columns),
+one line per fund as soon as it completes, and flushed immediately.
+
+With ``--resume`` an existing output file is read first: funds that already
+have a successful row are skipped, a truncated last line from an interrupted
+run is dropped, and new rows are appended. Failed funds are retried and their
+new row appended, so readers should keep the last row per fund code.
+
+    python -m src.batch codes.txt -o sweep.jsonl [--concurrency 32] [--resume]
+    cat codes.txt | python -m src.batch - -o sweep.csv
+    python -m src.batch --from-db -o book.jsonl
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import re
+import sys
+import time
+from typing import Dict, Iterable, List, Set, TextIO, Tuple
+
+from src.async_fetcher import set_max_concurrency
+from src.fund_store import load_positions
+from src.full_holdings_store import set_full_holdings
+from src.history_store import load_fund_history
+from src.pipeline import stream_fund_results
+
+# Same columns as the dashboard overview table
+CSV_COLUMNS = ['基金代码', '基金名称', '持仓日期', '估算涨跌', '重仓股权重', '持仓金额', '估算收益', '状态', '更新时间']
+DEFAULT_AMOUNT = 10000.0
+
+_CODE_RE = re.compile(r'^\d{6}$')
+
+def parse_codes(lines: Iterable[str], default_amount: float = DEFAULT_AMOUNT) -> List[Tuple[str, float]]:
+    """
+    Reads 'code' or 'code,amount' lines (blank lines and '#' comments ignored).
+    Whitespace- or comma-separated codes on one line are accepted too.
+    """
+    positions = []
+    for line in lines:
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        parts = [p for p in re.split(r'[\s,]+', line) if p]
+        if len(parts) == 2 and _CODE_RE.match(parts[0]) and not _CODE_RE.match(parts[1]):
+            try:
+                positions.append((parts[0], float(parts[1])))
+                continue
+            except ValueError:
+                pass
+        for part in parts:
+            if _CODE_RE.match(part):
+                positions.append((part, default_amount))
+            else:
+                logging.warning(f"Skipping invalid fund code: {part}")
+    return positions
+
+def _truncate_partial_line(path: str):
+    """Drops a trailing line without a newline (left by an interrupted write)."""
+    with open(path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+
+def completed_codes(path: str, fmt: str) -> Set[str]:
+    """Fund codes that already have a successful row in an existing output file."""
+    if not os.path.exists(path):
+        return set()
+    _truncate_partial_line(path)
+    done = set()
+    with open(path, encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            for row in csv.DictReader(f):
+                if row.get('状态') == '成功':
+                    done.add(row['基金代码'])
+        else:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if row.get('状态') == '成功':
+                    done.add(row['基金代码'])
+    return done
+
+class ResultWriter:
+    """Streams result dicts to a JSONL or CSV file, one flushed line per fund."""
+
+    def __init__(self, stream: TextIO, fmt: str, with_details: bool = True, write_header: bool = True):
+        self.stream = stream
+        self.fmt = fmt
+        self.with_details = with_details
+        if fmt == 'csv':
+            self.csv = csv.DictWriter(stream, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+            if write_header:
+                self.csv.writeheader()
+
+    def write(self, item: Dict):
+        if self.fmt == 'csv':
+            self.csv.writerow(item)
+        else:
+            row = {k: v for k, v in item.items()
+                   if k != 'History' and (self.with_details or k != 'Details')}
+            if item.get('History') is not None:
+                history = item['History']
+                row['History'] = [[d.strftime('%Y-%m-%d'), nav] for d, nav in zip(history['date'], history['nav'])]
+            self.stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self.stream.flush()
+
+async def run_batch(positions: List[Tuple[str, float]], writer: ResultWriter, concurrency: int,
+                    history_days: int = 0) -> Dict[str, int]:
+    """Estimates every position, writing each result as it completes. Returns status counts."""
+    history_fetcher = (lambda code: load_fund_history(code, history_days, max_workers=1)) if history_days else None
+    counts = {'total': len(positions), 'ok': 0, 'failed': 0}
+    started = time.time()
+    async for item in stream_fund_results(positions, history_fetcher=history_fetcher, max_in_flight=concurrency):
+        writer.write(item)
+        counts['ok' if item['状态'] == '成功' else 'failed'] += 1
+        done = counts['ok'] + counts['failed']
+        if done % 100 == 0:
+            rate = done / max(time.time() - started, 1e-9)
+            logging.info(f"{done}/{len(positions)} funds ({rate:.1f}/s)")
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate NAV changes for a list of funds without the dashboard",
+                                     epilog=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('codes', nargs='?', help="File with one fund code (or 'code,amount') per line; '-' for stdin")
+    parser.add_argument('--from-db', action='store_true', help="Use the funds table (with its amounts)")
+    parser.add_argument('-o', '--output', help="Output file (default stdout)")
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help="Default: from the output extension, else jsonl")
+    parser.add_argument('--concurrency', type=int, default=16, help="Worker threads / funds in flight")
+    parser.add_argument('--resume', action='store_true', help="Skip funds already successful in the output file")
+    parser.add_argument('--amount', type=float, default=DEFAULT_AMOUNT, help="Position for codes without an amount")
+    parser.add_argument('--history-days', type=int, default=0, help="Attach NAV history (JSONL only); 0 = none")
+    parser.add_argument('--no-details', action='store_true', help="Omit per-holding details from JSONL")
+    parser.add_argument('--full-holdings', action='store_true',
+                        help="Blend complete interim/annual report holdings into the top ten")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.INFO)
+
+    if args.from_db:
+        positions = load_positions()
+    elif args.codes:
+        if args.codes == '-':
+            positions = parse_codes(sys.stdin, args.amount)
+        else:
+            with open(args.codes, encoding='utf-8') as f:
+                positions = parse_codes(f, args.amount)
+    else:
+        parser.error("give a codes file, '-' for stdin, or --from-db")
+
+    fmt = args.format or ('csv' if args.output and args.output.endswith('.csv') else 'jsonl')
+    if args.resume:
+        if not args.output:
+            parser.error("--resume needs --output")
+        done = completed_codes(args.output, fmt)
+        positions = [p for p in positions if p[0] not in done]
+        logging.info(f"Resuming: {len(done)} funds already done, {len(positions)} to go")
+
+    set_max_concurrency(args.concurrency)
+    if args.full_holdings:
+        set_full_holdings(True)
+    if args.output:
+        append = args.resume and os.path.exists(args.output) and os.path.getsize(args.output) > 0
+        stream = open(args.output, 'a' if append else 'w', encoding='utf-8', newline='')
+    else:
+        append, stream = False, sys.stdout
+    try:
+        writer = ResultWriter(stream, fmt, with_details=not args.no_details, write_header=not append)
+        counts = asyncio.run(run_batch(positions, writer, args.concurrency, args.history_days))
+    except KeyboardInterrupt:
+        logging.warning("Interrupted; rerun with --resume to continue")
+        sys.exit(130)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    logging.info(f"Done: {counts['ok']} ok, {counts['failed']} failed of {counts['total']}")
+    sys.exit(0 if counts['failed'] == 0 else 1)
+
+if __name__ == '__main__':
+    main()
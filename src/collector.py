@@ -0,0 +1,118 @@
+"""
+Background collector: refreshes every fund in the ``funds`` table on a schedule
+and writes the results to ``fund_snapshots`` in funds.db.
+
+Run one collector per database; any number of dashboards then read snapshots
+instead of scraping upstream themselves.
+
+Cycles follow the trading sessions of the markets the book holds (see
+``src.market_hours``): every ``--interval`` seconds while one is open, more
+often near the open and close, rarely while all are closed. Shortly before
+each day's open, holdings, feeder targets and NAV history are refreshed so
+the first cycle of the session only fetches quotes. ``--fixed`` restores a
+plain fixed interval.
+
+    python -m src.collector [--interval 60] [--history-days 365] [--once] [--fixed]
+"""
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from src.async_fetcher import fetch_holdings, run_blocking
+from src.full_holdings_store import set_full_holdings
+from src.fund_store import load_positions
+from src.history_store import sync_fund_history
+from src.holdings_parser import sina_code
+from src.intraday_store import append_points, trading_results
+from src.market_hours import TIMEZONES, markets_of, next_refresh_delay, warmup_due
+from src.metrics import export_configured, start_configured_server
+from src.pipeline import refresh_funds_async
+from src.snapshot_store import record_heartbeat, save_snapshots
+
+async def collect_once(history_days: int = 365) -> List[dict]:
+    """One refresh cycle: estimates for all funds, then incremental history sync."""
+    positions = load_positions()
+    if not positions:
+        return []
+
+    results = await refresh_funds_async(positions)
+    save_snapshots(results)
+    append_points(trading_results(results))
+
+    # History only changes once a day; the store makes this one page request per fund at most hourly
+    successful = [item['基金代码'] for item in results if item['状态'] == '成功']
+    await asyncio.gather(*(run_blocking(sync_fund_history, code, history_days, max_workers=1) for code in successful),
+                         return_exceptions=True)
+    return results
+
+async def warm_up(history_days: int = 365) -> int:
+    """
+    Pre-open pass: refreshes stale holdings (resolving feeder targets) and
+    syncs last night's NAVs, without fetching quotes. Returns funds warmed.
+    """
+    positions = load_positions()
+    codes = [code for code, _ in positions]
+    await asyncio.gather(*(fetch_holdings(code) for code in codes), return_exceptions=True)
+    await asyncio.gather(*(run_blocking(sync_fund_history, code, history_days, max_workers=1) for code in codes),
+                         return_exceptions=True)
+    return len(codes)
+
+def book_markets(results: List[dict]) -> Optional[List[str]]:
+    """Markets traded by the holdings behind `results` (None if unknown, i.e. all)."""
+    codes = [sina_code(None, str(d['code'])) for item in results for d in item.get('Details') or []]
+    return markets_of(codes) or None
+
+def run(interval: float = 60, history_days: int = 365, once: bool = False, fixed: bool = False):
+    """Runs collection cycles until interrupted, on the market schedule unless `fixed`."""
+    # FUND_NAV_METRICS_PORT / FUND_NAV_METRICS_FILE expose this process's refresh metrics
+    start_configured_server()
+    markets = None
+    warmed = {}
+    while True:
+        started = time.time()
+        try:
+            if not fixed and warmup_due(markets, done=warmed):
+                count = asyncio.run(warm_up(history_days))
+                logging.info(f"Pre-open warm-up of {count} funds took {time.time() - started:.1f}s")
+            results = asyncio.run(collect_once(history_days))
+            markets = book_markets(results)
+        except Exception as e:
+            logging.error(f"Collector cycle failed: {e}")
+            results = None
+
+        if fixed:
+            delay, reason = interval, 'fixed interval'
+        else:
+            delay, reason = next_refresh_delay(markets, datetime.fromtimestamp(started, TIMEZONES['a']), interval)
+        if results is not None:
+            duration = time.time() - started
+            # Heartbeat carries the planned gap so dashboards don't call an idle collector dead
+            record_heartbeat(delay, len(results), duration)
+            logging.info(f"Collected {len(results)} funds in {duration:.1f}s; next in {delay:.0f}s ({reason})")
+            export_configured()
+
+        if once:
+            return
+        time.sleep(max(0.0, started + delay - time.time()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh fund estimates into funds.db on a schedule")
+    parser.add_argument('--interval', type=float, default=60, help="Seconds between cycle starts while markets trade")
+    parser.add_argument('--history-days', type=int, default=365, help="NAV history window to keep synced")
+    parser.add_argument('--once', action='store_true', help="Run a single cycle and exit")
+    parser.add_argument('--fixed', action='store_true', help="Ignore trading hours and run every --interval seconds")
+    parser.add_argument('--full-holdings', action='store_true',
+                        help="Blend complete interim/annual report holdings into the top ten")
+    args = parser.parse_args()
+    if args.full_holdings:
+        set_full_holdings(True)
+    try:
+        run(args.interval, args.history_days, args.once, args.fixed)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""
+Shared SQLite database: the funds table plus the data caches of every store.
+
+Connections are long-lived and pooled per database file (``connection``):
+opening one per call cost a file open, schema parsing and a cold statement
+cache on every query. Each connection:
+
+* runs in WAL mode, so the dashboard, collector, batch CLI and API server
+  read while another process writes, and ``synchronous=NORMAL`` (durable
+  across application crashes; a power loss may drop the last commits, which
+  are all refetchable caches or re-enterable positions);
+* keeps up to ``STATEMENT_CACHE`` prepared statements, reused by SQL text;
+* is borrowed by one thread at a time and returned to the pool afterwards,
+  with any transaction the borrower left open rolled back.
+
+``transaction`` wraps a batch of writes in ``BEGIN IMMEDIATE`` ... ``COMMIT``:
+the write lock is taken up front (waiting up to ``BUSY_TIMEOUT``), so a
+transaction never fails halfway when another process started writing first.
+
+The schema is versioned with ``PRAGMA user_version`` and upgraded by
+``MIGRATIONS`` the first time a process connects to a database; stores no
+longer create their tables themselves. Add a migration to change the schema,
+never edit an applied one.
+
+    python -m src.db [--db funds.db]   # migrate and show the schema version
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DB_PATH = os.environ.get('FUND_NAV_DB', 'funds.db')
+
+# Seconds to wait for another connection's write lock
+BUSY_TIMEOUT = 30
+# Idle connections kept per database and process
+POOL_SIZE = int(os.environ.get('FUND_NAV_DB_POOL_SIZE', 8))
+STATEMENT_CACHE = 256
+
+# (version, description, statements), applied in order to databases below that version
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, 'funds', [
+        '''
+        CREATE TABLE IF NOT EXISTS funds (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fund_code TEXT UNIQUE NOT NULL,
+            fund_name TEXT,
+            current_amount REAL NOT NULL,
+            current_holding_profit REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_fund_code ON funds (fund_code)',
+    ]),
+    (2, 'holdings cache', [
+        '''
+        CREATE TABLE IF NOT EXISTS fund_holdings (
+            fund_code TEXT NOT NULL,
+            report_date TEXT NOT NULL,
+            fund_name TEXT,
+            holdings_json TEXT NOT NULL,
+            fetched_at REAL NOT NULL,
+            PRIMARY KEY (fund_code, report_date)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_holdings_fetched ON fund_holdings (fund_code, fetched_at)',
+    ]),
+    (3, 'NAV history', [
+        '''
+        CREATE TABLE IF NOT EXISTS fund_nav_history (
+            fund_code TEXT NOT NULL,
+            nav_date TEXT NOT NULL,
+            nav REAL NOT NULL,
+            PRIMARY KEY (fund_code, nav_date)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS fund_nav_sync (
+            fund_code TEXT PRIMARY KEY,
+            last_date TEXT,
+            total_count INTEGER,
+            synced_at REAL NOT NULL
+        )
+        ''',
+    ]),
+    (4, 'feeder targets and lookups', [
+        '''
+        CREATE TABLE IF NOT EXISTS feeder_targets (
+            fund_code TEXT PRIMARY KEY,
+            fund_name TEXT,
+            target_code TEXT,
+            target_name TEXT,
+            is_override INTEGER NOT NULL DEFAULT 0,
+            resolved_at REAL NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS lookup_cache (
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT,
+            fetched_at REAL NOT NULL,
+            PRIMARY KEY (kind, key)
+        )
+        ''',
+    ]),
+    (5, 'collector snapshots', [
+        '''
+        CREATE TABLE IF NOT EXISTS fund_snapshots (
+            fund_code TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS collector_status (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_run_at REAL NOT NULL,
+            interval_seconds REAL NOT NULL,
+            fund_count INTEGER NOT NULL,
+            duration_seconds REAL NOT NULL
+        )
+        ''',
+    ]),
+    (6, 'intraday points', [
+        '''
+        CREATE TABLE IF NOT EXISTS fund_intraday (
+            fund_code TEXT NOT NULL,
+            trade_date TEXT NOT NULL,
+            minute TEXT NOT NULL,
+            estimate REAL NOT NULL,
+            PRIMARY KEY (fund_code, trade_date, minute)
+        ) WITHOUT ROWID
+        ''',
+    ]),
+    (7, 'quote cache', [
+        '''
+        CREATE TABLE IF NOT EXISTS quote_cache (
+            code TEXT PRIMARY KEY,
+            name TEXT,
+            price REAL,
+            change REAL,
+            fetched_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_quote_cache_accessed ON quote_cache (accessed_at)',
+    ]),
+    (8, 'full holdings', [
+        '''
+        CREATE TABLE IF NOT EXISTS fund_full_holdings (
+            fund_code TEXT NOT NULL,
+            report_date TEXT NOT NULL,
+            fund_name TEXT,
+            codes_json TEXT NOT NULL,
+            names_json TEXT NOT NULL,
+            fetch_codes_json TEXT NOT NULL,
+            weights BLOB NOT NULL,
+            fetched_at REAL NOT NULL,
+            PRIMARY KEY (fund_code, report_date)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_full_holdings_fetched ON fund_full_holdings (fund_code, fetched_at)',
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+_migrated = set()
+_migrate_lock = threading.Lock()
+# (pid, path) -> idle connections; keyed by pid so a forked child never reuses its parent's
+_pools: Dict[Tuple[int, str], List[sqlite3.Connection]] = {}
+_pools_lock = threading.Lock()
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Applies pending migrations, each in its own transaction. Returns the resulting version."""
+    for version, description, statements in MIGRATIONS:
+        if schema_version(conn) >= version:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Another process may have migrated while we waited for the lock
+            if schema_version(conn) < version:
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {version}')
+                logging.info(f"Migrated database to version {version} ({description})")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return schema_version(conn)
+
+def connect(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Opens a new configured connection, migrating the schema on this process's
+    first connection to the file. Prefer the pooled ``connection``.
+    """
+    path = db_path or DB_PATH
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False,
+                           cached_statements=STATEMENT_CACHE)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    if path not in _migrated:
+        with _migrate_lock:
+            if path not in _migrated:
+                migrate(conn)
+                _migrated.add(path)
+    return conn
+
+@contextmanager
+def connection(db_path: Optional[str] = None) -> Iterator[sqlite3.Connection]:
+    """Borrows a pooled connection (dict-like rows) for the duration of the block."""
+    key = (os.getpid(), db_path or DB_PATH)
+    with _pools_lock:
+        idle = _pools.get(key)
+        conn = idle.pop() if idle else None
+    if conn is None:
+        conn = connect(key[1])
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        with _pools_lock:
+            idle = _pools.setdefault(key, [])
+            if len(idle) < POOL_SIZE:
+                idle.append(conn)
+                conn = None
+        if conn is not None:
+            conn.close()
+
+@contextmanager
+def transaction(db_path: Optional[str] = None) -> Iterator[sqlite3.Connection]:
+    """Pooled connection inside BEGIN IMMEDIATE ... COMMIT, rolled back if the block raises."""
+    with connection(db_path) as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+def close_all():
+    """Closes this process's idle connections (e.g. before deleting a database file)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for idle in pools:
+        for conn in idle:
+            conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate the application database and show its schema version")
+    parser.add_argument('--db', default=DB_PATH, help="Database file")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.INFO)
+    with connection(args.db) as conn:
+        print(f"{args.db}: schema version {schema_version(conn)} (latest {SCHEMA_VERSION})")
+
+if __name__ == '__main__':
+    main()
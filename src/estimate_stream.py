@@ -0,0 +1,224 @@
+"""
+Push feed of estimate changes for the API server's server-sent events endpoint.
+
+One ``EstimateBroadcaster`` per process refreshes the union of all subscribed
+funds every ``interval`` seconds through the normal pipeline (one quote fetch
+per tick), diffs each fund against its previous state and publishes only the
+funds whose estimate or constituent quotes moved. Every published delta gets
+the next sequence number; subscribers only receive the funds they asked for,
+so a client sees increasing but not necessarily consecutive ``seq`` values.
+
+A new subscriber first gets a snapshot of its funds at the current sequence.
+A reconnecting client that sends ``Last-Event-ID`` is replayed the deltas it
+missed from a bounded in-memory log instead, or gets a fresh snapshot when the
+log no longer reaches back that far. Funds nobody watches are forgotten; when
+one is watched again its fresh estimate is logged as a full delta, and replay
+requires every requested fund's deltas since ``Last-Event-ID`` to be logged.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from src.metrics import inc, timer
+from src.pipeline import refresh_funds
+
+STREAM_INTERVAL = float(os.environ.get('FUND_NAV_STREAM_INTERVAL', 10))
+# Deltas kept for Last-Event-ID replay
+REPLAY_LOG_SIZE = 1000
+# Per-subscriber backlog; a client this far behind is dropped and must reconnect
+SUBSCRIBER_QUEUE_SIZE = 256
+
+_FUND_FIELDS = ('name', 'report_date', 'ok', 'status', 'change', 'weight')
+_DETAIL_FIELDS = ('price', 'change')
+
+def diff_estimate(old: Optional[Dict], new: Dict) -> Optional[Dict]:
+    """
+    Compact delta between two estimate payloads of one fund, or None if nothing
+    a client displays changed. Holdings are keyed by code; only moved ones are sent.
+    """
+    if old is None:
+        return new
+    delta = {field: new[field] for field in _FUND_FIELDS if new.get(field) != old.get(field)}
+    old_details = {d['code']: d for d in old.get('details') or []}
+    new_details = new.get('details') or []
+    if [d['code'] for d in new_details] != list(old_details):
+        # Holdings themselves changed (new report): send the full list
+        delta['details'] = new_details
+    else:
+        moved = [{'code': d['code'], **{f: d[f] for f in _DETAIL_FIELDS}} for d in new_details
+                 if any(d[f] != old_details[d['code']][f] for f in _DETAIL_FIELDS)]
+        if moved:
+            delta['details_changed'] = moved
+    if not delta:
+        return None
+    delta['code'] = new['code']
+    delta['updated'] = new.get('updated')
+    return delta
+
+class Subscription:
+    def __init__(self, codes: Set[str]):
+        self.codes = codes
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.closed = False
+
+    def get(self, timeout: float) -> Optional[Dict]:
+        """Next event ({'event', 'seq', 'data'}), or None after `timeout` seconds."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class EstimateBroadcaster:
+    """Refreshes subscribed funds on a timer and fans out deltas to subscribers."""
+
+    def __init__(self, estimate_payload: Callable[[Dict], Dict], interval: float = STREAM_INTERVAL,
+                 on_refresh: Optional[Callable[[Dict], None]] = None):
+        """
+        Args:
+            estimate_payload: Converts a pipeline result row to the API payload
+            interval: Seconds between refreshes while anyone is subscribed
+            on_refresh: Called with each fresh payload (e.g. to warm the API cache)
+        """
+        self.estimate_payload = estimate_payload
+        self.interval = interval
+        self.on_refresh = on_refresh
+        self.seq = 0
+        self._state: Dict[str, Dict] = {}
+        # Sequence of the full delta each known fund was (re)seeded with; the
+        # log holds every change of the fund from there on
+        self._watched_since: Dict[str, int] = {}
+        self._log = deque(maxlen=REPLAY_LOG_SIZE)
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _watched_codes(self) -> List[str]:
+        with self._lock:
+            return sorted(set().union(*(s.codes for s in self._subscribers)))
+
+    def _refresh(self, codes: Iterable[str]) -> Dict[str, Dict]:
+        payloads = {}
+        for item in refresh_funds([(code, 0.0) for code in codes]):
+            payload = self.estimate_payload(item)
+            payloads[payload['code']] = payload
+            if self.on_refresh:
+                self.on_refresh(payload)
+        return payloads
+
+    def tick(self) -> int:
+        """One refresh of every watched fund; returns the number of changed funds."""
+        codes = self._watched_codes()
+        if not codes:
+            return 0
+        with timer('stream_tick'):
+            payloads = self._refresh(codes)
+        with self._lock:
+            changes = {}
+            for code, payload in payloads.items():
+                delta = diff_estimate(self._state.get(code), payload)
+                self._state[code] = payload
+                if delta is not None:
+                    changes[code] = delta
+            self._publish(changes)
+        inc('stream_deltas_total', len(changes))
+        return len(changes)
+
+    def _publish(self, changes: Dict[str, Dict]):
+        """Logs `changes` under the next sequence and queues them for their subscribers. Call with the lock held."""
+        if not changes:
+            return
+        self.seq += 1
+        self._log.append((self.seq, changes))
+        for code in changes:
+            self._watched_since.setdefault(code, self.seq)
+        for sub in list(self._subscribers):
+            funds = [changes[code] for code in sub.codes if code in changes]
+            if funds:
+                self._offer(sub, {'event': 'delta', 'seq': self.seq, 'data': {'seq': self.seq, 'funds': funds}})
+
+    def _offer(self, sub: Subscription, event: Dict):
+        try:
+            sub.queue.put_nowait(event)
+        except queue.Full:
+            logging.warning("Dropping a stream subscriber that stopped reading")
+            sub.closed = True
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def subscribe(self, codes: Iterable[str], last_seq: Optional[int] = None) -> Subscription:
+        """
+        Registers a subscriber and queues its first events: the missed deltas
+        after `last_seq` when the replay log still covers them, else a snapshot.
+        """
+        sub = Subscription(set(codes))
+        with self._lock:
+            unknown = [code for code in sub.codes if code not in self._state]
+        if unknown:
+            # First watcher of these funds: estimate them now rather than at the next tick
+            fresh = self._refresh(unknown)
+            with self._lock:
+                # Log the (re)seeded estimates as a full delta: a client that
+                # saw these funds before they were forgotten must not be
+                # replayed past the change
+                self._publish({code: payload for code, payload in fresh.items()
+                               if self._state.setdefault(code, payload) is payload})
+
+        with self._lock:
+            replay = None
+            # Replay only if the log holds every change of every fund since last_seq
+            if (last_seq is not None and 0 <= last_seq <= self.seq
+                    and all(code in self._watched_since and last_seq + 1 >= self._watched_since[code]
+                            for code in sub.codes)):
+                oldest = self._log[0][0] if self._log else self.seq + 1
+                if last_seq + 1 >= oldest and self.seq - last_seq < SUBSCRIBER_QUEUE_SIZE:
+                    replay = [(seq, changes) for seq, changes in self._log if seq > last_seq]
+            if replay is not None:
+                for seq, changes in replay:
+                    funds = [changes[code] for code in sub.codes if code in changes]
+                    if funds:
+                        self._offer(sub, {'event': 'delta', 'seq': seq, 'data': {'seq': seq, 'funds': funds}})
+            else:
+                funds = [self._state[code] for code in sorted(sub.codes) if code in self._state]
+                sub.queue.put_nowait({'event': 'snapshot', 'seq': self.seq, 'data': {'seq': self.seq, 'funds': funds}})
+            self._subscribers.append(sub)
+        inc('stream_subscribers_total')
+        self._ensure_running()
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+            # Forget funds nobody watches any more so a later subscriber gets fresh numbers
+            watched = set().union(*(s.codes for s in self._subscribers))
+            for code in [c for c in self._state if c not in watched]:
+                del self._state[code]
+                self._watched_since.pop(code, None)
+        sub.closed = True
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name='estimate-stream')
+                self._thread.start()
+
+    def _run(self):
+        """Ticks until the last subscriber leaves; the next subscribe starts a new thread."""
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            try:
+                self.tick()
+            except Exception as e:
+                logging.error(f"Estimate stream refresh failed: {e}")
@@ -0,0 +1,155 @@
+"""
+Persistent resolution cache for ETF feeder funds.
+
+A feeder's target ETF practically never changes, yet resolving it costs a
+name-backup scrape plus one or two Sina Suggest lookups. Resolutions are kept
+in ``feeder_targets`` (with manual overrides that never expire), and the
+underlying name/suggest lookups are memoized in ``lookup_cache`` so every
+process sharing funds.db benefits from the first resolution.
+
+Manage overrides from the command line:
+
+    python -m src.feeder_store list
+    python -m src.feeder_store set 002611 518880 [--name 黄金ETF]
+    python -m src.feeder_store clear 002611
+"""
+import argparse
+import logging
+import time
+from typing import Callable, Dict, List, Optional
+
+from src.db import connection
+from src.metrics import cache_lookup
+
+# Auto-resolved fund -> ETF mappings
+FEEDER_TTL = 30 * 24 * 3600
+# "No target found" results, retried sooner
+NEGATIVE_TTL = 24 * 3600
+# Memoized fund-name scrapes and suggest lookups
+LOOKUP_TTL = 30 * 24 * 3600
+
+
+def get_feeder_target(fund_code: str, db_path: Optional[str] = None) -> Optional[Dict]:
+    """
+    Returns the stored resolution for a fund if it is an override or still fresh.
+
+    Returns:
+        Dict: {'fund_name', 'target_code' (None = known not resolvable), 'target_name', 'is_override'} or None
+    """
+    with connection(db_path) as conn:
+        row = conn.execute('SELECT * FROM feeder_targets WHERE fund_code = ?', (fund_code,)).fetchone()
+
+    if not row:
+        return None
+    row = dict(row)
+    if not row['is_override']:
+        ttl = FEEDER_TTL if row['target_code'] else NEGATIVE_TTL
+        if time.time() - row['resolved_at'] > ttl:
+            return None
+    row['is_override'] = bool(row['is_override'])
+    return row
+
+def get_feeder_override(fund_code: str, db_path: Optional[str] = None) -> Optional[Dict]:
+    """Returns the manual override for a fund, if one is set."""
+    target = get_feeder_target(fund_code, db_path)
+    return target if target and target['is_override'] else None
+
+def save_feeder_target(fund_code: str, fund_name: Optional[str], target_code: Optional[str],
+                       target_name: Optional[str], db_path: Optional[str] = None):
+    """Records an automatic resolution; never replaces a manual override."""
+    try:
+        with connection(db_path) as conn:
+            conn.execute('''
+            INSERT INTO feeder_targets (fund_code, fund_name, target_code, target_name, is_override, resolved_at)
+            VALUES (?, ?, ?, ?, 0, ?)
+            ON CONFLICT(fund_code) DO UPDATE SET
+                fund_name = excluded.fund_name, target_code = excluded.target_code,
+                target_name = excluded.target_name, resolved_at = excluded.resolved_at
+            WHERE feeder_targets.is_override = 0
+            ''', (fund_code, fund_name, target_code, target_name, time.time()))
+            conn.commit()
+    except Exception as e:
+        logging.error(f"Error saving feeder target for {fund_code}: {e}")
+
+def set_feeder_override(fund_code: str, target_code: str, target_name: str = '',
+                        fund_name: Optional[str] = None, db_path: Optional[str] = None):
+    """Pins a fund to a target ETF code, bypassing automatic resolution."""
+    # Imported here: holdings_store depends on data_fetcher, which depends on this module
+    from src.holdings_store import invalidate_holdings
+
+    with connection(db_path) as conn:
+        conn.execute('''
+        INSERT OR REPLACE INTO feeder_targets (fund_code, fund_name, target_code, target_name, is_override, resolved_at)
+        VALUES (?, COALESCE(?, (SELECT fund_name FROM feeder_targets WHERE fund_code = ?)), ?, ?, 1, ?)
+        ''', (fund_code, fund_name, fund_code, target_code, target_name or target_code, time.time()))
+        conn.commit()
+    # Cached holdings may still point at the previous target
+    invalidate_holdings(fund_code, db_path)
+
+def clear_feeder_target(fund_code: str, db_path: Optional[str] = None):
+    """Removes any stored resolution (automatic or override) for a fund."""
+    from src.holdings_store import invalidate_holdings
+
+    with connection(db_path) as conn:
+        conn.execute('DELETE FROM feeder_targets WHERE fund_code = ?', (fund_code,))
+        conn.commit()
+    invalidate_holdings(fund_code, db_path)
+
+def list_feeder_targets(db_path: Optional[str] = None) -> List[Dict]:
+    """All stored resolutions, overrides first."""
+    with connection(db_path) as conn:
+        rows = conn.execute('SELECT * FROM feeder_targets ORDER BY is_override DESC, fund_code').fetchall()
+    return [dict(row) for row in rows]
+
+def cached_lookup(kind: str, key: str, fetch: Callable[[], Optional[str]],
+                  ttl: float = LOOKUP_TTL, db_path: Optional[str] = None) -> Optional[str]:
+    """
+    Memoizes a string lookup (fund name scrape, suggest search) across processes.
+    Empty results are cached too, but only for NEGATIVE_TTL; if `fetch`
+    raises, nothing is cached and the error propagates.
+    """
+    with connection(db_path) as conn:
+        row = conn.execute('SELECT value, fetched_at FROM lookup_cache WHERE kind = ? AND key = ?',
+                           (kind, key)).fetchone()
+
+    if row:
+        age = time.time() - row['fetched_at']
+        if age <= (ttl if row['value'] else min(ttl, NEGATIVE_TTL)):
+            cache_lookup(kind, hit=True)
+            return row['value']
+
+    cache_lookup(kind, hit=False)
+    value = fetch()
+
+    try:
+        with connection(db_path) as conn:
+            conn.execute('INSERT OR REPLACE INTO lookup_cache (kind, key, value, fetched_at) VALUES (?, ?, ?, ?)',
+                         (kind, key, value, time.time()))
+            conn.commit()
+    except Exception as e:
+        logging.warning(f"Error caching {kind} lookup for {key}: {e}")
+    return value
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage ETF feeder target resolutions")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help="Show stored resolutions")
+    set_parser = sub.add_parser('set', help="Pin a fund to a target ETF")
+    set_parser.add_argument('fund_code')
+    set_parser.add_argument('target_code')
+    set_parser.add_argument('--name', default='', help="Target display name")
+    clear_parser = sub.add_parser('clear', help="Drop a stored resolution or override")
+    clear_parser.add_argument('fund_code')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for row in list_feeder_targets():
+            kind = 'override' if row['is_override'] else 'auto'
+            print(f"{row['fund_code']}\t{row['target_code'] or '--'}\t{row['target_name'] or ''}\t{kind}")
+    elif args.command == 'set':
+        set_feeder_override(args.fund_code, args.target_code, args.name)
+    elif args.command == 'clear':
+        clear_feeder_target(args.fund_code)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""
+Complete holdings from interim/annual reports, blended with the latest top ten.
+
+Quarterly reports only disclose a fund's ten largest positions, which the
+estimate then normalizes to 100%. Interim (06-30) and annual (12-31) reports
+list every security, often 100-500 of them, so with full holdings enabled
+(``FUND_NAV_FULL_HOLDINGS=1`` or ``set_full_holdings``) each fund is
+estimated on:
+
+* the latest top ten, at their latest weights, plus
+* the rest of the last complete list, scaled into the weight the new top ten
+  leave of that report's equity allocation (and capped at the smallest top-ten
+  weight, since anything outside the top ten can't outweigh the tenth).
+
+When the complete list is as recent as the top ten it is used as is.
+
+Lists are stored once per report period in ``fund_full_holdings`` with the
+weights as a packed float64 array and the codes as JSON arrays, and are only
+refetched in the months a new report can appear. Blending works on those
+arrays; the result is an ordinary holdings list, so quotes are still fetched
+once per distinct security for the whole book and valuation packs it into the
+same sparse weight matrix as top-ten holdings.
+"""
+import json
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.data_fetcher import get_fund_full_holdings, single_flight
+from src.db import connection
+from src.holdings_store import get_fund_holdings_cached
+from src.metrics import cache_lookup, inc
+
+ENABLED = os.environ.get('FUND_NAV_FULL_HOLDINGS', '') not in ('', '0')
+
+# Interim reports are due two months after 06-30, annual reports three months after 12-31
+DISCLOSURE_WINDOW_DAYS = {6: 62, 12: 91}
+# Re-check interval while a new report may appear any day
+WINDOW_RECHECK_SECONDS = 24 * 3600
+# Re-check interval otherwise (late filers, funds without a complete list)
+RECHECK_SECONDS = 7 * 24 * 3600
+
+
+def set_full_holdings(enabled: bool):
+    """Switches estimation between top-ten and blended full holdings for this process."""
+    global ENABLED
+    ENABLED = enabled
+
+def latest_report_period_end(today: date) -> date:
+    """The most recent 06-30 or 12-31 strictly before ``today``."""
+    candidate = date(today.year, 6, 30)
+    if candidate < today:
+        return candidate
+    return date(today.year - 1, 12, 31)
+
+def is_stale(report_date: str, fetched_at: float, now: Optional[float] = None) -> bool:
+    """Whether a stored complete list needs to be refetched (see holdings_store.is_stale)."""
+    if fetched_at <= 0:
+        return True
+    now = now if now is not None else time.time()
+    age = now - fetched_at
+    today = datetime.fromtimestamp(now).date()
+    expected = latest_report_period_end(today)
+    try:
+        period = datetime.strptime(report_date, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        # No complete list published
+        period = None
+    if period is not None and period >= expected:
+        return False
+    if today <= expected + timedelta(days=DISCLOSURE_WINDOW_DAYS[expected.month]):
+        return age > WINDOW_RECHECK_SECONDS
+    return age > RECHECK_SECONDS
+
+def _pack(fund_name: str, holdings: List[Dict], report_date: str) -> Dict:
+    return {
+        'fund_name': fund_name,
+        'report_date': report_date,
+        'codes': [h['code'] for h in holdings],
+        'names': [h.get('name', '') for h in holdings],
+        'fetch_codes': [h.get('fetch_code') or h['code'] for h in holdings],
+        'weights': np.array([h.get('weight', 0.0) for h in holdings], dtype=np.float64)
+    }
+
+def load_full_holdings(fund_code: str, db_path: Optional[str] = None) -> Optional[Tuple[Dict, float]]:
+    """
+    Loads the most recently fetched complete list of a fund.
+
+    Returns:
+        tuple: ({'fund_name', 'report_date', 'codes', 'names', 'fetch_codes', 'weights'}, fetched_at) or None
+    """
+    with connection(db_path) as conn:
+        row = conn.execute('''
+        SELECT fund_name, report_date, codes_json, names_json, fetch_codes_json, weights, fetched_at
+        FROM fund_full_holdings WHERE fund_code = ? ORDER BY fetched_at DESC, report_date DESC LIMIT 1
+        ''', (fund_code,)).fetchone()
+
+    if not row:
+        return None
+    full = {
+        'fund_name': row['fund_name'],
+        'report_date': row['report_date'],
+        'codes': json.loads(row['codes_json']),
+        'names': json.loads(row['names_json']),
+        'fetch_codes': json.loads(row['fetch_codes_json']),
+        'weights': np.frombuffer(row['weights'], dtype=np.float64)
+    }
+    return full, row['fetched_at']
+
+def save_full_holdings(fund_code: str, full: Dict, db_path: Optional[str] = None):
+    """Stores a packed complete list as the fund's latest."""
+    try:
+        with connection(db_path) as conn:
+            conn.execute('''
+            INSERT OR REPLACE INTO fund_full_holdings
+            (fund_code, report_date, fund_name, codes_json, names_json, fetch_codes_json, weights, fetched_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (fund_code, full['report_date'], full['fund_name'],
+                  json.dumps(full['codes'], ensure_ascii=False), json.dumps(full['names'], ensure_ascii=False),
+                  json.dumps(full['fetch_codes'], ensure_ascii=False),
+                  np.ascontiguousarray(full['weights'], dtype=np.float64).tobytes(), time.time()))
+            conn.commit()
+    except Exception as e:
+        logging.error(f"Error saving full holdings for {fund_code}: {e}")
+
+@single_flight('full_holdings_cached',
+               key=lambda fund_code, force_refresh=False, db_path=None: (fund_code, force_refresh, db_path))
+def get_full_holdings_cached(fund_code: str, force_refresh: bool = False,
+                             db_path: Optional[str] = None) -> Optional[Dict]:
+    """
+    Packed complete list of a fund (see load_full_holdings), served from the
+    store unless stale. Its 'weights' array is shared: don't modify it.
+    """
+    cached = load_full_holdings(fund_code, db_path)
+    if cached and not force_refresh:
+        full, fetched_at = cached
+        if not is_stale(full['report_date'], fetched_at):
+            cache_lookup('full_holdings', hit=True)
+            return full
+
+    cache_lookup('full_holdings', hit=False)
+    result_data = get_fund_full_holdings(fund_code)
+    if result_data:
+        full = _pack(*result_data)
+        save_full_holdings(fund_code, full, db_path)
+        return full
+
+    if cached:
+        logging.warning(f"Using stale full holdings for {fund_code} from {cached[0]['report_date']}")
+        inc('holdings_stale_fallback_total')
+        return cached[0]
+    return None
+
+def blend_holdings(top: List[Dict], top_date: str, full: Dict) -> List[Dict]:
+    """
+    Combines the latest top-ten holdings with a packed complete list (see the
+    module docstring). Returns the top ten followed by the remaining
+    securities, largest first.
+    """
+    weights = full['weights']
+    if not len(weights):
+        return top
+    if full['report_date'] >= top_date:
+        # The complete list is the latest disclosure: it already contains the top ten
+        order = np.argsort(-weights, kind='stable')
+        return [{'code': full['codes'][i], 'name': full['names'][i], 'weight': weight,
+                 'fetch_code': full['fetch_codes'][i]} for i, weight in zip(order.tolist(), weights[order].tolist())]
+
+    top_codes = {h.get('fetch_code') or h['code'] for h in top}
+    tail = np.fromiter((code not in top_codes for code in full['fetch_codes']), dtype=bool, count=len(weights))
+    tail_weights = weights[tail]
+    tail_total = tail_weights.sum()
+    if tail_total <= 0:
+        return top
+    top_weights = [h.get('weight', 0.0) for h in top]
+    room = max(weights.sum() - sum(top_weights), 0.0)
+    tail_weights = tail_weights * (room / tail_total)
+    if top_weights:
+        np.minimum(tail_weights, min(top_weights), out=tail_weights)
+
+    index = np.flatnonzero(tail)
+    order = np.argsort(-tail_weights, kind='stable')
+    blended = list(top)
+    for i, weight in zip(index[order].tolist(), tail_weights[order].tolist()):
+        if weight > 0:
+            blended.append({'code': full['codes'][i], 'name': full['names'][i], 'weight': weight,
+                            'fetch_code': full['fetch_codes'][i]})
+    return blended
+
+def get_fund_holdings_blended(fund_code: str, db_path: Optional[str] = None) -> Optional[Tuple[str, List[Dict], str]]:
+    """
+    get_fund_holdings_cached with the tail of the last complete list blended
+    in. Feeder funds and funds without a complete list keep their top ten;
+    the report date stays that of the top ten.
+    """
+    result_data = get_fund_holdings_cached(fund_code, db_path=db_path)
+    if not result_data:
+        return result_data
+    fund_name, top, report_date = result_data
+    try:
+        datetime.strptime(report_date, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        # Feeder tracking its target ETF
+        return result_data
+    full = get_full_holdings_cached(fund_code, db_path=db_path)
+    if not full:
+        return result_data
+    return fund_name, blend_holdings(top, report_date, full), report_date
+
+def get_estimation_holdings(fund_code: str, db_path: Optional[str] = None) -> Optional[Tuple[str, List[Dict], str]]:
+    """Holdings used for estimates: blended full holdings when enabled, else the cached top ten."""
+    if ENABLED:
+        return get_fund_holdings_blended(fund_code, db_path)
+    return get_fund_holdings_cached(fund_code, db_path=db_path)
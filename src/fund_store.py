@@ -0,0 +1,89 @@
+"""
+The user's positions: one row per fund in ``funds`` with the amount held.
+
+Written by the dashboard, read by the dashboard, collector and batch CLI.
+"""
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.db import connection, transaction
+
+def get_all_funds(db_path: Optional[str] = None) -> List[Dict]:
+    """Every fund row, ordered by code."""
+    with connection(db_path) as conn:
+        rows = conn.execute('SELECT * FROM funds ORDER BY fund_code').fetchall()
+    return [dict(row) for row in rows]
+
+def load_positions(db_path: Optional[str] = None) -> List[Tuple[str, float]]:
+    """(fund_code, current_amount) for every fund in the funds table."""
+    with connection(db_path) as conn:
+        rows = conn.execute('SELECT fund_code, current_amount FROM funds ORDER BY fund_code').fetchall()
+    return [(row['fund_code'], row['current_amount']) for row in rows]
+
+def save_funds(funds: Iterable[Tuple[str, str, float]], db_path: Optional[str] = None) -> int:
+    """
+    Adds or replaces (fund_code, fund_name, current_amount) rows in one
+    transaction, resetting their holding profit. Returns rows written.
+    """
+    rows = [(code, name, amount) for code, name, amount in funds]
+    with transaction(db_path) as conn:
+        conn.executemany('''
+        INSERT OR REPLACE INTO funds (fund_code, fund_name, current_amount, current_holding_profit, updated_at)
+        VALUES (?, ?, ?, 0, CURRENT_TIMESTAMP)
+        ''', rows)
+    return len(rows)
+
+def existing_codes(db_path: Optional[str] = None) -> Set[str]:
+    with connection(db_path) as conn:
+        return {row['fund_code'] for row in conn.execute('SELECT fund_code FROM funds')}
+
+def upsert_funds(funds: Iterable[Tuple[str, str, float]], db_path: Optional[str] = None) -> Tuple[List[str], List[str]]:
+    """
+    Adds (fund_code, fund_name, current_amount) rows in one transaction. Funds
+    already held get the new amount, and the new name unless it is empty;
+    their holding profit is kept. Returns (added codes, updated codes).
+    """
+    rows = [(code, name, amount) for code, name, amount in funds]
+    with transaction(db_path) as conn:
+        held = {row['fund_code'] for row in conn.execute('SELECT fund_code FROM funds')}
+        conn.executemany('''
+        INSERT INTO funds (fund_code, fund_name, current_amount, current_holding_profit, updated_at)
+        VALUES (?, ?, ?, 0, CURRENT_TIMESTAMP)
+        ON CONFLICT(fund_code) DO UPDATE SET
+            current_amount = excluded.current_amount,
+            fund_name = COALESCE(NULLIF(excluded.fund_name, ''), fund_name),
+            updated_at = CURRENT_TIMESTAMP
+        ''', rows)
+    codes = [code for code, _, _ in rows]
+    return [c for c in codes if c not in held], [c for c in codes if c in held]
+
+def add_fund(fund_code: str, current_amount: float, fund_name: str = '', db_path: Optional[str] = None) -> bool:
+    """Adds a fund (replacing an existing row for the code)."""
+    try:
+        save_funds([(fund_code, fund_name, current_amount)], db_path)
+        return True
+    except Exception as e:
+        logging.error(f"Error adding fund {fund_code}: {e}")
+        return False
+
+def update_fund(fund_code: str, current_amount: float, current_holding_profit: float, fund_name: str = '',
+                db_path: Optional[str] = None) -> bool:
+    try:
+        with transaction(db_path) as conn:
+            conn.execute('''
+            UPDATE funds SET fund_name = ?, current_amount = ?, current_holding_profit = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE fund_code = ?
+            ''', (fund_name, current_amount, current_holding_profit, fund_code))
+        return True
+    except Exception as e:
+        logging.error(f"Error updating fund {fund_code}: {e}")
+        return False
+
+def delete_fund(fund_code: str, db_path: Optional[str] = None) -> bool:
+    try:
+        with transaction(db_path) as conn:
+            conn.execute('DELETE FROM funds WHERE fund_code = ?', (fund_code,))
+        return True
+    except Exception as e:
+        logging.error(f"Error deleting fund {fund_code}: {e}")
+        return False
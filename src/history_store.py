@@ -0,0 +1,216 @@
+"""
+Incremental, SQLite-backed NAV history.
+
+Each fund's official NAV series is persisted in ``fund_nav_history`` with a
+high-water mark (latest stored date) in ``fund_nav_sync``. An update pulls
+page 1 of the EastMoney ``lsjz`` API and keeps paging only until it overlaps
+rows we already have, so a warm fund costs one request per sync. A new fund is
+backfilled using the API's TotalCount to fetch exactly the pages needed.
+
+Reads go through the memory-mapped mirror in ``src.nav_columns``, which every
+sync that stores rows refreshes: a range read is a binary search over int day
+numbers instead of a SQL query plus string-to-datetime parsing.
+"""
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.db import connection, transaction
+from src.data_fetcher import fetch_fund_nav_page, single_flight
+from src.metrics import cache_lookup, timed
+from src.nav_columns import from_days, get_store, to_days, today_days, write_fund
+
+PAGE_SIZE = 20
+# Official NAVs are published once per trading day, in the evening
+MIN_SYNC_INTERVAL = 3600
+# Roughly 250 trading days per 365 calendar days
+TRADING_DAYS_PER_YEAR = 250
+# Upper bound for incremental paging before falling back to a backfill
+MAX_INCREMENTAL_PAGES = 5
+
+
+def _parse_records(records: List[Dict]) -> List[tuple]:
+    """LSJZList records -> [(nav_date, nav)], skipping rows without a unit NAV."""
+    rows = []
+    for r in records:
+        try:
+            nav_date = r.get('FSRQ')
+            nav = float(r.get('DWJZ'))
+        except (TypeError, ValueError):
+            continue
+        if nav_date:
+            rows.append((nav_date, nav))
+    return rows
+
+def _needed_rows(days: int) -> int:
+    """Rows needed to cover `days` calendar days, plus a page of slack."""
+    return math.ceil(days * TRADING_DAYS_PER_YEAR / 365) + PAGE_SIZE
+
+def _fetch_pages(fund_code: str, pages: List[int], max_workers: int = 5) -> List[Dict]:
+    records = []
+    if not pages:
+        return records
+    if max_workers <= 1:
+        # Caller is already running on a shared worker pool
+        for p in pages:
+            records.extend(fetch_fund_nav_page(fund_code, p, PAGE_SIZE)[0])
+        return records
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(pages))) as executor:
+        for page_records, _ in executor.map(lambda p: fetch_fund_nav_page(fund_code, p, PAGE_SIZE), pages):
+            records.extend(page_records)
+    return records
+
+# One sync per fund at a time; concurrent callers (sessions, collector) share its outcome
+@single_flight('history_sync', key=lambda fund_code, days=365, force=False, db_path=None, max_workers=5:
+               (fund_code, days, force, db_path))
+@timed('history_sync')
+def sync_fund_history(fund_code: str, days: int = 365, force: bool = False,
+                      db_path: Optional[str] = None, max_workers: int = 5) -> int:
+    """
+    Brings the stored history for a fund up to date.
+
+    Args:
+        fund_code: Fund code
+        days: Calendar days of history that should be available locally
+        force: Ignore MIN_SYNC_INTERVAL
+        max_workers: Parallelism for backfill pages (1 = sequential, no extra threads)
+
+    Returns:
+        int: Number of upstream page requests made
+    """
+    with connection(db_path) as conn:
+        meta = conn.execute('SELECT last_date, total_count, synced_at FROM fund_nav_sync WHERE fund_code = ?',
+                            (fund_code,)).fetchone()
+        stored = conn.execute('SELECT COUNT(*) FROM fund_nav_history WHERE fund_code = ?',
+                              (fund_code,)).fetchone()[0]
+
+    needed = _needed_rows(days)
+    last_date = meta['last_date'] if meta else None
+    total_count = meta['total_count'] if meta else None
+
+    if meta and not force and time.time() - meta['synced_at'] < MIN_SYNC_INTERVAL:
+        # Recently synced; only a coverage extension (larger `days`) can need the network
+        if stored >= min(needed, total_count or 0):
+            cache_lookup('history', hit=True)
+            return 0
+    cache_lookup('history', hit=False)
+
+    requests_made = 0
+    new_rows = []
+
+    # 1. Newest data: page 1, then further pages only until we reach the high-water mark
+    page = 1
+    reached_known = False
+    failed = False
+    while page <= MAX_INCREMENTAL_PAGES:
+        records, total = fetch_fund_nav_page(fund_code, page, PAGE_SIZE)
+        requests_made += 1
+        if not records:
+            failed = True
+            break
+        total_count = total or total_count
+        rows = _parse_records(records)
+        fresh = [r for r in rows if last_date is None or r[0] > last_date]
+        new_rows.extend(fresh)
+        if last_date is None or len(fresh) < len(rows):
+            reached_known = True
+            break
+        page += 1
+
+    if failed and not reached_known:
+        # Upstream failure before reaching known data; storing a partial page
+        # would leave a hole below the high-water mark, so retry next time
+        return requests_made
+
+    if not reached_known:
+        # Gap too large to page through incrementally: rebuild the window from scratch
+        logging.info(f"NAV history for {fund_code} has a gap after {last_date}; re-backfilling")
+        stored = 0
+
+    # 2. Backfill: stored rows are the newest contiguous ones, so fetch exactly
+    # the pages holding rows [covered, target)
+    covered = stored + len(new_rows)
+    target = min(needed, total_count or 0)
+    if covered < target:
+        first_page = max(covered // PAGE_SIZE + 1, 2 if last_date is None else 1)
+        pages = list(range(first_page, math.ceil(target / PAGE_SIZE) + 1))
+        new_rows.extend(_parse_records(_fetch_pages(fund_code, pages, max_workers)))
+        requests_made += len(pages)
+
+    try:
+        with transaction(db_path) as conn:
+            conn.executemany('INSERT OR REPLACE INTO fund_nav_history (fund_code, nav_date, nav) VALUES (?, ?, ?)',
+                             [(fund_code, d, v) for d, v in new_rows])
+            latest = conn.execute('SELECT MAX(nav_date) FROM fund_nav_history WHERE fund_code = ?',
+                                  (fund_code,)).fetchone()[0]
+            conn.execute('''
+            INSERT OR REPLACE INTO fund_nav_sync (fund_code, last_date, total_count, synced_at)
+            VALUES (?, ?, ?, ?)
+            ''', (fund_code, latest, total_count, time.time()))
+    except Exception as e:
+        logging.error(f"Error storing NAV history for {fund_code}: {e}")
+
+    if new_rows:
+        try:
+            write_fund(fund_code, db_path)
+        except OSError as e:
+            logging.warning(f"Cannot update NAV columns for {fund_code}: {e}")
+
+    return requests_made
+
+def read_fund_history_columns(fund_code: str, days: int = 365,
+                              db_path: Optional[str] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Stored history of the last `days` calendar days as zero-copy, read-only
+    (int days since epoch, navs) arrays from the NAV columns, mirroring the
+    fund from SQLite on first use. None if nothing is stored.
+    """
+    store = get_store(db_path)
+    start = today_days() - days
+    columns = store.read_range(fund_code, start=start)
+    if columns is None:
+        try:
+            if not write_fund(fund_code, db_path):
+                return None
+        except OSError as e:
+            logging.warning(f"Cannot mirror NAV history for {fund_code}: {e}")
+            return _read_fund_history_sql(fund_code, start, db_path)
+        columns = store.read_range(fund_code, start=start)
+    return columns
+
+def _read_fund_history_sql(fund_code: str, start: int, db_path: Optional[str]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Fallback when the columns directory isn't writable."""
+    with connection(db_path) as conn:
+        rows = conn.execute('SELECT nav_date, nav FROM fund_nav_history WHERE fund_code = ? AND nav_date >= ? '
+                            'ORDER BY nav_date', (fund_code, str(from_days(np.array([start]))[0]))).fetchall()
+    if not rows:
+        return None
+    return to_days([r[0] for r in rows]), np.array([r[1] for r in rows], dtype=np.float64)
+
+def read_fund_history(fund_code: str, days: int = 365, db_path: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """
+    Reads stored history without touching the network.
+    Returns DataFrame with columns ['date', 'nav'] or None.
+    """
+    columns = read_fund_history_columns(fund_code, days, db_path)
+    if columns is None or not len(columns[0]):
+        return None
+    nav_days, navs = columns
+    return pd.DataFrame({'date': from_days(nav_days), 'nav': navs})
+
+def load_fund_history(fund_code: str, days: int = 365, db_path: Optional[str] = None,
+                      max_workers: int = 5) -> Optional[pd.DataFrame]:
+    """
+    Store-backed replacement for get_fund_history_nav: syncs incrementally,
+    then reads the requested window locally.
+    """
+    try:
+        sync_fund_history(fund_code, days, db_path=db_path, max_workers=max_workers)
+    except Exception as e:
+        logging.warning(f"NAV history sync failed for {fund_code}: {e}")
+    return read_fund_history(fund_code, days, db_path)
@@ -0,0 +1,217 @@
+"""
+Parser for EastMoney ``FundArchivesDatas.aspx?type=jjcc`` responses.
+
+The payload is a JS object whose ``content`` string holds one HTML table per
+report period, latest first. Parsing is a single pass over the rows of the
+first table with precompiled patterns; the weight column is located from the
+header instead of being assumed, so older-period layouts (without the price
+columns) parse correctly too.
+
+``parse_full_holdings_page`` reads a response requested with a large
+``topline``: interim and annual reports (periods ending 06-30 / 12-31) list
+every security held, the other quarters only the top ten.
+"""
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+_NAME_RE = re.compile(r"title='(.*?)'")
+_DATE_RE = re.compile(r"截止至：<font class='px12'>(.*?)</font>")
+# End of the content string: '",' followed by the next key
+_CONTENT_END_RE = re.compile(r'",\s*\w+\s*[:=]')
+# Unrolled loops ([^<]*(?:<(?!...)[^<]*)*) instead of lazy '.*?': no per-char backtracking
+_ROW_RE = re.compile(r"<tr[^>]*>([^<]*(?:<(?!/tr>)[^<]*)*)</tr>")
+_CELL_RE = re.compile(r"<t([dh])[^>]*>([^<]*(?:<(?!/t[dh]>)[^<]*)*)</t[dh]>")
+_TAG_RE = re.compile(r"<[^>]*>")
+_LINK_RE = re.compile(r"unify/r/(\d+)\.([a-zA-Z0-9_]+)")
+_LETTER_RE = re.compile(r"[a-zA-Z]")
+_YEARS_RE = re.compile(r"arryear:\s*\[([\d,\s]*)\]")
+
+# Quarterly reports disclose this many holdings; longer tables come from interim/annual reports
+TOP_HOLDINGS = 10
+FULL_REPORT_PERIODS = ('-06-30', '-12-31')
+
+# Column layout of the latest-period table when the header can't be read
+DEFAULT_WEIGHT_COLUMN = 6
+
+
+def decode_payload(raw: bytes) -> str:
+    """Decodes a response body once: UTF-8, falling back to GBK."""
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('gbk', errors='ignore')
+
+
+def sina_code(market_id: Optional[str], stock_code: str) -> str:
+    """
+    Maps an EastMoney market id + security code to a Sina quote code.
+    Falls back to guessing from the code format when the market is unknown.
+    """
+    if market_id:
+        mid = int(market_id)
+        if mid == 0: # SZ (and BJ, which EastMoney also files under 0)
+            if stock_code.startswith(('4', '8', '92')):
+                return f"bj{stock_code}"
+            return f"sz{stock_code}"
+        if mid == 1: # SH
+            return f"sh{stock_code}"
+        if mid == 116: # HK
+            # Pad HK code to 5 digits for Sina
+            # EastMoney might give '700', '00700'. Sina needs '00700'.
+            return f"rt_hk{stock_code.zfill(5)}"
+        if mid >= 100: # US (105, 106, 107...)
+            # Share classes: EastMoney 'BRK_B' is Sina 'gb_brk.b'
+            return f"gb_{stock_code.lower().replace('_', '.')}"
+        # Default A-share fallback if ID known or new
+        if stock_code.startswith(('6', '9')):
+            return f"sh{stock_code}"
+        return f"sz{stock_code}"
+
+    # Fallback logic if no link found
+    # Guess based on format
+    if _LETTER_RE.search(stock_code):
+        return f"gb_{stock_code.lower()}"
+    if len(stock_code) < 6:
+        return f"rt_hk{stock_code.zfill(5)}"
+    # Assume A-share
+    if stock_code.startswith(('6', '5')):
+        return f"sh{stock_code}"
+    if stock_code.startswith(('4', '8')):
+        return f"bj{stock_code}"
+    return f"sz{stock_code}"
+
+
+def extract_table_html(content: str) -> str:
+    """Returns the HTML held in the payload's ``content`` string ('' if absent)."""
+    start = content.find('content:"')
+    if start == -1:
+        return ""
+    start += len('content:"')
+    match = _CONTENT_END_RE.search(content, start)
+    if match:
+        return content[start:match.start()]
+    end = content.find('",', start)
+    return content[start:end] if end != -1 else content[start:]
+
+
+def iter_holdings_rows(table_html: str) -> Iterator[Dict]:
+    """
+    Yields holdings from one period's table:
+    {'code', 'name', 'weight', 'fetch_code'}.
+    """
+    weight_col = DEFAULT_WEIGHT_COLUMN
+    for row in _ROW_RE.finditer(table_html):
+        row_html = row.group(1)
+        cells = _CELL_RE.findall(row_html)
+        if not cells:
+            continue
+
+        if cells[0][0] == 'h':
+            # Header: locate the weight column (占净值比例)
+            for i, (_, text) in enumerate(cells):
+                if '占净值' in text:
+                    weight_col = i
+                    break
+            continue
+
+        if len(cells) <= max(weight_col, 2):
+            continue
+
+        weight_str = _TAG_RE.sub("", cells[weight_col][1]).strip().replace('%', '').replace(',', '')
+        if not weight_str or weight_str == '--':
+            continue
+        try:
+            weight = float(weight_str)
+        except ValueError:
+            continue
+
+        link_match = _LINK_RE.search(row_html)
+        if link_match:
+            market_id, stock_code = link_match.group(1), link_match.group(2)
+        else:
+            market_id = None
+            stock_code = _TAG_RE.sub("", cells[1][1]).strip() or "Unknown"
+
+        yield {
+            'code': stock_code, # Display Code
+            'name': _TAG_RE.sub("", cells[2][1]).strip(),
+            'weight': weight,
+            'fetch_code': sina_code(market_id, stock_code) # API Code
+        }
+
+
+def parse_holdings_page(content: str) -> Dict:
+    """
+    Parses a full jjcc response.
+
+    Returns:
+        Dict: {
+            'fund_name': Optional[str],
+            'report_date': str, # Latest report period, '--' if not found
+            'holdings': List[Dict] # Rows of the latest period only
+        }
+    """
+    name_match = _NAME_RE.search(content)
+    date_match = _DATE_RE.search(content)
+    result = {
+        'fund_name': name_match.group(1) if name_match else None,
+        'report_date': date_match.group(1) if date_match else "--",
+        'holdings': []
+    }
+
+    html = extract_table_html(content)
+    if not html or "暂无数据" in html or len(html) <= 50:
+        return result
+
+    # Tables are ordered latest period first
+    end = html.find('</table>')
+    result['holdings'] = list(iter_holdings_rows(html[:end] if end != -1 else html))
+    return result
+
+
+def iter_period_tables(html: str) -> Iterator[Tuple[str, str]]:
+    """Yields (report_date, table_html) for every report period in the content, latest first."""
+    for match in _DATE_RE.finditer(html):
+        start = html.find('<table', match.end())
+        if start == -1:
+            return
+        end = html.find('</table>', start)
+        yield match.group(1), html[start:end] if end != -1 else html[start:]
+
+
+def report_years(content: str) -> List[str]:
+    """Years with disclosed holdings (the payload's ``arryear``), latest first."""
+    match = _YEARS_RE.search(content)
+    if not match:
+        return []
+    return [year.strip() for year in match.group(1).split(',') if year.strip()]
+
+
+def parse_full_holdings_page(content: str) -> Dict:
+    """
+    Parses a jjcc response for the latest complete holdings list: the newest
+    06-30 / 12-31 period with more than TOP_HOLDINGS rows. A Q2/Q4 table with
+    only the top ten means the interim/annual report isn't out yet, so an
+    older period is used.
+
+    Returns:
+        Dict: same shape as parse_holdings_page ('report_date' is '--' and
+        'holdings' empty when the page has no complete list)
+    """
+    name_match = _NAME_RE.search(content)
+    result = {
+        'fund_name': name_match.group(1) if name_match else None,
+        'report_date': "--",
+        'holdings': []
+    }
+
+    html = extract_table_html(content)
+    for report_date, table_html in iter_period_tables(html):
+        if not report_date.endswith(FULL_REPORT_PERIODS):
+            continue
+        holdings = list(iter_holdings_rows(table_html))
+        if len(holdings) > TOP_HOLDINGS:
+            result['report_date'] = report_date
+            result['holdings'] = holdings
+            break
+    return result
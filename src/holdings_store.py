@@ -0,0 +1,129 @@
+"""
+SQLite-backed cache of fund holdings, keyed by fund code and report period.
+
+Top-10 holdings only change when a quarterly report is published, so a cached
+snapshot stays valid until the next disclosure window opens. Inside a window
+(roughly the month after each quarter end) the snapshot is re-checked a few
+times a day until the new period shows up; outside it, at most once a week.
+"""
+import json
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from src.db import connection
+from src.data_fetcher import get_fund_holdings, single_flight
+from src.metrics import cache_lookup, inc
+
+# Quarterly reports are due within 15 working days of quarter end
+DISCLOSURE_WINDOW_DAYS = 30
+# Re-check interval while a newer report may appear any day
+WINDOW_RECHECK_SECONDS = 6 * 3600
+# Re-check interval otherwise (late filers, feeder targets)
+RECHECK_SECONDS = 7 * 24 * 3600
+
+
+def latest_quarter_end(today: date) -> date:
+    """The most recent quarter end strictly before ``today``."""
+    for month, day in ((12, 31), (9, 30), (6, 30), (3, 31)):
+        candidate = date(today.year, month, day)
+        if candidate < today:
+            return candidate
+    return date(today.year - 1, 12, 31)
+
+def is_stale(report_date: str, fetched_at: float, now: Optional[float] = None) -> bool:
+    """
+    Decides whether a cached holdings snapshot needs to be refetched.
+
+    Args:
+        report_date: Report period of the snapshot ('YYYY-MM-DD', or a marker such as '实时追踪')
+        fetched_at: Unix time of the fetch; <= 0 means explicitly invalidated
+    """
+    if fetched_at <= 0:
+        return True
+    now = now if now is not None else time.time()
+    age = now - fetched_at
+    today = datetime.fromtimestamp(now).date()
+
+    try:
+        period = datetime.strptime(report_date, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        # Non-dated results (e.g. feeder target tracking)
+        return age > RECHECK_SECONDS
+
+    expected = latest_quarter_end(today)
+    if period >= expected:
+        # Nothing newer can have been published yet
+        return False
+
+    if today <= expected + timedelta(days=DISCLOSURE_WINDOW_DAYS):
+        return age > WINDOW_RECHECK_SECONDS
+    return age > RECHECK_SECONDS
+
+def load_holdings(fund_code: str, db_path: Optional[str] = None) -> Optional[Tuple[Tuple[str, List[Dict], str], float]]:
+    """
+    Loads the most recently fetched snapshot for a fund.
+
+    Returns:
+        tuple: ((fund_name, holdings_list, report_date), fetched_at) or None
+    """
+    with connection(db_path) as conn:
+        row = conn.execute('''
+        SELECT fund_name, holdings_json, report_date, fetched_at FROM fund_holdings
+        WHERE fund_code = ? ORDER BY fetched_at DESC, report_date DESC LIMIT 1
+        ''', (fund_code,)).fetchone()
+
+    if not row:
+        return None
+    return (row['fund_name'], json.loads(row['holdings_json']), row['report_date']), row['fetched_at']
+
+def save_holdings(fund_code: str, result_data: Tuple[str, List[Dict], str], db_path: Optional[str] = None):
+    """Stores a get_fund_holdings result as the fund's latest snapshot."""
+    fund_name, holdings, report_date = result_data
+    try:
+        with connection(db_path) as conn:
+            conn.execute('''
+            INSERT OR REPLACE INTO fund_holdings (fund_code, report_date, fund_name, holdings_json, fetched_at)
+            VALUES (?, ?, ?, ?, ?)
+            ''', (fund_code, report_date, fund_name, json.dumps(holdings, ensure_ascii=False), time.time()))
+            conn.commit()
+    except Exception as e:
+        logging.error(f"Error saving holdings for {fund_code}: {e}")
+
+def invalidate_holdings(fund_code: Optional[str] = None, db_path: Optional[str] = None):
+    """Forces a refetch on next access, for one fund or for all funds."""
+    with connection(db_path) as conn:
+        if fund_code:
+            conn.execute('UPDATE fund_holdings SET fetched_at = 0 WHERE fund_code = ?', (fund_code,))
+        else:
+            conn.execute('UPDATE fund_holdings SET fetched_at = 0')
+        conn.commit()
+
+@single_flight('holdings_cached',
+               key=lambda fund_code, force_refresh=False, db_path=None: (fund_code, force_refresh, db_path))
+def get_fund_holdings_cached(fund_code: str, force_refresh: bool = False,
+                             db_path: Optional[str] = None) -> Optional[Tuple[str, List[Dict], str]]:
+    """
+    Drop-in replacement for get_fund_holdings that serves from the local store
+    and only goes to the network when the snapshot is stale.
+    """
+    cached = load_holdings(fund_code, db_path)
+    if cached and not force_refresh:
+        result_data, fetched_at = cached
+        if not is_stale(result_data[2], fetched_at):
+            cache_lookup('holdings', hit=True)
+            return result_data
+
+    cache_lookup('holdings', hit=False)
+    result_data = get_fund_holdings(fund_code)
+    if result_data:
+        save_holdings(fund_code, result_data, db_path)
+        return result_data
+
+    if cached:
+        # Upstream failed; an old snapshot still beats no estimate
+        logging.warning(f"Using stale holdings for {fund_code} from {cached[0][2]}")
+        inc('holdings_stale_fallback_total')
+        return cached[0]
+    return None
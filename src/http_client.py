@@ -0,0 +1,171 @@
+"""
+Process-wide pooled HTTP client shared by every fetcher.
+
+A single ``requests.Session`` keeps one connection pool per host, so repeated
+calls to fundf10/api.fund.eastmoney.com and hq.sinajs.cn reuse keep-alive
+connections instead of paying a TCP connect per request. Pool sizes are chosen
+to cover the thread pools that call into it.
+
+Every request passes through the per-host limiter in ``src.rate_limiter``;
+retries happen here (not in urllib3) with jittered backoff, so throttling and
+timeouts feed the limiter's adaptive limits and counters.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.metrics import inc, is_enabled
+from src.rate_limiter import ERROR, SUCCESS, THROTTLED, backoff_delay, get_limiter
+
+_config = {
+    # Seconds; individual calls may pass their own timeout
+    'timeout': float(os.environ.get('FUND_NAV_HTTP_TIMEOUT', 5)),
+    # Retries for connection errors, timeouts and 429/5xx on GET
+    'retries': int(os.environ.get('FUND_NAV_HTTP_RETRIES', 2)),
+    'backoff_factor': 0.3,
+    # Connections kept per host; must be >= the largest worker pool hitting one host
+    'pool_size': int(os.environ.get('FUND_NAV_HTTP_POOL_SIZE', 20)),
+    # Number of distinct hosts whose pools are kept
+    'pool_hosts': 10,
+    # Base URL that replaces every upstream host (e.g. a local replay stub);
+    # 'http://fundf10.eastmoney.com/x' becomes '<upstream>/fundf10.eastmoney.com/x'
+    'upstream': os.environ.get('FUND_NAV_UPSTREAM') or None,
+}
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
+
+# Upstream is pushing back: retry and shrink the host's limits
+THROTTLE_STATUSES = frozenset([429, 503])
+# Transient server errors: retry without treating them as throttling
+RETRY_STATUSES = frozenset([500, 502, 504])
+
+_session = None
+_session_lock = threading.Lock()
+
+def _build_session() -> requests.Session:
+    adapter = HTTPAdapter(
+        pool_connections=_config['pool_hosts'],
+        pool_maxsize=_config['pool_size'],
+        # Retries are done in http_get, where the rate limiter can see them
+        max_retries=0,
+        # Block instead of opening throwaway connections when the pool is exhausted
+        pool_block=True,
+    )
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def configure(timeout: Optional[float] = None, retries: Optional[int] = None,
+              pool_size: Optional[int] = None, backoff_factor: Optional[float] = None,
+              upstream: Optional[str] = None):
+    """
+    Adjusts client settings. The shared session is rebuilt on next use.
+    Pass upstream='' to stop redirecting requests.
+    """
+    global _session
+    with _session_lock:
+        if timeout is not None:
+            _config['timeout'] = timeout
+        if retries is not None:
+            _config['retries'] = retries
+        if pool_size is not None:
+            _config['pool_size'] = pool_size
+        if backoff_factor is not None:
+            _config['backoff_factor'] = backoff_factor
+        if upstream is not None:
+            _config['upstream'] = upstream.rstrip('/') or None
+        old, _session = _session, None
+    if old is not None:
+        old.close()
+
+def get_session() -> requests.Session:
+    """Returns the process-wide session, creating it on first use."""
+    global _session
+    session = _session
+    if session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+            session = _session
+    return session
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    value = response.headers.get('Retry-After')
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+def http_get(url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None,
+             timeout: Optional[float] = None) -> requests.Response:
+    """
+    GET through the shared pooled session, rate limited per host.
+
+    429/5xx responses, timeouts and connection errors are retried with jittered
+    exponential backoff. After the last attempt the final response is returned
+    (callers check the status) or the last exception is raised.
+
+    Args:
+        url: Absolute URL
+        params: Query parameters
+        headers: Extra headers, merged over DEFAULT_HEADERS
+        timeout: Seconds; defaults to the configured timeout
+    """
+    parts = urlsplit(url)
+    host = parts.netloc
+    if _config['upstream']:
+        url = f"{_config['upstream']}/{host}{parts.path}" + (f"?{parts.query}" if parts.query else '')
+    # Limits stay keyed by the original host when redirected
+    limiter = get_limiter(host)
+    session = get_session()
+    timeout = timeout if timeout is not None else _config['timeout']
+    retries = _config['retries']
+
+    for attempt in range(retries + 1):
+        response, error, retry_after = None, None, None
+        limiter.acquire()
+        try:
+            response = session.get(url, params=params, headers=headers, timeout=timeout)
+        except (requests.Timeout, requests.ConnectionError) as e:
+            error = e
+            limiter.release(THROTTLED)
+            inc('http_requests_total', host=host, status=type(e).__name__)
+        except Exception:
+            limiter.release(ERROR)
+            raise
+        else:
+            if is_enabled():
+                inc('http_requests_total', host=host, status=str(response.status_code))
+                # Decoded body size; callers read the body anyway
+                inc('http_bytes_total', len(response.content), host=host)
+            if response.status_code in THROTTLE_STATUSES:
+                limiter.release(THROTTLED)
+                retry_after = _retry_after(response)
+            elif response.status_code in RETRY_STATUSES:
+                limiter.release(ERROR)
+            else:
+                limiter.release(SUCCESS)
+                return response
+
+        if attempt == retries:
+            break
+        limiter.record_retry()
+        reason = f"HTTP {response.status_code}" if response is not None else type(error).__name__
+        logging.info(f"{host}: {reason}, retry {attempt + 1}/{retries}")
+        time.sleep(backoff_delay(attempt, retry_after, _config['backoff_factor']))
+
+    if response is not None:
+        return response
+    raise error
@@ -0,0 +1,237 @@
+"""
+Bulk import of positions from CSV files and broker exports into ``funds``.
+
+Accepted input:
+
+* a header row naming the columns, in Chinese or English (``基金代码``/``代码``/
+  ``证券代码``/``code``, ``持仓金额``/``参考市值``/``市值``/``amount``, optional
+  ``基金名称``/``名称``/``name``), or no header with ``code,amount[,name]`` rows;
+* comma, tab, semicolon or pipe separated, UTF-8 (with or without BOM) or GBK;
+* codes as broker and spreadsheet exports write them: ``2611`` (leading zeros
+  dropped), ``="002611"``, ``'002611``, ``002611.OF``.
+
+Every row is validated first (six-digit code, finite non-negative amount);
+duplicate codes, e.g. the same fund held in two accounts, are summed. Funds
+without a name in the file are looked up concurrently through the holdings
+cache, bounded by ``--concurrency`` on the shared worker pool, which also
+warms the cache for the first refresh. Funds that cannot be found upstream
+are reported rather than imported (``--keep-unresolved`` imports them
+unnamed). All accepted rows are then written in a single transaction, so an
+import either lands completely or not at all.
+
+Funds already in ``funds`` are updated, not replaced: the imported amount
+overwrites the current one, a name in the file overwrites the stored one, and
+the recorded holding profit is kept. New and updated funds are reported
+separately, also by ``--dry-run``.
+
+Rejected rows are returned with their line number and reason, printed, and
+with ``--report`` written as CSV; the command exits non-zero if any row was
+rejected.
+
+    python -m src.importer positions.csv [--report failures.csv] [--concurrency 32] [--dry-run]
+"""
+import argparse
+import asyncio
+import csv
+import io
+import logging
+import math
+import re
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from src.async_fetcher import MAX_CONCURRENCY, run_blocking, run_sync, set_max_concurrency
+from src.fund_store import existing_codes, upsert_funds
+from src.holdings_store import get_fund_holdings_cached
+
+CODE_HEADERS = ('基金代码', '代码', '证券代码', '产品代码', 'fund_code', 'code')
+NAME_HEADERS = ('基金名称', '名称', '证券名称', '产品名称', 'fund_name', 'name')
+AMOUNT_HEADERS = ('持仓金额', '参考市值', '最新市值', '持有金额', '市值', '金额', 'current_amount', 'amount')
+REPORT_COLUMNS = ['行号', '基金代码', '原因']
+# In order of preference on ties ('1,234.50' in a tab-separated row)
+DELIMITERS = ('\t', ',', ';', '|')
+
+_CODE_RE = re.compile(r'^\d{6}$')
+
+def decode(data: bytes) -> str:
+    """UTF-8 (BOM optional), else GB18030 as written by Chinese broker software."""
+    try:
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return data.decode('gb18030')
+
+def normalize_code(raw: str) -> Optional[str]:
+    """A six-digit fund code from a cell as exported, or None."""
+    code = raw.strip().lstrip("='\"").rstrip('"').strip()
+    code = code.split('.', 1)[0]
+    if code.isdigit() and len(code) < 6:
+        # Spreadsheets drop leading zeros
+        code = code.zfill(6)
+    return code if _CODE_RE.match(code) else None
+
+def parse_amount(raw: str) -> Optional[float]:
+    try:
+        amount = float(re.sub(r'[\s,¥￥元]', '', raw))
+    except ValueError:
+        return None
+    return amount if math.isfinite(amount) and amount >= 0 else None
+
+def _find_column(header: List[str], names: Tuple[str, ...]) -> Optional[int]:
+    cells = [cell.strip().lower() for cell in header]
+    for name in names:
+        if name in cells:
+            return cells.index(name)
+    return None
+
+def parse_positions(text: str, default_amount: Optional[float] = None) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Validates an export. Returns (positions, failures): positions as
+    {'基金代码', '基金名称', '持仓金额', '行号'} (first line of the code, amounts
+    of duplicate codes summed), failures as {'行号', '基金代码', '原因'}.
+    Rows without an amount take `default_amount`, or fail if it is None.
+    """
+    # The first row's most frequent separator (csv.Sniffer guesses wrong on short files)
+    first_line = next((line for line in text.splitlines() if line.strip() and not line.lstrip().startswith('#')), '')
+    delimiter = max(DELIMITERS, key=first_line.count)
+    rows = list(csv.reader(io.StringIO(text), delimiter=delimiter))
+
+    code_col, amount_col, name_col, first = 0, 1, 2, 0
+    if rows:
+        found = _find_column(rows[0], CODE_HEADERS)
+        if found is not None:
+            code_col, amount_col, name_col, first = (found, _find_column(rows[0], AMOUNT_HEADERS),
+                                                     _find_column(rows[0], NAME_HEADERS), 1)
+
+    positions: Dict[str, Dict] = {}
+    failures = []
+    for line, row in enumerate(rows[first:], start=first + 1):
+        if not any(cell.strip() for cell in row) or row[0].lstrip().startswith('#'):
+            continue
+
+        def cell(col):
+            return row[col].strip() if col is not None and col < len(row) else ''
+
+        raw_code = cell(code_col)
+        code = normalize_code(raw_code)
+        if code is None:
+            failures.append({'行号': line, '基金代码': raw_code, '原因': '基金代码无效'})
+            continue
+        raw_amount = cell(amount_col)
+        if raw_amount:
+            amount = parse_amount(raw_amount)
+            if amount is None:
+                failures.append({'行号': line, '基金代码': code, '原因': f'持仓金额无效: {raw_amount}'})
+                continue
+        elif default_amount is not None:
+            amount = default_amount
+        else:
+            failures.append({'行号': line, '基金代码': code, '原因': '缺少持仓金额'})
+            continue
+
+        if code in positions:
+            positions[code]['持仓金额'] += amount
+            positions[code]['基金名称'] = positions[code]['基金名称'] or cell(name_col)
+        else:
+            positions[code] = {'基金代码': code, '基金名称': cell(name_col), '持仓金额': amount, '行号': line}
+    return list(positions.values()), failures
+
+async def resolve_names(positions: List[Dict], concurrency: int = MAX_CONCURRENCY,
+                        db_path: Optional[str] = None) -> List[Dict]:
+    """
+    Fills in missing names from the holdings cache, at most `concurrency`
+    lookups in flight. Returns the positions that couldn't be found.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def resolve(position):
+        async with semaphore:
+            try:
+                result_data = await run_blocking(get_fund_holdings_cached, position['基金代码'], db_path=db_path)
+            except Exception as e:
+                logging.warning(f"Error looking up {position['基金代码']}: {e}")
+                result_data = None
+        if result_data:
+            position['基金名称'] = result_data[0]
+            return None
+        return position
+
+    unnamed = [p for p in positions if not p['基金名称']]
+    return [p for p in await asyncio.gather(*(resolve(p) for p in unnamed)) if p is not None]
+
+def import_positions(text: str, default_amount: Optional[float] = None, concurrency: int = MAX_CONCURRENCY,
+                     keep_unresolved: bool = False, dry_run: bool = False,
+                     db_path: Optional[str] = None) -> Dict:
+    """
+    Validates, resolves and stores an export (see the module docstring).
+
+    Returns:
+        Dict: {
+            'imported': int, # Funds written (0 on a dry run)
+            'added': List[str], # Codes new to the funds table
+            'updated': List[str], # Codes already held, amount updated (would be, on a dry run)
+            'positions': List[Dict],
+            'failures': List[Dict] # Ordered by line
+        }
+    """
+    positions, failures = parse_positions(text, default_amount)
+    unresolved = run_sync(resolve_names(positions, concurrency, db_path))
+    if unresolved and not keep_unresolved:
+        missing = {p['基金代码'] for p in unresolved}
+        failures += [{'行号': p['行号'], '基金代码': p['基金代码'], '原因': '未找到基金'} for p in unresolved]
+        positions = [p for p in positions if p['基金代码'] not in missing]
+    failures.sort(key=lambda f: f['行号'])
+
+    added, updated = [], []
+    if positions and dry_run:
+        held = existing_codes(db_path)
+        added = [p['基金代码'] for p in positions if p['基金代码'] not in held]
+        updated = [p['基金代码'] for p in positions if p['基金代码'] in held]
+    elif positions:
+        added, updated = upsert_funds([(p['基金代码'], p['基金名称'], p['持仓金额']) for p in positions], db_path)
+    imported = 0 if dry_run else len(added) + len(updated)
+    return {'imported': imported, 'added': added, 'updated': updated, 'positions': positions, 'failures': failures}
+
+def failures_csv(failures: List[Dict]) -> str:
+    stream = io.StringIO()
+    writer = csv.DictWriter(stream, fieldnames=REPORT_COLUMNS)
+    writer.writeheader()
+    writer.writerows(failures)
+    return stream.getvalue()
+
+def main():
+    parser = argparse.ArgumentParser(description="Import positions from a CSV or broker export into the funds table",
+                                     epilog=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file', help="CSV/TSV export; '-' for stdin")
+    parser.add_argument('--amount', type=float, help="Position for rows without an amount (default: reject them)")
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENCY, help="Name lookups in flight")
+    parser.add_argument('--keep-unresolved', action='store_true', help="Import funds not found upstream, unnamed")
+    parser.add_argument('--dry-run', action='store_true', help="Validate and resolve without writing")
+    parser.add_argument('--report', help="Write rejected rows as CSV")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.INFO)
+
+    data = sys.stdin.buffer.read() if args.file == '-' else open(args.file, 'rb').read()
+    set_max_concurrency(max(args.concurrency, MAX_CONCURRENCY))
+    started = time.time()
+    result = import_positions(decode(data), args.amount, args.concurrency, args.keep_unresolved, args.dry_run)
+
+    verb = 'Validated' if args.dry_run else 'Imported'
+    updated = 'would update' if args.dry_run else 'updated'
+    print(f"{verb} {len(result['positions'])} funds ({len(result['added'])} new, {updated} "
+          f"{len(result['updated'])} held, holding profit kept), rejected {len(result['failures'])} rows "
+          f"in {time.time() - started:.1f}s")
+    if result['updated']:
+        print(f"  {updated}: {' '.join(result['updated'][:20])}{' ...' if len(result['updated']) > 20 else ''}")
+    for failure in result['failures'][:20]:
+        print(f"  line {failure['行号']}: {failure['基金代码']} {failure['原因']}")
+    if len(result['failures']) > 20:
+        print(f"  ... {len(result['failures']) - 20} more")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8-sig', newline='') as f:
+            f.write(failures_csv(result['failures']))
+    if result['failures']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
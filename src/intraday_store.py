@@ -0,0 +1,102 @@
+"""
+Intraday estimate series, one point per fund per minute.
+
+Points live in ``fund_intraday`` keyed by (fund_code, trade_date, minute), so
+an append is a single B-tree insert, repeated refreshes within the same minute
+(or from several dashboards) overwrite instead of piling up, and a day holds at
+most 1440 points per fund. Days older than the retention window are pruned on
+the first write of each day. The chart reads a day's curve with one indexed
+range scan, including points recorded before the page was opened.
+
+Refreshes keep running while markets are closed (pre-open warm-ups, idle
+heartbeats), so writers pass their results through ``trading_results`` first:
+a fund only gets points while a market its holdings trade in is open, and the
+chart isn't flattened by off-hours repeats of the last close.
+"""
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from src.db import connection, transaction
+from src.holdings_parser import sina_code
+from src.market_hours import MARKETS, is_open, markets_of
+
+# Trading days of intraday points kept per fund
+RETENTION_DAYS = int(os.environ.get('FUND_NAV_INTRADAY_DAYS', 7))
+
+_pruned = {}
+
+def prune_intraday(keep_days: int = RETENTION_DAYS, db_path: Optional[str] = None) -> int:
+    """Drops points older than the newest `keep_days` trading days. Returns rows deleted."""
+    with transaction(db_path) as conn:
+        cursor = conn.execute('''
+        DELETE FROM fund_intraday WHERE trade_date < (
+            SELECT MIN(trade_date) FROM (
+                SELECT DISTINCT trade_date FROM fund_intraday ORDER BY trade_date DESC LIMIT ?
+            )
+        )
+        ''', (keep_days,))
+    return cursor.rowcount
+
+def trading_results(results: List[Dict], now: Optional[datetime] = None) -> List[Dict]:
+    """
+    The results whose holdings trade in a market open at `now` (A-shares when
+    a fund has no holdings details), i.e. the ones worth an intraday point.
+    """
+    open_markets = {m for m in MARKETS if is_open(m, now)}
+    if not open_markets:
+        return []
+    return [item for item in results
+            if open_markets.intersection(markets_of(sina_code(None, str(d['code'])) for d in item.get('Details') or [])
+                                         or ['a'])]
+
+def append_points(results: List[Dict], now: Optional[datetime] = None, db_path: Optional[str] = None):
+    """
+    Records the current estimate of every successful result at the current minute.
+    """
+    now = now or datetime.now()
+    trade_date = now.strftime('%Y-%m-%d')
+    minute = now.strftime('%H:%M')
+    rows = [(item['基金代码'], trade_date, minute, item['估算涨跌']) for item in results
+            if item['状态'] == '成功' and item['估算涨跌'] is not None]
+    if not rows:
+        return
+
+    try:
+        with transaction(db_path) as conn:
+            conn.executemany('''
+            INSERT OR REPLACE INTO fund_intraday (fund_code, trade_date, minute, estimate)
+            VALUES (?, ?, ?, ?)
+            ''', rows)
+    except Exception as e:
+        logging.error(f"Error saving intraday points: {e}")
+        return
+
+    if _pruned.get(db_path) != trade_date:
+        _pruned[db_path] = trade_date
+        prune_intraday(db_path=db_path)
+
+def read_intraday(fund_code: str, trade_date: Optional[str] = None, start: Optional[str] = None,
+                  end: Optional[str] = None, db_path: Optional[str] = None) -> pd.DataFrame:
+    """
+    Returns a fund's points for one day (today by default) as a DataFrame with
+    'Time' ('HH:MM') and 'Estimate' columns, optionally limited to [start, end].
+    """
+    trade_date = trade_date or datetime.now().strftime('%Y-%m-%d')
+    with connection(db_path) as conn:
+        rows = conn.execute('''
+        SELECT minute, estimate FROM fund_intraday
+        WHERE fund_code = ? AND trade_date = ? AND minute BETWEEN ? AND ?
+        ORDER BY minute
+        ''', (fund_code, trade_date, start or '00:00', end or '23:59')).fetchall()
+    return pd.DataFrame([tuple(row) for row in rows], columns=['Time', 'Estimate'])
+
+def latest_trade_date(fund_code: str, db_path: Optional[str] = None) -> Optional[str]:
+    """Most recent day with points for a fund (e.g. the last session before a weekend)."""
+    with connection(db_path) as conn:
+        row = conn.execute('SELECT MAX(trade_date) AS d FROM fund_intraday WHERE fund_code = ?',
+                           (fund_code,)).fetchone()
+    return row['d'] if row else None
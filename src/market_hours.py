@@ -0,0 +1,210 @@
+"""
+Trading calendars and sessions for the markets fund holdings trade in, and the
+refresh schedule derived from them.
+
+Quote codes map to markets by prefix (``sh/sz/bj`` A-shares, ``rt_hk`` Hong
+Kong, ``gb_`` US). Each market has local session times and a holiday list;
+``FUND_NAV_HOLIDAYS`` may point to a JSON file ``{"a": ["2027-01-01", ...],
+"hk": [...], "us": [...]}`` whose dates are added to the built-in lists, which
+only cover the years below and must be extended each December.
+
+Used by:
+
+* ``src.quote_store``: a closed market's quote fetched after its last close
+  is served without refetching (the last close is reused until the next open);
+* ``next_refresh_delay``: the collector and the dashboard's auto-refresh run
+  every ``OPEN_INTERVAL`` seconds while a market is open, every
+  ``EDGE_INTERVAL`` seconds near the open and close, and sleep through
+  closed hours;
+* ``warmup_due``: holdings, feeder targets and NAV history are refreshed
+  ``WARMUP_LEAD`` seconds before each open, so the first refresh of the
+  session only needs quotes.
+"""
+import json
+import logging
+import os
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+MARKETS = ('a', 'hk', 'us')
+
+TIMEZONES = {
+    'a': ZoneInfo('Asia/Shanghai'),
+    'hk': ZoneInfo('Asia/Hong_Kong'),
+    'us': ZoneInfo('America/New_York'),
+}
+
+# Continuous-trading sessions in local time
+SESSIONS = {
+    'a': [(dtime(9, 30), dtime(11, 30)), (dtime(13, 0), dtime(15, 0))],
+    'hk': [(dtime(9, 30), dtime(12, 0)), (dtime(13, 0), dtime(16, 0))],
+    'us': [(dtime(9, 30), dtime(16, 0))],
+}
+
+# Seconds after a session ends before its quotes are final (HK runs a closing auction until 16:10)
+SETTLE_SECONDS = {'a': 60, 'hk': 600, 'us': 60}
+
+# Exchange holidays on weekdays (weekends are always closed)
+HOLIDAYS = {
+    'a': {
+        '2025-01-01', '2025-01-28', '2025-01-29', '2025-01-30', '2025-01-31', '2025-02-03', '2025-02-04',
+        '2025-04-04', '2025-05-01', '2025-05-02', '2025-05-05', '2025-06-02', '2025-10-01', '2025-10-02',
+        '2025-10-03', '2025-10-06', '2025-10-07', '2025-10-08',
+        '2026-01-01', '2026-01-02', '2026-02-16', '2026-02-17', '2026-02-18', '2026-02-19', '2026-02-20',
+        '2026-02-23', '2026-04-06', '2026-05-01', '2026-05-04', '2026-05-05', '2026-06-19', '2026-09-25',
+        '2026-10-01', '2026-10-02', '2026-10-05', '2026-10-06', '2026-10-07',
+    },
+    'hk': {
+        '2025-01-01', '2025-01-29', '2025-01-30', '2025-01-31', '2025-04-04', '2025-04-18', '2025-04-21',
+        '2025-05-01', '2025-05-05', '2025-07-01', '2025-10-01', '2025-10-07', '2025-10-29',
+        '2025-12-25', '2025-12-26',
+        '2026-01-01', '2026-02-17', '2026-02-18', '2026-02-19', '2026-04-03', '2026-04-06', '2026-04-07',
+        '2026-05-01', '2026-05-25', '2026-06-19', '2026-07-01', '2026-10-01', '2026-10-19', '2026-12-25',
+    },
+    'us': {
+        '2025-01-01', '2025-01-09', '2025-01-20', '2025-02-17', '2025-04-18', '2025-05-26', '2025-06-19',
+        '2025-07-04', '2025-09-01', '2025-11-27', '2025-12-25',
+        '2026-01-01', '2026-01-19', '2026-02-16', '2026-04-03', '2026-05-25', '2026-06-19', '2026-07-03',
+        '2026-09-07', '2026-11-26', '2026-12-25',
+    },
+}
+
+OPEN_INTERVAL = 60
+EDGE_INTERVAL = 15
+# Minutes after an open / before a close that count as "near the edge"
+EDGE_WINDOW = 15 * 60
+# Longest sleep while everything is closed, so heartbeats and new funds still get picked up
+MAX_IDLE = 30 * 60
+WARMUP_LEAD = 10 * 60
+
+def _load_extra_holidays():
+    path = os.environ.get('FUND_NAV_HOLIDAYS')
+    if not path:
+        return
+    try:
+        with open(path, encoding='utf-8') as f:
+            extra = json.load(f)
+        for market, days in extra.items():
+            HOLIDAYS.setdefault(market, set()).update(days)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Cannot read holiday file {path}: {e}")
+
+_load_extra_holidays()
+
+def market_of(code: str) -> str:
+    """'hk', 'us' or 'a' for a Sina quote code."""
+    if code.startswith('rt_hk'):
+        return 'hk'
+    if code.startswith('gb_'):
+        return 'us'
+    return 'a'
+
+def markets_of(codes: Iterable[str]) -> List[str]:
+    found = {market_of(code) for code in codes}
+    return [m for m in MARKETS if m in found]
+
+def _now(now: Optional[datetime]) -> datetime:
+    return now if now is not None else datetime.now(TIMEZONES['a'])
+
+def is_trading_day(market: str, day: date) -> bool:
+    return day.weekday() < 5 and day.isoformat() not in HOLIDAYS[market]
+
+def _sessions_on(market: str, day: date) -> List[Tuple[datetime, datetime]]:
+    tz = TIMEZONES[market]
+    return [(datetime.combine(day, start, tz), datetime.combine(day, end, tz)) for start, end in SESSIONS[market]]
+
+def is_open(market: str, now: Optional[datetime] = None) -> bool:
+    local = _now(now).astimezone(TIMEZONES[market])
+    if not is_trading_day(market, local.date()):
+        return False
+    return any(start <= local < end for start, end in _sessions_on(market, local.date()))
+
+def next_open(market: str, now: Optional[datetime] = None) -> datetime:
+    """Start of the next session strictly after `now` (or `now` itself if a session starts exactly then)."""
+    local = _now(now).astimezone(TIMEZONES[market])
+    day = local.date()
+    for _ in range(30):
+        if is_trading_day(market, day):
+            for start, _end in _sessions_on(market, day):
+                if start >= local:
+                    return start
+        day += timedelta(days=1)
+    raise ValueError(f"No {market} session within 30 days of {local}")
+
+def last_close(market: str, now: Optional[datetime] = None) -> datetime:
+    """End of the most recent session that ended at or before `now`."""
+    local = _now(now).astimezone(TIMEZONES[market])
+    day = local.date()
+    for _ in range(30):
+        if is_trading_day(market, day):
+            for _start, end in reversed(_sessions_on(market, day)):
+                if end <= local:
+                    return end
+        day -= timedelta(days=1)
+    raise ValueError(f"No {market} session within 30 days before {local}")
+
+def quotes_valid_since(market: str, ttl: float, now: Optional[datetime] = None) -> float:
+    """
+    Epoch time after which a cached quote of `market` is still current: `ttl`
+    seconds ago while the market trades, otherwise the settled last close
+    (so one fetch after the close serves until the next open).
+    """
+    now = _now(now)
+    if is_open(market, now):
+        return now.timestamp() - ttl
+    settled = last_close(market, now) + timedelta(seconds=SETTLE_SECONDS[market])
+    if settled > now:
+        # Closing auction still running: keep refreshing at the normal TTL
+        return now.timestamp() - ttl
+    return settled.timestamp()
+
+def next_refresh_delay(markets: Optional[Iterable[str]] = None, now: Optional[datetime] = None,
+                       open_interval: float = OPEN_INTERVAL) -> Tuple[float, str]:
+    """
+    Seconds until the next refresh and a short reason, for the given markets
+    (all by default): `open_interval` while one trades, EDGE_INTERVAL near an
+    open or close, otherwise until the next warm-up or open (at most MAX_IDLE).
+    """
+    now = _now(now)
+    markets = list(markets) if markets else list(MARKETS)
+    open_markets = [m for m in markets if is_open(m, now)]
+    if open_markets:
+        delay, reason = open_interval, f"open: {','.join(open_markets)}"
+        for market in open_markets:
+            local = now.astimezone(TIMEZONES[market])
+            for start, end in _sessions_on(market, local.date()):
+                if start <= local < end and ((local - start).total_seconds() < EDGE_WINDOW
+                                             or (end - local).total_seconds() < EDGE_WINDOW):
+                    delay, reason = min(delay, EDGE_INTERVAL), f"near open/close: {market}"
+                    # Don't sleep past the close itself
+                    delay = min(delay, max(1.0, (end - local).total_seconds()))
+        return delay, reason
+
+    upcoming = min((next_open(m, now), m) for m in markets)
+    until_open = (upcoming[0] - now).total_seconds()
+    if until_open <= WARMUP_LEAD:
+        return max(1.0, min(until_open, EDGE_INTERVAL * 4)), f"pre-open: {upcoming[1]}"
+    until_warmup = until_open - WARMUP_LEAD
+    return min(until_warmup, MAX_IDLE), f"closed until {upcoming[0].strftime('%m-%d %H:%M')} ({upcoming[1]})"
+
+def warmup_due(markets: Optional[Iterable[str]] = None, now: Optional[datetime] = None,
+               done: Optional[Dict[str, str]] = None) -> List[str]:
+    """
+    Markets whose next day open (not the end of a lunch break) is within
+    WARMUP_LEAD and that haven't been warmed up for that session yet. `done` maps market -> session key of the last
+    warm-up and is updated for the returned markets.
+    """
+    now = _now(now)
+    due = []
+    for market in (markets or MARKETS):
+        opening = next_open(market, now)
+        if (opening - now).total_seconds() > WARMUP_LEAD or opening.timetz().replace(tzinfo=None) != SESSIONS[market][0][0]:
+            continue
+        key = opening.isoformat()
+        if done is not None:
+            if done.get(market) == key:
+                continue
+            done[market] = key
+        due.append(market)
+    return due
@@ -0,0 +1,244 @@
+"""
+In-process refresh metrics: stage timers, request/byte counters, cache hit
+ratios and error counts, exported in the Prometheus text format.
+
+Collection is off unless ``FUND_NAV_METRICS=1`` or ``enable()`` is called.
+While disabled, ``timed`` wrappers cost one flag check and ``inc``/``timer``
+return immediately, so instrumentation can stay in the hot paths.
+
+Export options:
+
+* ``render_prometheus()``: the text exposition, e.g. for a download button;
+* ``FUND_NAV_METRICS_FILE``: ``export_configured()`` rewrites that file
+  (for node_exporter's textfile collector);
+* ``FUND_NAV_METRICS_PORT``: ``start_configured_server()`` serves ``/metrics``.
+"""
+import contextlib
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from src.rate_limiter import get_stats as get_limiter_stats
+
+PREFIX = 'fund_nav'
+
+_enabled = os.environ.get('FUND_NAV_METRICS', '').lower() in ('1', 'true', 'yes')
+_lock = threading.Lock()
+# (name, sorted label items) -> value
+_counters: Dict[tuple, float] = {}
+# stage -> [count, total seconds, max seconds]
+_timers: Dict[str, list] = {}
+_server = None
+
+_NOOP = contextlib.nullcontext()
+
+def enable(on: bool = True):
+    global _enabled
+    _enabled = on
+
+def is_enabled() -> bool:
+    return _enabled
+
+def inc(name: str, value: float = 1.0, **labels):
+    """Adds to a counter, e.g. inc('http_requests_total', host='hq.sinajs.cn', status='200')."""
+    if not _enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+def observe(stage: str, seconds: float):
+    """Records one timed run of a stage."""
+    if not _enabled:
+        return
+    with _lock:
+        entry = _timers.get(stage)
+        if entry is None:
+            _timers[stage] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+
+def record_error(stage: str):
+    inc('errors_total', stage=stage)
+
+def cache_lookup(cache: str, hit: bool):
+    inc('cache_lookups_total', cache=cache, result='hit' if hit else 'miss')
+
+class _Timer:
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.stage, time.perf_counter() - self.started)
+        if exc_type is not None:
+            record_error(self.stage)
+        return False
+
+def timer(stage: str):
+    """Context manager timing a block as `stage` (a no-op while disabled)."""
+    return _Timer(stage) if _enabled else _NOOP
+
+def timed(stage: str):
+    """Decorator timing every call of a function (sync or async) as `stage`."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await func(*args, **kwargs)
+                with _Timer(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+
+def snapshot() -> Dict:
+    """
+    Current values for display:
+    {'stages': {stage: {'count', 'total', 'avg', 'max', 'errors'}},
+     'counters': {name: [(labels dict, value), ...]},
+     'cache': {cache: {'hits', 'misses', 'ratio'}},
+     'hosts': rate limiter stats per host}
+    """
+    with _lock:
+        counters = dict(_counters)
+        timers = {stage: list(entry) for stage, entry in _timers.items()}
+
+    errors = {}
+    grouped = {}
+    cache = {}
+    for (name, labels), value in counters.items():
+        labels = dict(labels)
+        grouped.setdefault(name, []).append((labels, value))
+        if name == 'errors_total':
+            errors[labels['stage']] = errors.get(labels['stage'], 0) + value
+        elif name == 'cache_lookups_total':
+            entry = cache.setdefault(labels['cache'], {'hits': 0, 'misses': 0})
+            entry['hits' if labels['result'] == 'hit' else 'misses'] += value
+    for entry in cache.values():
+        total = entry['hits'] + entry['misses']
+        entry['ratio'] = entry['hits'] / total if total else None
+
+    stages = {}
+    for stage in sorted(set(timers) | set(errors)):
+        count, total, longest = timers.get(stage, [0, 0.0, 0.0])
+        stages[stage] = {'count': count, 'total': total, 'avg': total / count if count else None,
+                         'max': longest, 'errors': errors.get(stage, 0)}
+    return {'stages': stages, 'counters': grouped, 'cache': cache, 'hosts': get_limiter_stats()}
+
+def _format_labels(labels: Dict) -> str:
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in labels.values())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+def render_prometheus() -> str:
+    """Text exposition format (version 0.0.4)."""
+    snap = snapshot()
+    lines = []
+
+    if snap['stages']:
+        name = f'{PREFIX}_stage_seconds'
+        lines += [f'# HELP {name} Time spent per refresh stage.', f'# TYPE {name} summary']
+        for stage, s in snap['stages'].items():
+            lines.append(f'{name}_count{_format_labels({"stage": stage})} {s["count"]}')
+            lines.append(f'{name}_sum{_format_labels({"stage": stage})} {s["total"]:.6f}')
+        lines += [f'# HELP {name}_max Longest single run per stage.', f'# TYPE {name}_max gauge']
+        for stage, s in snap['stages'].items():
+            lines.append(f'{name}_max{_format_labels({"stage": stage})} {s["max"]:.6f}')
+
+    for counter, samples in sorted(snap['counters'].items()):
+        name = f'{PREFIX}_{counter}'
+        lines.append(f'# TYPE {name} counter')
+        for labels, value in samples:
+            lines.append(f'{name}{_format_labels(labels)} {value:g}')
+
+    if snap['hosts']:
+        for field, kind in (('throttled', 'counter'), ('retries', 'counter'), ('wait_seconds', 'counter'),
+                            ('concurrency_limit', 'gauge'), ('rate', 'gauge')):
+            name = f'{PREFIX}_limiter_{field}' + ('_total' if kind == 'counter' else '')
+            lines.append(f'# TYPE {name} {kind}')
+            for host, stats in snap['hosts'].items():
+                lines.append(f'{name}{_format_labels({"host": host})} {stats[field]:g}')
+
+    return '\n'.join(lines) + '\n'
+
+def write_prometheus(path: str):
+    """Atomically rewrites `path` with the current exposition."""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+def export_configured():
+    """Writes FUND_NAV_METRICS_FILE if set and metrics are enabled."""
+    path = os.environ.get('FUND_NAV_METRICS_FILE')
+    if path and _enabled:
+        try:
+            write_prometheus(path)
+        except OSError as e:
+            logging.warning(f"Cannot write metrics file {path}: {e}")
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_http_server(port: int, addr: str = '127.0.0.1'):
+    """Serves /metrics from a daemon thread; only one server per process."""
+    global _server
+    with _lock:
+        if _server is not None:
+            return _server
+        _server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+        _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, daemon=True, name='metrics-http').start()
+    return _server
+
+def start_configured_server() -> Optional[ThreadingHTTPServer]:
+    """Starts the endpoint on FUND_NAV_METRICS_PORT (and enables collection) if set."""
+    port = os.environ.get('FUND_NAV_METRICS_PORT')
+    if not port:
+        return None
+    enable()
+    try:
+        return start_http_server(int(port))
+    except OSError as e:
+        logging.warning(f"Cannot start metrics endpoint on port {port}: {e}")
+        return None
@@ -0,0 +1,280 @@
+"""
+Columnar, memory-mapped copy of the NAV history for fast range reads.
+
+``fund_nav_history`` in SQLite stays the source of truth; this store mirrors
+it as two flat arrays shared by the whole universe, each fund's series one
+contiguous, date-sorted segment:
+
+* ``days.<gen>.i4``: trading dates as int32 days since 1970-01-01;
+* ``nav.<gen>.f8``: unit NAVs as float64;
+* ``index.json``: ``{"gen", "size", "funds": {code: [offset, length]}}``.
+
+Readers map both files once and slice a fund's date range with a binary
+search, so a range read is two zero-copy array views: no SQL, no string to
+datetime parsing, and only the touched pages count towards RSS. Readers notice
+a new index by its mtime/inode and remap.
+
+Writers (``write_fund``, called by ``sync_fund_history`` after storing new
+rows) append the fund's complete series at the end of both files and point
+the index at the new segment. The old segment becomes garbage; once garbage
+outweighs live data the store is compacted into a new generation. Writers
+serialize on ``lock`` with ``fcntl.flock`` where available; the index is
+replaced atomically, and data files are never rewritten in place, so readers
+need no lock.
+
+The store lives in ``FUND_NAV_COLUMNS_DIR`` (default ``<db>.navcols``).
+Funds missing from it are mirrored from SQLite on first read;
+``python -m src.nav_columns rebuild`` mirrors a whole database at once.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.db import DB_PATH, connection
+
+try:
+    import fcntl
+except ImportError:  # Windows: single writer assumed
+    fcntl = None
+
+DAY_DTYPE = np.dtype('<i4')
+NAV_DTYPE = np.dtype('<f8')
+# Compact once the files hold this many times the live rows
+COMPACT_RATIO = 2.0
+
+_EPOCH = np.datetime64('1970-01-01', 'D')
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def columns_dir(db_path: Optional[str] = None) -> str:
+    if db_path is None and os.environ.get('FUND_NAV_COLUMNS_DIR'):
+        return os.environ['FUND_NAV_COLUMNS_DIR']
+    return f"{db_path or DB_PATH}.navcols"
+
+def to_days(dates) -> np.ndarray:
+    """'YYYY-MM-DD' strings (or datetimes) -> int32 days since epoch."""
+    return (np.asarray(dates, dtype='datetime64[D]') - _EPOCH).astype(DAY_DTYPE)
+
+def today_days() -> int:
+    """Today's local date as days since epoch."""
+    return date.today().toordinal() - _EPOCH_ORDINAL
+
+def from_days(days: np.ndarray) -> np.ndarray:
+    """int32 days since epoch -> datetime64[D]."""
+    return _EPOCH + days.astype('timedelta64[D]')
+
+def _data_paths(root: str, gen: int) -> Tuple[str, str]:
+    return os.path.join(root, f'days.{gen}.i4'), os.path.join(root, f'nav.{gen}.f8')
+
+def _map(path: str, dtype: np.dtype, count: int) -> np.ndarray:
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+class NavColumns:
+    """Read side of one columnar store (one per process and directory, see get_store)."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.index_path = os.path.join(root, 'index.json')
+        self._lock = threading.Lock()
+        self._stamp = None
+        # (funds, days, navs), swapped as one so a reader never mixes generations
+        self._state: Tuple[Dict[str, List[int]], np.ndarray, np.ndarray] = ({}, np.empty(0), np.empty(0))
+
+    def _refresh(self):
+        """Remaps the files if the index changed since the last read."""
+        try:
+            st = os.stat(self.index_path)
+        except FileNotFoundError:
+            self._stamp, self._state = None, ({}, np.empty(0), np.empty(0))
+            return
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            with open(self.index_path, encoding='utf-8') as f:
+                index = json.load(f)
+            days_path, nav_path = _data_paths(self.root, index['gen'])
+            try:
+                self._state = (index['funds'], _map(days_path, DAY_DTYPE, index['size']),
+                               _map(nav_path, NAV_DTYPE, index['size']))
+            except FileNotFoundError:
+                # Compacted between reading the index and opening its files; next read retries
+                return
+            self._stamp = stamp
+
+    def __contains__(self, fund_code: str) -> bool:
+        self._refresh()
+        return fund_code in self._state[0]
+
+    def read_range(self, fund_code: str, start: Optional[int] = None,
+                   end: Optional[int] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Zero-copy (days, navs) views of a fund's rows with start <= day <= end
+        (int days since epoch, either bound optional), or None if the fund
+        isn't mirrored. The views are read-only.
+        """
+        self._refresh()
+        funds, all_days, all_navs = self._state
+        segment = funds.get(fund_code)
+        if segment is None:
+            return None
+        offset, length = segment
+        days = all_days[offset:offset + length]
+        lo = int(np.searchsorted(days, start, side='left')) if start is not None else 0
+        hi = int(np.searchsorted(days, end, side='right')) if end is not None else length
+        return days[lo:hi], all_navs[offset + lo:offset + hi]
+
+_stores: Dict[str, NavColumns] = {}
+_stores_lock = threading.Lock()
+
+def get_store(db_path: Optional[str] = None) -> NavColumns:
+    root = columns_dir(db_path)
+    with _stores_lock:
+        if root not in _stores:
+            _stores[root] = NavColumns(root)
+        return _stores[root]
+
+@contextmanager
+def _writer(root: str):
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, 'lock'), 'a') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _load_index(root: str) -> Dict:
+    try:
+        with open(os.path.join(root, 'index.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'gen': 0, 'size': 0, 'funds': {}}
+
+def _save_index(root: str, index: Dict):
+    path = os.path.join(root, 'index.json')
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(index, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+def _append(root: str, index: Dict, series: Dict[str, Tuple[np.ndarray, np.ndarray]]):
+    """Appends whole-fund series after the live end of the current generation and indexes them."""
+    days_path, nav_path = _data_paths(root, index['gen'])
+    offset = index['size']
+    with open(days_path, 'ab') as days_file, open(nav_path, 'ab') as nav_file:
+        # Drop a tail left by a writer that died before updating the index
+        days_file.truncate(offset * DAY_DTYPE.itemsize)
+        nav_file.truncate(offset * NAV_DTYPE.itemsize)
+        for fund_code, (days, navs) in series.items():
+            days_file.write(np.ascontiguousarray(days, dtype=DAY_DTYPE).tobytes())
+            nav_file.write(np.ascontiguousarray(navs, dtype=NAV_DTYPE).tobytes())
+            index['funds'][fund_code] = [offset, len(days)]
+            offset += len(days)
+    index['size'] = offset
+
+def _compact(root: str, index: Dict) -> Dict:
+    """Copies the live segments into a new generation; old files are removed once the index points away."""
+    old_days, old_navs = (_map(path, dtype, index['size']) for path, dtype in
+                          zip(_data_paths(root, index['gen']), (DAY_DTYPE, NAV_DTYPE)))
+    fresh = {'gen': index['gen'] + 1, 'size': 0, 'funds': {}}
+    series = {code: (old_days[o:o + n], old_navs[o:o + n]) for code, (o, n) in index['funds'].items()}
+    _append(root, fresh, series)
+    _save_index(root, fresh)
+    for path in _data_paths(root, index['gen']):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    logging.info(f"Compacted NAV columns to generation {fresh['gen']} ({fresh['size']} rows)")
+    return fresh
+
+def write_series(series: Dict[str, Tuple[Iterable[str], Iterable[float]]], db_path: Optional[str] = None):
+    """
+    Replaces the mirrored series of the given funds.
+    `series` maps fund code -> (dates 'YYYY-MM-DD', navs), in any order.
+    """
+    if not series:
+        return
+    root = columns_dir(db_path)
+    packed = {}
+    for fund_code, (dates, navs) in series.items():
+        days = to_days(list(dates))
+        navs = np.asarray(list(navs), dtype=NAV_DTYPE)
+        order = np.argsort(days, kind='stable')
+        packed[fund_code] = days[order], navs[order]
+    with _writer(root):
+        index = _load_index(root)
+        _append(root, index, packed)
+        live = sum(n for _, n in index['funds'].values())
+        if index['size'] > COMPACT_RATIO * live:
+            _compact(root, index)
+        else:
+            _save_index(root, index)
+
+def _read_db_series(fund_codes: Optional[List[str]], db_path: Optional[str]) -> Dict[str, Tuple[List[str], List[float]]]:
+    with connection(db_path) as conn:
+        query = 'SELECT fund_code, nav_date, nav FROM fund_nav_history'
+        params = []
+        if fund_codes is not None:
+            query += f" WHERE fund_code IN ({','.join('?' * len(fund_codes))})"
+            params = fund_codes
+        rows = conn.execute(query + ' ORDER BY fund_code, nav_date', params).fetchall()
+    series = {}
+    for fund_code, nav_date, nav in rows:
+        dates, navs = series.setdefault(fund_code, ([], []))
+        dates.append(nav_date)
+        navs.append(nav)
+    return series
+
+def write_fund(fund_code: str, db_path: Optional[str] = None) -> bool:
+    """Mirrors one fund's stored history; False if SQLite has none."""
+    series = _read_db_series([fund_code], db_path)
+    if not series:
+        return False
+    write_series(series, db_path)
+    return True
+
+def rebuild(db_path: Optional[str] = None) -> int:
+    """Mirrors every fund in SQLite into a fresh generation. Returns funds written."""
+    series = _read_db_series(None, db_path)
+    root = columns_dir(db_path)
+    with _writer(root):
+        index = _load_index(root)
+        fresh = {'gen': index['gen'] + 1, 'size': 0, 'funds': {}}
+        packed = {code: (to_days(dates), np.asarray(navs, dtype=NAV_DTYPE)) for code, (dates, navs) in series.items()}
+        _append(root, fresh, packed)
+        _save_index(root, fresh)
+        for path in _data_paths(root, index['gen']):
+            if os.path.exists(path):
+                os.remove(path)
+    return len(series)
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the memory-mapped NAV history mirror")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('rebuild', help="Mirror every stored fund into a fresh generation")
+    sub.add_parser('stats', help="Show funds, live rows and file rows")
+    args = parser.parse_args()
+    root = columns_dir()
+    if args.command == 'rebuild':
+        print(f"Mirrored {rebuild()} funds into {root}")
+    else:
+        index = _load_index(root)
+        live = sum(n for _, n in index['funds'].values())
+        print(f"{root}: generation {index['gen']}, {len(index['funds'])} funds, {live} live rows, {index['size']} file rows")
+
+if __name__ == '__main__':
+    main()
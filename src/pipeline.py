@@ -0,0 +1,319 @@
+"""
+Portfolio refresh pipeline.
+
+A refresh runs in three phases so that quote traffic scales with the number of
+distinct securities in the book rather than with the number of funds:
+
+1. Resolve holdings for every fund (parallel, one request per fund).
+2. Build the union of all ``fetch_code`` values and fetch it once.
+3. Run ``estimate_nav_change`` for every fund against the shared quote table.
+
+The pipeline runs on asyncio over the shared bounded worker pool of
+``src.async_fetcher``; ``refresh_funds`` is the synchronous entry point.
+
+``stream_fund_results`` is the streaming variant for large sweeps: it yields
+each fund as soon as its own quotes are in, while still batching quote
+requests across funds.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src import async_fetcher
+from src.async_fetcher import fetch_holdings, fetch_quotes, run_blocking, run_sync
+from src.data_fetcher import QUOTE_BATCH_SIZE
+from src.metrics import inc, timed, timer
+from src.quote_store import fetch_price_batch_cached
+from src.valuation import estimate_nav_change, estimate_nav_changes
+
+
+def failed_result(code: str, position_amount: float, status: str, fund_name: str = '--') -> Dict:
+    """Result row for a fund that could not be estimated."""
+    return {
+        '基金代码': code,
+        '基金名称': fund_name,
+        '持仓日期': '--',
+        '状态': status,
+        '估算涨跌': None,
+        '重仓股权重': None,
+        '持仓金额': position_amount,
+        '估算收益': None,
+        'Details': []
+    }
+
+
+async def resolve_all_holdings(codes: List[str],
+                               progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[str, Optional[Tuple]]:
+    """
+    Phase 1: resolve holdings for every fund concurrently.
+    Served from the local holdings store unless a snapshot is stale.
+
+    Returns:
+        Dict of {fund_code: get_fund_holdings(...) result or None}
+    """
+    holdings_map = {}
+    if not codes:
+        return holdings_map
+
+    async def resolve(code):
+        try:
+            return code, await fetch_holdings(code)
+        except Exception as e:
+            logging.error(f"Error fetching holdings for {code}: {e}")
+            return code, None
+
+    completed_count = 0
+    for next_done in asyncio.as_completed([resolve(code) for code in codes]):
+        code, result_data = await next_done
+        holdings_map[code] = result_data
+        completed_count += 1
+        if progress_callback:
+            progress_callback(completed_count, len(codes))
+
+    return holdings_map
+
+
+def collect_fetch_codes(holdings_map: Dict[str, Optional[Tuple]]) -> List[str]:
+    """
+    Phase 2 input: the de-duplicated union of quote codes across all funds.
+    """
+    fetch_codes = {}
+    for result_data in holdings_map.values():
+        if not result_data:
+            continue
+        for h in result_data[1]:
+            # Malformed holdings are left to fail their own fund in phase 3
+            quote_code = h.get('fetch_code') or h.get('code')
+            if quote_code:
+                fetch_codes[quote_code] = None
+    return list(fetch_codes)
+
+
+@timed('fund_result')
+def build_fund_result(code: str, result_data: Optional[Tuple], prices: Dict[str, Dict],
+                      position_amount: float = 10000.0, valuation: Optional[Dict] = None) -> Dict:
+    """
+    Phase 3: estimate a single fund against the shared quote table.
+    A precomputed `valuation` (from the batch engine) skips estimate_nav_change.
+    """
+    if not result_data:
+        return failed_result(code, position_amount, '获取持仓失败')
+
+    # Unpack tuple
+    if len(result_data) == 3:
+        fund_name, holdings, report_date = result_data
+    else:
+        fund_name, holdings = result_data
+        report_date = "--"
+
+    if valuation is None:
+        valuation = estimate_nav_change(holdings, prices)
+
+    estimated_change = valuation['estimated_change']
+    estimated_profit = position_amount * (estimated_change / 100) if estimated_change is not None else None
+
+    return {
+        '基金代码': code,
+        '基金名称': fund_name,
+        '持仓日期': report_date,
+        '状态': '成功',
+        '估算涨跌': estimated_change,
+        '重仓股权重': valuation['total_weight_used'],
+        '持仓金额': position_amount,
+        '估算收益': estimated_profit,
+        'Details': valuation['details'],
+        '更新时间': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        # Oldest quote behind the estimate, and how many came from cache after a failed fetch
+        '行情时间': (datetime.fromtimestamp(valuation['quotes_as_of']).strftime("%Y-%m-%d %H:%M:%S")
+                     if valuation.get('quotes_as_of') else None),
+        '过期行情': valuation.get('stale_quotes', 0)
+    }
+
+
+@timed('refresh')
+async def refresh_funds_async(funds_with_amounts: Iterable[Tuple[str, float]],
+                              progress_callback: Optional[Callable[[int, int], None]] = None,
+                              history_fetcher: Optional[Callable[[str], object]] = None) -> List[Dict]:
+    """
+    Runs a full refresh for a list of (fund_code, position_amount) pairs.
+
+    Args:
+        funds_with_amounts: (fund_code, position_amount) pairs
+        progress_callback: Called as progress_callback(done, total) while holdings resolve
+        history_fetcher: Optional blocking callable returning NAV history for a fund code,
+            attached to successful results under 'History'
+
+    Returns:
+        List of result dicts in input order.
+    """
+    funds_with_amounts = list(funds_with_amounts)
+    codes = list(dict.fromkeys(code for code, _ in funds_with_amounts))
+
+    # 1. Holdings for all funds
+    with timer('refresh_holdings'):
+        holdings_map = await resolve_all_holdings(codes, progress_callback=progress_callback)
+
+    # 2. One quote fetch for the whole book
+    fetch_codes = collect_fetch_codes(holdings_map)
+    with timer('refresh_quotes'):
+        prices = await fetch_quotes(fetch_codes)
+    logging.info(f"Refreshing {len(codes)} funds with {len(fetch_codes)} distinct securities")
+    inc('refresh_funds_total', len(codes))
+    inc('refresh_securities_total', len(fetch_codes))
+
+    # 3. Estimate every fund in one vectorized pass
+    try:
+        valuations = estimate_nav_changes({code: r[1] for code, r in holdings_map.items() if r}, prices)
+    except Exception as e:
+        # One malformed holdings list mustn't fail the whole book: estimate fund by fund instead
+        logging.error(f"Batch valuation failed, falling back to per-fund estimates: {e}")
+        valuations = {}
+    results = []
+    for code, position_amount in funds_with_amounts:
+        try:
+            results.append(build_fund_result(code, holdings_map.get(code), prices, position_amount,
+                                             valuation=valuations.get(code)))
+        except Exception as e:
+            logging.error(f"Error processing {code}: {e}")
+            results.append(failed_result(code, position_amount, f'Error: {str(e)}', fund_name='Error'))
+
+    if history_fetcher:
+        successful = [item for item in results if item['状态'] == '成功']
+        with timer('refresh_history'):
+            histories = await asyncio.gather(*(run_blocking(history_fetcher, item['基金代码']) for item in successful),
+                                             return_exceptions=True)
+        for item, history in zip(successful, histories):
+            if isinstance(history, Exception):
+                logging.warning(f"Error fetching history for {item['基金代码']}: {history}")
+                history = None
+            item['History'] = history
+
+    return results
+
+
+def refresh_funds(funds_with_amounts: Iterable[Tuple[str, float]],
+                  progress_callback: Optional[Callable[[int, int], None]] = None,
+                  history_fetcher: Optional[Callable[[str], object]] = None) -> List[Dict]:
+    """Synchronous wrapper around refresh_funds_async."""
+    return run_sync(refresh_funds_async(funds_with_amounts, progress_callback, history_fetcher))
+
+
+async def stream_fund_results(funds_with_amounts: Iterable[Tuple[str, float]],
+                              history_fetcher: Optional[Callable[[str], object]] = None,
+                              max_in_flight: Optional[int] = None, batch_size: int = QUOTE_BATCH_SIZE,
+                              linger: float = 0.05) -> AsyncIterator[Dict]:
+    """
+    Yields one result dict per fund, in completion order, as soon as that
+    fund's holdings and quotes are available.
+
+    Quote codes are queued as holdings arrive and fetched in batches of
+    `batch_size` (a partial batch goes out after `linger` seconds), and each
+    code is requested at most once per call. At most `max_in_flight` holdings
+    lookups are outstanding, so quote batches are never stuck behind the
+    whole book on the worker pool.
+    """
+    positions = {}
+    for code, amount in funds_with_amounts:
+        positions.setdefault(code, amount)
+    if not positions:
+        return
+    max_in_flight = max_in_flight or async_fetcher.MAX_CONCURRENCY
+
+    loop = asyncio.get_running_loop()
+    done_queue: asyncio.Queue = asyncio.Queue()
+    prices: Dict[str, Dict] = {}
+    # Codes queued or fetched (answered once their batch returns, with or without a quote)
+    requested, answered = set(), set()
+    pending: List[str] = []
+    # fund code -> (holdings tuple, codes still missing); quote code -> funds waiting on it
+    waiting: Dict[str, Tuple[Tuple, set]] = {}
+    waiters = defaultdict(set)
+    tasks = set()
+    flush_timer = None
+    slots = asyncio.Semaphore(max_in_flight)
+
+    def spawn(coro):
+        task = loop.create_task(coro)
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    async def finish(code, result_data):
+        try:
+            item = build_fund_result(code, result_data, prices, positions[code])
+        except Exception as e:
+            logging.error(f"Error processing {code}: {e}")
+            item = failed_result(code, positions[code], f'Error: {str(e)}', fund_name='Error')
+        if history_fetcher and item['状态'] == '成功':
+            try:
+                item['History'] = await run_blocking(history_fetcher, code)
+            except Exception as e:
+                logging.warning(f"Error fetching history for {code}: {e}")
+                item['History'] = None
+        done_queue.put_nowait(item)
+
+    async def quote_batch(batch):
+        try:
+            prices.update(await run_blocking(fetch_price_batch_cached, batch))
+        except Exception as e:
+            logging.error(f"Error fetching quote batch: {e}")
+        answered.update(batch)
+        for quote_code in batch:
+            for code in waiters.pop(quote_code, ()):
+                result_data, missing = waiting[code]
+                missing.discard(quote_code)
+                if not missing:
+                    del waiting[code]
+                    spawn(finish(code, result_data))
+
+    def flush(partial=False):
+        nonlocal pending, flush_timer
+        while len(pending) >= batch_size or (partial and pending):
+            batch, pending = pending[:batch_size], pending[batch_size:]
+            spawn(quote_batch(batch))
+        if partial:
+            flush_timer = None
+        elif pending and flush_timer is None:
+            flush_timer = loop.call_later(linger, flush, True)
+
+    async def resolve(code):
+        try:
+            result_data = await fetch_holdings(code)
+        except Exception as e:
+            logging.error(f"Error fetching holdings for {code}: {e}")
+            result_data = None
+        finally:
+            slots.release()
+
+        missing = set()
+        if result_data:
+            for h in result_data[1]:
+                quote_code = h.get('fetch_code')
+                if not quote_code or quote_code in answered:
+                    continue
+                missing.add(quote_code)
+                waiters[quote_code].add(code)
+                if quote_code not in requested:
+                    requested.add(quote_code)
+                    pending.append(quote_code)
+        if missing:
+            waiting[code] = (result_data, missing)
+            flush()
+        else:
+            await finish(code, result_data)
+
+    async def feed():
+        for code in positions:
+            await slots.acquire()
+            spawn(resolve(code))
+
+    spawn(feed())
+    try:
+        for _ in range(len(positions)):
+            yield await done_queue.get()
+    finally:
+        if flush_timer is not None:
+            flush_timer.cancel()
+        for task in list(tasks):
+            task.cancel()
@@ -0,0 +1,141 @@
+"""
+Short-lived quote cache shared by every process on the same database.
+
+Dashboards, the collector, the batch CLI and the API server all fetch Sina
+quotes through ``fetch_price_batch_cached``: codes quoted within their market's
+TTL are served from ``quote_cache`` and only the rest go upstream, in one
+request per batch. While a market is closed its last close is served until
+the next open (see ``src.market_hours``), so off-hours refreshes cost no
+quote requests. Entries are evicted least-recently-used beyond
+``MAX_ENTRIES``. Reads don't write: a hit only refreshes its ``accessed_at``
+once it is ``ACCESS_RESOLUTION`` old, so cache hits never queue for the
+database's single write lock on the refresh path.
+
+Every quote carries ``as_of`` (epoch seconds of the upstream fetch). When a
+fetch fails, the last stored quote (up to ``STALE_MAX_AGE`` old) is served
+with ``stale=True`` rather than dropping the holding from the estimate;
+valuation reports the oldest ``as_of`` and the number of stale quotes per fund.
+"""
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from src.data_fetcher import fetch_price_batch
+from src.db import connection, transaction
+from src.market_hours import market_of, quotes_valid_since
+from src.metrics import cache_lookup, inc
+
+# Seconds a quote is served without refetching, per market
+QUOTE_TTLS = {
+    'a': float(os.environ.get('FUND_NAV_QUOTE_TTL_A', 3)),
+    'hk': float(os.environ.get('FUND_NAV_QUOTE_TTL_HK', 5)),
+    'us': float(os.environ.get('FUND_NAV_QUOTE_TTL_US', 5)),
+}
+# Oldest quote still used when upstream fails
+STALE_MAX_AGE = 24 * 3600
+MAX_ENTRIES = int(os.environ.get('FUND_NAV_QUOTE_CACHE_SIZE', 50000))
+# Eviction runs on every Nth save per process
+EVICT_EVERY = 50
+# Granularity of the LRU clock: a hit's accessed_at is rewritten at most this often
+ACCESS_RESOLUTION = 600
+
+_saves = 0
+
+def load_quotes(codes: List[str], max_age: Optional[float] = None, now: Optional[float] = None,
+                db_path: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    Stored quotes for `codes`, each with 'as_of'. By default only current
+    quotes: within their market's TTL while it trades, or fetched after its
+    last close while it is closed. `max_age` instead accepts any quote up to
+    that age.
+    """
+    if not codes:
+        return {}
+    now = now or time.time()
+    if max_age is None:
+        clock = datetime.fromtimestamp(now, timezone.utc)
+        valid_since = {m: quotes_valid_since(m, ttl, clock) for m, ttl in QUOTE_TTLS.items()}
+    else:
+        valid_since = dict.fromkeys(QUOTE_TTLS, now - max_age)
+    with connection(db_path) as conn:
+        placeholders = ','.join('?' * len(codes))
+        rows = conn.execute('SELECT code, name, price, change, fetched_at, accessed_at FROM quote_cache '
+                            f'WHERE code IN ({placeholders})', codes).fetchall()
+    quotes = {}
+    touched = []
+    for row in rows:
+        if row['fetched_at'] >= valid_since[market_of(row['code'])]:
+            quotes[row['code']] = {'name': row['name'], 'price': row['price'], 'change': row['change'],
+                                   'as_of': row['fetched_at']}
+            if row['accessed_at'] < now - ACCESS_RESOLUTION:
+                touched.append((now, row['code']))
+    if touched:
+        # Rare: quotes served long after their fetch, i.e. while their market is closed
+        try:
+            with transaction(db_path) as conn:
+                conn.executemany('UPDATE quote_cache SET accessed_at = ? WHERE code = ?', touched)
+        except Exception as e:
+            logging.warning(f"Error touching cached quotes: {e}")
+    return quotes
+
+def save_quotes(quotes: Dict[str, Dict], now: Optional[float] = None, db_path: Optional[str] = None):
+    """Stores freshly fetched quotes (stamped `now`) and evicts beyond MAX_ENTRIES now and then."""
+    global _saves
+    if not quotes:
+        return
+    now = now or time.time()
+    try:
+        with transaction(db_path) as conn:
+            conn.executemany('''
+            INSERT OR REPLACE INTO quote_cache (code, name, price, change, fetched_at, accessed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(code, q.get('name'), q.get('price'), q.get('change'), now, now) for code, q in quotes.items()])
+        _saves += 1
+        if _saves % EVICT_EVERY == 0:
+            evict_quotes(db_path=db_path)
+    except Exception as e:
+        logging.error(f"Error saving quotes: {e}")
+
+def evict_quotes(max_entries: int = MAX_ENTRIES, db_path: Optional[str] = None) -> int:
+    """Drops the least recently used quotes beyond `max_entries`. Returns rows deleted."""
+    with transaction(db_path) as conn:
+        cursor = conn.execute('''
+        DELETE FROM quote_cache WHERE code IN (
+            SELECT code FROM quote_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+        )
+        ''', (max_entries,))
+    if cursor.rowcount:
+        inc('quote_cache_evictions_total', cursor.rowcount)
+    return cursor.rowcount
+
+def fetch_price_batch_cached(batch: List[str], db_path: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    Drop-in replacement for fetch_price_batch: fresh cached quotes first, one
+    upstream request for the rest, stale quotes for codes upstream didn't return.
+    """
+    now = time.time()
+    quotes = load_quotes(batch, now=now, db_path=db_path)
+    for code in batch:
+        cache_lookup('quotes', hit=code in quotes)
+    missing = [code for code in batch if code not in quotes]
+    if not missing:
+        return quotes
+
+    fetched = fetch_price_batch(missing)
+    if fetched:
+        save_quotes(fetched, now=now, db_path=db_path)
+        for code, quote in fetched.items():
+            quotes[code] = dict(quote, as_of=now)
+
+    unanswered = [code for code in missing if code not in fetched]
+    if unanswered:
+        stale = load_quotes(unanswered, max_age=STALE_MAX_AGE, now=now, db_path=db_path)
+        for code, quote in stale.items():
+            quote['stale'] = True
+            quotes[code] = quote
+        if stale:
+            logging.warning(f"Using stale quotes for {len(stale)} securities")
+            inc('quote_stale_fallback_total', len(stale))
+    return quotes
@@ -0,0 +1,167 @@
+"""
+Per-host request limiting for the shared HTTP client.
+
+Each upstream host gets a ``HostLimiter`` combining:
+
+* a token bucket capping the request rate (with a small burst allowance), and
+* an AIMD concurrency limit: every success raises the limit by 1/limit (about
+  one extra slot per round of requests), every throttle signal (429/503,
+  timeout, dropped connection) halves it. The bucket rate is halved on the
+  same signals and climbs back by 5% of its ceiling per second of traffic, so
+  a throttled host is backed off on both axes and then probed upward again
+  until it pushes back.
+
+Decreases are applied at most once per ``DECREASE_HOLD`` seconds, so a burst of
+failures from one congestion event halves the limits once rather than
+collapsing them to the floor. Counters per host are exposed via ``get_stats``.
+"""
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+# Ceiling and starting point for each host; adaptive limits move below these
+DEFAULT_RATE = float(os.environ.get('FUND_NAV_HOST_RATE', 30))
+DEFAULT_BURST = float(os.environ.get('FUND_NAV_HOST_BURST', 10))
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get('FUND_NAV_HOST_CONCURRENCY', 16))
+DEFAULT_INITIAL_CONCURRENCY = 4
+MIN_RATE = 0.5
+# Fraction of the rate ceiling regained per second of successful traffic
+RATE_STEP = 0.05
+MIN_CONCURRENCY = 1
+
+# Seconds after a decrease during which further throttle signals are not applied again
+DECREASE_HOLD = 1.0
+# Jittered backoff between retries: uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+BACKOFF_BASE = 0.3
+BACKOFF_CAP = 10.0
+
+# Outcomes reported to HostLimiter.release
+SUCCESS = 'success'
+THROTTLED = 'throttled'
+ERROR = 'error'
+
+class HostLimiter:
+    """Token bucket + AIMD concurrency limit for one host. Thread-safe."""
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 initial_concurrency: int = DEFAULT_INITIAL_CONCURRENCY):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_concurrency = max_concurrency
+        self.limit = float(min(initial_concurrency, max_concurrency))
+        self.tokens = self.burst
+        self.in_flight = 0
+        self._refilled_at = time.monotonic()
+        self._decreased_at = 0.0
+        self._cond = threading.Condition()
+        self.stats = {
+            'requests': 0,
+            'successes': 0,
+            'throttled': 0,
+            'errors': 0,
+            'retries': 0,
+            'wait_seconds': 0.0,
+        }
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def acquire(self):
+        """Blocks until a concurrency slot and a token are available."""
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self.in_flight < int(self.limit):
+                    if self.tokens >= 1:
+                        break
+                    # Wake when the next token is due (or earlier, on release)
+                    self._cond.wait((1 - self.tokens) / self.rate)
+                else:
+                    self._cond.wait()
+            self.tokens -= 1
+            self.in_flight += 1
+            self.stats['requests'] += 1
+            self.stats['wait_seconds'] += time.monotonic() - started
+
+    def release(self, outcome: str = SUCCESS):
+        """Returns the slot and adapts the limits to the outcome."""
+        with self._cond:
+            self.in_flight -= 1
+            if outcome == SUCCESS:
+                self.stats['successes'] += 1
+                # Additive increase: about +1 slot per round of requests, and (successes
+                # arriving `rate` times a second) RATE_STEP of the ceiling per second
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+                self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_STEP / self.rate)
+            else:
+                self.stats['throttled' if outcome == THROTTLED else 'errors'] += 1
+                now = time.monotonic()
+                if outcome == THROTTLED and now - self._decreased_at >= DECREASE_HOLD:
+                    # Multiplicative decrease
+                    self._decreased_at = now
+                    self._refill(now)
+                    self.limit = max(MIN_CONCURRENCY, self.limit / 2)
+                    self.rate = max(MIN_RATE, self.rate / 2)
+                    self.tokens = min(self.tokens, 0.0)
+            self._cond.notify_all()
+
+    def record_retry(self):
+        with self._cond:
+            self.stats['retries'] += 1
+
+    def snapshot(self) -> Dict:
+        with self._cond:
+            return dict(self.stats, concurrency_limit=int(self.limit), rate=round(self.rate, 2),
+                        in_flight=self.in_flight)
+
+_limiters: Dict[str, HostLimiter] = {}
+_host_settings: Dict[str, Dict] = {}
+_limiters_lock = threading.Lock()
+
+def configure_host(host: str, rate: Optional[float] = None, burst: Optional[float] = None,
+                   max_concurrency: Optional[int] = None):
+    """Overrides the limits for one host (e.g. 'hq.sinajs.cn'). Resets its adaptive state."""
+    with _limiters_lock:
+        settings = _host_settings.setdefault(host, {})
+        if rate is not None:
+            settings['rate'] = rate
+        if burst is not None:
+            settings['burst'] = burst
+        if max_concurrency is not None:
+            settings['max_concurrency'] = max_concurrency
+        _limiters.pop(host, None)
+
+def get_limiter(host: str) -> HostLimiter:
+    """Returns the shared limiter for a host, creating it on first use."""
+    limiter = _limiters.get(host)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(host)
+            if limiter is None:
+                limiter = _limiters[host] = HostLimiter(**_host_settings.get(host, {}))
+    return limiter
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None, base: float = BACKOFF_BASE) -> float:
+    """Full-jitter exponential backoff, never shorter than a server-sent Retry-After."""
+    delay = random.uniform(0, min(BACKOFF_CAP, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, BACKOFF_CAP))
+    return delay
+
+def get_stats() -> Dict[str, Dict]:
+    """Counters and current limits per host."""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {host: limiter.snapshot() for host, limiter in limiters.items()}
+
+def reset_stats():
+    """Drops all limiters (and their adaptive state and counters)."""
+    with _limiters_lock:
+        _limiters.clear()
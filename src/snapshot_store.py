@@ -0,0 +1,62 @@
+"""
+Latest refresh results per fund, written by the collector and read by the dashboard.
+
+``fund_snapshots`` holds one JSON payload per fund (the same dict the refresh
+pipeline returns, minus the history frame), and ``collector_status`` records
+the collector's heartbeat so readers can tell whether snapshots are live.
+"""
+import json
+import logging
+import time
+from typing import Dict, List, Optional
+
+from src.db import connection, transaction
+
+
+def save_snapshots(results: List[Dict], db_path: Optional[str] = None):
+    """Stores refresh results (one per fund) in a single transaction."""
+    now = time.time()
+    rows = []
+    for item in results:
+        payload = {k: v for k, v in item.items() if k != 'History'}
+        rows.append((item['基金代码'], json.dumps(payload, ensure_ascii=False), now))
+
+    try:
+        with transaction(db_path) as conn:
+            conn.executemany('INSERT OR REPLACE INTO fund_snapshots (fund_code, payload, updated_at) VALUES (?, ?, ?)', rows)
+    except Exception as e:
+        logging.error(f"Error saving snapshots: {e}")
+
+def load_snapshots(fund_codes: Optional[List[str]] = None, db_path: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    Returns {fund_code: result dict} for the requested funds (all funds if None).
+    """
+    with connection(db_path) as conn:
+        rows = conn.execute('SELECT fund_code, payload FROM fund_snapshots').fetchall()
+
+    wanted = set(fund_codes) if fund_codes is not None else None
+    return {row['fund_code']: json.loads(row['payload']) for row in rows
+            if wanted is None or row['fund_code'] in wanted}
+
+def record_heartbeat(interval_seconds: float, fund_count: int, duration_seconds: float,
+                     db_path: Optional[str] = None):
+    """Marks a completed collector cycle."""
+    with transaction(db_path) as conn:
+        conn.execute('''
+        INSERT OR REPLACE INTO collector_status (id, last_run_at, interval_seconds, fund_count, duration_seconds)
+        VALUES (1, ?, ?, ?, ?)
+        ''', (time.time(), interval_seconds, fund_count, duration_seconds))
+
+def get_collector_status(db_path: Optional[str] = None) -> Optional[Dict]:
+    """
+    Returns the last heartbeat plus an 'active' flag (a cycle finished within
+    three intervals), or None if no collector has ever run.
+    """
+    with connection(db_path) as conn:
+        row = conn.execute('SELECT * FROM collector_status WHERE id = 1').fetchone()
+
+    if not row:
+        return None
+    status = dict(row)
+    status['active'] = time.time() - status['last_run_at'] <= 3 * status['interval_seconds']
+    return status
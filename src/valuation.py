@@ -1,6 +1,11 @@
 from typing import List, Dict, Optional
 import logging
 
+import numpy as np
+
+from src.metrics import timed
+
+@timed('valuation')
 def estimate_nav_change(holdings: List[Dict], prices: Dict[str, Dict]) -> Dict:
     """
     Estimates the real-time NAV change based on holdings and current stock prices.
@@ -13,20 +18,24 @@ def estimate_nav_change(holdings: List[Dict], prices: Dict[str, Dict]) -> Dict:
         Dict: {
             'estimated_change': float, # The estimated percentage change (e.g., 1.5 for +1.5%)
             'total_weight_used': float, # The sum of weights of stocks used for calculation
-            'details': List[Dict] # Details for UI
+            'details': List[Dict], # Details for UI
+            'quotes_as_of': Optional[float], # Fetch time (epoch) of the oldest quote used, if known
+            'stale_quotes': int # Quotes served from cache after a failed fetch
         }
     """
     if not holdings:
-        return {'estimated_change': 0.0, 'total_weight_used': 0.0, 'details': []}
+        return {'estimated_change': 0.0, 'total_weight_used': 0.0, 'details': [],
+                'quotes_as_of': None, 'stale_quotes': 0}
         
     total_weighted_change = 0.0
     total_weight = 0.0
     details = []
+    used_quotes = []
     
     for item in holdings:
         code = item['code']
         # Use fetch_code for lookup if available (for HK/US stocks), else fallback to display code
-        lookup_code = item.get('fetch_code', code)
+        lookup_code = item.get('fetch_code') or code
         
         weight = item.get('weight', 0.0)
         
@@ -40,6 +49,7 @@ def estimate_nav_change(holdings: List[Dict], prices: Dict[str, Dict]) -> Dict:
             weighted_change = change * weight
             total_weighted_change += weighted_change
             total_weight += weight
+            used_quotes.append(price_info)
             
             details.append({
                 'code': code,
@@ -47,7 +57,8 @@ def estimate_nav_change(holdings: List[Dict], prices: Dict[str, Dict]) -> Dict:
                 'weight': weight,
                 'price': current_price,
                 'change': change,
-                'contribution': weighted_change # Contribution to the sum, logic-wise
+                'contribution': weighted_change, # Contribution to the sum, logic-wise
+                'as_of': price_info.get('as_of')
             })
         else:
             # Stock price not found (e.g. HK stock or fetching failed)
@@ -57,11 +68,13 @@ def estimate_nav_change(holdings: List[Dict], prices: Dict[str, Dict]) -> Dict:
                 'weight': weight,
                 'price': None,
                 'change': None,
-                'contribution': 0.0
+                'contribution': 0.0,
+                'as_of': None
             })
 
+    freshness = quote_freshness(used_quotes)
     if total_weight == 0:
-        return {'estimated_change': 0.0, 'total_weight_used': 0.0, 'details': details}
+        return {'estimated_change': 0.0, 'total_weight_used': 0.0, 'details': details, **freshness}
         
     # Normalized Estimate
     # Formula: Sum(Weight * Change) / Sum(Weights)
@@ -71,5 +84,197 @@ def estimate_nav_change(holdings: List[Dict], prices: Dict[str, Dict]) -> Dict:
     return {
         'estimated_change': final_estimate,
         'total_weight_used': total_weight,
-        'details': details
+        'details': details,
+        **freshness
+    }
+
+def quote_freshness(quotes: List[Dict]) -> Dict:
+    """Oldest 'as_of' and number of 'stale' entries among the quotes behind one estimate."""
+    stamps = [q['as_of'] for q in quotes if q.get('as_of') is not None]
+    return {
+        'quotes_as_of': min(stamps) if stamps else None,
+        'stale_quotes': sum(1 for q in quotes if q.get('stale'))
+    }
+
+
+def build_weight_matrix(holdings_map: Dict[str, List[Dict]]) -> Dict:
+    """
+    Packs many funds' holdings into a sparse fund x security weight matrix (CSR).
+    
+    Args:
+        holdings_map: {fund_code: holdings list as returned by get_fund_holdings}
+        
+    Returns:
+        Dict: {
+            'fund_codes': List[str], # Row labels
+            'security_codes': List[str], # Column labels (fetch codes)
+            'indptr': np.ndarray, # Row i spans entries indptr[i]:indptr[i+1]
+            'indices': np.ndarray, # Column index per entry
+            'weights': np.ndarray, # Weight (%) per entry
+            'entry_codes': List[str], # Display code per entry (for detail views)
+            'entry_names': List[str] # Holding name per entry (fallback when no quote)
+        }
+        
+    Raises:
+        ValueError: If a holding's weight is None or not finite
+    """
+    fund_codes = list(holdings_map)
+    column_of = {}
+    indptr = np.zeros(len(fund_codes) + 1, dtype=np.int64)
+    indices = []
+    weights = []
+    entry_codes = []
+    entry_names = []
+    
+    for row, fund_code in enumerate(fund_codes):
+        holdings = holdings_map[fund_code] or []
+        for item in holdings:
+            code = item['code']
+            lookup_code = item.get('fetch_code') or code
+            indices.append(column_of.setdefault(lookup_code, len(column_of)))
+            weights.append(item.get('weight', 0.0))
+            entry_codes.append(code)
+            entry_names.append(item.get('name', 'Unknown'))
+        indptr[row + 1] = len(indices)
+    
+    weights = np.asarray(weights, dtype=np.float64)
+    # None or non-numeric weights would silently turn whole estimates into NaN
+    if not np.isfinite(weights).all():
+        raise ValueError("Holding weights must be finite numbers")
+    
+    return {
+        'fund_codes': fund_codes,
+        'security_codes': list(column_of),
+        'indptr': indptr,
+        'indices': np.asarray(indices, dtype=np.int64),
+        'weights': weights,
+        'entry_codes': entry_codes,
+        'entry_names': entry_names
+    }
+
+def quote_vectors(security_codes: List[str], prices: Dict[str, Dict]) -> Dict[str, np.ndarray]:
+    """
+    Aligns a quote table with the matrix columns.
+    Missing quotes are NaN in both arrays.
+    """
+    change = np.full(len(security_codes), np.nan)
+    price = np.full(len(security_codes), np.nan)
+    for j, code in enumerate(security_codes):
+        price_info = prices.get(code)
+        if price_info:
+            change[j] = price_info.get('change', 0.0)
+            price[j] = price_info.get('price', 0.0)
+    return {'change': change, 'price': price}
+
+def estimate_nav_changes_batch(matrix: Dict, quotes: Dict[str, np.ndarray]) -> Dict:
+    """
+    Vectorized estimate_nav_change for every fund in a weight matrix.
+    
+    Args:
+        matrix: Output of build_weight_matrix
+        quotes: Output of quote_vectors for matrix['security_codes']
+        
+    Returns:
+        Dict: {
+            'fund_codes': List[str],
+            'estimated_change': np.ndarray, # Normalized estimate per fund (0.0 when nothing is quoted)
+            'total_weight_used': np.ndarray, # Sum of quoted weights per fund
+            'contribution': np.ndarray, # weight * change per matrix entry (0.0 when unquoted)
+            'quoted': np.ndarray # Whether each matrix entry had a quote
+        }
+    """
+    n_funds = len(matrix['fund_codes'])
+    weights = matrix['weights']
+    entry_change = quotes['change'][matrix['indices']]
+    quoted = ~np.isnan(entry_change)
+    
+    contribution = np.where(quoted, weights * np.nan_to_num(entry_change), 0.0)
+    used_weight = np.where(quoted, weights, 0.0)
+    
+    # Row id of every entry, then per-row sums
+    rows = np.repeat(np.arange(n_funds), np.diff(matrix['indptr']))
+    total_weighted_change = np.bincount(rows, weights=contribution, minlength=n_funds)
+    total_weight = np.bincount(rows, weights=used_weight, minlength=n_funds)
+    
+    estimated = np.zeros(n_funds)
+    np.divide(total_weighted_change, total_weight, out=estimated, where=total_weight != 0)
+    
+    return {
+        'fund_codes': matrix['fund_codes'],
+        'estimated_change': estimated,
+        'total_weight_used': total_weight,
+        'contribution': contribution,
+        'quoted': quoted
     }
+
+def _details(matrix: Dict, prices: Dict[str, Dict], start: int, end: int,
+             indices: List[int], weights: List[float], quoted: List[bool],
+             contribution: List[float], change: List[float], price: List[float]) -> List[Dict]:
+    """Detail rows for matrix entries [start, end), from plain-list copies of the arrays."""
+    security_codes = matrix['security_codes']
+    entry_codes = matrix['entry_codes']
+    entry_names = matrix['entry_names']
+    details = []
+    for k in range(start, end):
+        j = indices[k]
+        if quoted[k]:
+            price_info = prices.get(security_codes[j], {})
+            details.append({
+                'code': entry_codes[k],
+                'name': price_info.get('name', entry_names[k]),
+                'weight': weights[k],
+                'price': price[j],
+                'change': change[j],
+                'contribution': contribution[k],
+                'as_of': price_info.get('as_of')
+            })
+        else:
+            details.append({
+                'code': entry_codes[k],
+                'name': entry_names[k],
+                'weight': weights[k],
+                'price': None,
+                'change': None,
+                'contribution': 0.0,
+                'as_of': None
+            })
+    return details
+
+@timed('valuation_batch')
+def estimate_nav_changes(holdings_map: Dict[str, List[Dict]], prices: Dict[str, Dict],
+                         with_details: bool = True) -> Dict[str, Dict]:
+    """
+    Batch counterpart of estimate_nav_change for a whole book.
+    
+    Returns:
+        Dict of {fund_code: {'estimated_change', 'total_weight_used', 'details',
+        'quotes_as_of', 'stale_quotes'}}; 'details' is empty unless with_details is set.
+    """
+    matrix = build_weight_matrix(holdings_map)
+    quotes = quote_vectors(matrix['security_codes'], prices)
+    batch = estimate_nav_changes_batch(matrix, quotes)
+    
+    estimated = batch['estimated_change'].tolist()
+    total_weight = batch['total_weight_used'].tolist()
+    indptr = matrix['indptr'].tolist()
+    
+    if with_details:
+        # Convert arrays to lists once; per-element numpy indexing would dominate
+        columns = (matrix['indices'].tolist(), matrix['weights'].tolist(), batch['quoted'].tolist(),
+                   batch['contribution'].tolist(), quotes['change'].tolist(), quotes['price'].tolist())
+    
+    # Quote dict per matrix column, for freshness stamps
+    column_quotes = [prices.get(code) for code in matrix['security_codes']]
+    indices = matrix['indices'].tolist()
+    
+    results = {}
+    for row, code in enumerate(matrix['fund_codes']):
+        start, end = indptr[row], indptr[row + 1]
+        used = [column_quotes[j] for j in indices[start:end] if column_quotes[j]]
+        results[code] = {
+            'estimated_change': estimated[row],
+            'total_weight_used': total_weight[row],
+            'details': _details(matrix, prices, start, end, *columns) if with_details else [],
+            **quote_freshness(used)
+        }
+    return results
@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Never touch the real funds.db: the stores read this at import time
+os.environ['FUND_NAV_DB'] = os.path.join(tempfile.mkdtemp(prefix='fund_nav_tests_'), 'default.db')
+
+import pytest
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """A fresh, migrated-on-first-use database file, its pooled connections closed afterwards."""
+    from src.db import close_all
+    path = str(tmp_path / 'funds.db')
+    yield path
+    close_all()
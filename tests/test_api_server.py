@@ -0,0 +1,80 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from src.api_server import ApiError, _etag_matches, _parse_positions, make_server
+
+
+@pytest.fixture
+def server():
+    server = make_server(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+    conn.request(method, path, body=body, headers=headers or {})
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    return response, data
+
+
+def test_etag_matches():
+    etag = 'W/"abc"'
+    assert _etag_matches('W/"abc"', etag)
+    assert _etag_matches('"abc"', etag)
+    assert _etag_matches('"x", W/"abc"', etag)
+    assert _etag_matches('*', etag)
+    assert not _etag_matches('W/"abd"', etag)
+    assert not _etag_matches(None, etag)
+
+
+def test_conditional_get_returns_304(server):
+    response, body = request(server, 'GET', '/healthz')
+    assert response.status == 200 and json.loads(body)['ok']
+    etag = response.getheader('ETag')
+    assert etag.startswith('W/"')
+
+    response, body = request(server, 'GET', '/healthz', headers={'If-None-Match': etag})
+    assert response.status == 304 and body == b''
+    assert response.getheader('ETag') == etag
+
+    response, _ = request(server, 'GET', '/healthz', headers={'If-None-Match': 'W/"stale"'})
+    assert response.status == 200
+
+
+def test_parse_positions_rejects_bad_input():
+    assert _parse_positions(['110011', ' 000001 '], ['5000', '']) == [('110011', 5000.0), ('000001', None)]
+    for codes, amounts in [([], None), (['11001'], None), (['110011'], ['abc']), (['110011'], ['NaN']),
+                           (['110011'], ['inf']), (['110011', '000001'], ['1'])]:
+        with pytest.raises(ApiError) as e:
+            _parse_positions(codes, amounts)
+        assert e.value.status == 400
+
+
+@pytest.mark.parametrize('length, status', [('abc', 400), ('-1', 400), (str(10 ** 9), 413)])
+def test_post_rejects_bad_content_length(server, length, status):
+    conn = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+    conn.putrequest('POST', '/api/v1/estimates')
+    conn.putheader('Content-Length', length)
+    conn.endheaders()
+    response = conn.getresponse()
+    assert response.status == status
+    assert 'error' in json.loads(response.read())
+    conn.close()
+
+
+def test_non_finite_amounts_are_rejected(server):
+    response, body = request(server, 'GET', '/api/v1/estimates?codes=110011&amounts=NaN')
+    assert response.status == 400
+    response, body = request(server, 'POST', '/api/v1/estimates',
+                             body=b'{"funds": [{"code": "110011", "amount": Infinity}]}',
+                             headers={'Content-Type': 'application/json'})
+    assert response.status == 400 and json.loads(body)['error'] == 'invalid amount for 110011'
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.backtest import REPORT_COLUMNS, run_backtest, summarize
+
+
+def holding(code, weight):
+    return {'code': code[2:], 'name': code, 'weight': weight, 'fetch_code': code}
+
+
+def frame(columns, dates):
+    return pd.DataFrame(columns, index=pd.to_datetime(dates))
+
+
+def test_estimate_uses_quoted_weights_and_snapshot_in_effect():
+    dates = ['2026-01-05', '2026-01-06', '2026-01-07']
+    closes = frame({'sh600000': [10.0, 11.0, 11.0], 'sh600001': [10.0, 10.0, 9.0]}, dates)
+    snapshots = {'000001': [
+        ('2025-09-30', [holding('sh600000', 60.0)]),
+        # Available from 2026-01-06 + lag 0: takes over on the second day
+        ('2026-01-06', [holding('sh600001', 30.0), holding('sh600000', 10.0)]),
+    ]}
+    result = run_backtest(snapshots, closes, frame({'000001': [1.0, 1.1, 1.0]}, dates), lag_days=0)
+
+    assert result['fund_codes'] == ['000001']
+    assert np.isnan(result['estimate'][0, 0])
+    # Second day: second snapshot, 10% on sh600000 (weight 10) and 0% on sh600001 (30)
+    assert result['estimate'][0, 1] == pytest.approx(2.5)
+    assert result['estimate'][0, 2] == pytest.approx(-7.5)
+    assert result['weight_used'][0, 1:] == pytest.approx([40.0, 40.0])
+    assert result['actual'][0, 1:] == pytest.approx([10.0, -100 / 11])
+
+
+def test_official_changes_use_each_funds_own_calendar():
+    dates = ['2026-01-02', '2026-01-03', '2026-01-04', '2026-01-06']
+    closes = frame({'sh600000': [10.0, 10.1, 10.2, 10.3]}, dates)
+    snapshots = {code: [('2025-06-30', [holding('sh600000', 50.0)])] for code in ('A', 'B')}
+    # A has no NAV on 01-04, B none on 01-03: neither gap may blank the other fund's changes
+    navs = frame({'A': [1.0, 1.01, np.nan, 1.0302], 'B': [1.0, np.nan, 1.02, 1.0404]}, dates)
+
+    actual = run_backtest(snapshots, closes, navs)['actual']
+
+    assert np.isnan(actual[:, 0]).all()
+    assert actual[0, 1] == pytest.approx(1.0)
+    assert np.isnan(actual[0, 2])
+    assert actual[0, 3] == pytest.approx(2.0)
+    assert np.isnan(actual[1, 1])
+    assert actual[1, 2] == pytest.approx(2.0)
+    assert actual[1, 3] == pytest.approx(2.0)
+
+
+def test_summarize_statistics():
+    result = {
+        'fund_codes': ['A', 'B'],
+        'days': pd.to_datetime(['2026-01-05', '2026-01-06', '2026-01-07']),
+        'estimate': np.array([[1.0, -1.0, 0.5], [np.nan, np.nan, np.nan]]),
+        'actual': np.array([[2.0, -0.5, -0.5], [1.0, 1.0, 1.0]]),
+        'weight_used': np.array([[60.0, 60.0, 30.0], [0.0, 0.0, 0.0]]),
+    }
+    report = summarize(result).set_index('fund_code')
+
+    assert list(report.reset_index().columns) == REPORT_COLUMNS
+    a = report.loc['A']
+    assert a['days'] == 3
+    assert a['bias'] == pytest.approx((-1.0 - 0.5 + 1.0) / 3)
+    assert a['mae'] == pytest.approx(2.5 / 3)
+    assert a['rmse'] == pytest.approx(np.sqrt(2.25 / 3))
+    assert a['max_abs_error'] == pytest.approx(1.0)
+    assert a['hit_rate'] == pytest.approx(2 / 3)
+    assert a['weight_used'] == pytest.approx(50.0)
+    b = report.loc['B']
+    assert b['days'] == 0
+    assert np.isnan(b['mae']) and np.isnan(b['max_abs_error'])
+
+    # Outliers (e.g. distribution days) beyond max_error drop out
+    capped = summarize(result, max_error=0.75).set_index('fund_code').loc['A']
+    assert capped['days'] == 1
+    assert capped['bias'] == pytest.approx(-0.5)
@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+
+from src import db
+from src.db import MIGRATIONS, SCHEMA_VERSION, connection, migrate, schema_version, transaction
+
+
+def tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_new_database_is_migrated_on_first_connection(db_path):
+    with connection(db_path) as conn:
+        assert schema_version(conn) == SCHEMA_VERSION
+        assert {'funds', 'fund_holdings', 'fund_nav_history', 'quote_cache', 'fund_full_holdings'} <= tables(conn)
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert migrate(conn) == SCHEMA_VERSION
+
+
+def test_old_database_is_upgraded_in_place(tmp_path):
+    path = str(tmp_path / 'old.db')
+    # A database as an earlier release left it: funds only, at version 1
+    conn = sqlite3.connect(path)
+    for statement in MIGRATIONS[0][2]:
+        conn.execute(statement)
+    conn.execute("INSERT INTO funds (fund_code, fund_name, current_amount, current_holding_profit) "
+                 "VALUES ('110011', '易方达中小盘', 1000, 12.5)")
+    conn.execute('PRAGMA user_version = 1')
+    conn.commit()
+    conn.close()
+
+    try:
+        with connection(path) as conn:
+            assert schema_version(conn) == SCHEMA_VERSION
+            assert 'fund_intraday' in tables(conn)
+            row = conn.execute('SELECT current_amount, current_holding_profit FROM funds').fetchone()
+            assert tuple(row) == (1000, 12.5)
+    finally:
+        db.close_all()
+
+
+def test_pool_reuses_connections_and_rolls_back_leftovers(db_path):
+    with connection(db_path) as conn:
+        first = conn
+        conn.execute('BEGIN')
+        conn.execute("INSERT INTO funds (fund_code, current_amount, current_holding_profit) VALUES ('000001', 1, 0)")
+    with connection(db_path) as conn:
+        assert conn is first
+        assert not conn.in_transaction
+        assert conn.execute('SELECT COUNT(*) FROM funds').fetchone()[0] == 0
+        # A second borrower while the first is out gets its own connection
+        with connection(db_path) as other:
+            assert other is not conn
+
+
+def test_pool_keeps_at_most_pool_size_idle(db_path, monkeypatch):
+    monkeypatch.setattr(db, 'POOL_SIZE', 1)
+    with connection(db_path) as outer, connection(db_path) as inner:
+        pass
+    # inner went back first and filled the pool; outer was closed
+    with connection(db_path) as conn:
+        assert conn is inner
+    with pytest.raises(sqlite3.ProgrammingError):
+        outer.execute('SELECT 1')
+
+
+def test_transaction_commits_or_rolls_back(db_path):
+    with transaction(db_path) as conn:
+        conn.execute("INSERT INTO funds (fund_code, current_amount, current_holding_profit) VALUES ('000001', 1, 0)")
+    with pytest.raises(RuntimeError):
+        with transaction(db_path) as conn:
+            conn.execute("INSERT INTO funds (fund_code, current_amount, current_holding_profit) VALUES ('000002', 1, 0)")
+            raise RuntimeError("abort")
+    with connection(db_path) as conn:
+        assert [row['fund_code'] for row in conn.execute('SELECT fund_code FROM funds')] == ['000001']
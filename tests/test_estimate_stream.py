@@ -0,0 +1,85 @@
+from src.estimate_stream import EstimateBroadcaster, diff_estimate
+
+
+def payload(code, change, details=(('600519', 10.0, 1.0),), updated='10:00:00'):
+    return {'code': code, 'name': f"基金{code}", 'report_date': '2026-06-30', 'ok': True, 'status': '成功',
+            'change': change, 'weight': 60.0, 'updated': updated,
+            'details': [{'code': c, 'name': c, 'weight': 6.0, 'price': p, 'change': ch} for c, p, ch in details]}
+
+
+def test_diff_estimate():
+    old = payload('000001', 1.0, details=(('600519', 10.0, 1.0), ('000858', 20.0, 2.0)))
+    assert diff_estimate(None, old) is old
+    assert diff_estimate(old, payload('000001', 1.0, details=(('600519', 10.0, 1.0), ('000858', 20.0, 2.0)))) is None
+
+    moved = diff_estimate(old, payload('000001', 1.5, details=(('600519', 10.5, 1.5), ('000858', 20.0, 2.0)),
+                                       updated='10:01:00'))
+    assert moved == {'code': '000001', 'updated': '10:01:00', 'change': 1.5,
+                     'details_changed': [{'code': '600519', 'price': 10.5, 'change': 1.5}]}
+
+    # A new report replaces the holdings list as a whole
+    reported = diff_estimate(old, payload('000001', 1.0, details=(('600036', 30.0, 0.5),)))
+    assert [d['code'] for d in reported['details']] == ['600036']
+
+
+class ScriptedBroadcaster(EstimateBroadcaster):
+    """Estimates come from `changes` instead of the pipeline."""
+
+    def __init__(self):
+        super().__init__(estimate_payload=lambda item: item, interval=3600)
+        self.changes = {}
+
+    def _refresh(self, codes):
+        return {code: payload(code, self.changes.get(code, 0.0)) for code in codes}
+
+
+def drain(sub):
+    events = []
+    while (event := sub.get(timeout=0)) is not None:
+        events.append(event)
+    return events
+
+
+def test_reconnect_replays_missed_deltas():
+    stream = ScriptedBroadcaster()
+    first = stream.subscribe(['000001'])
+    [snapshot] = drain(first)
+    assert snapshot['event'] == 'snapshot' and snapshot['data']['funds'][0]['change'] == 0.0
+    last_seq = snapshot['seq']
+
+    stream.changes['000001'] = 1.0
+    assert stream.tick() == 1
+    stream.changes['000001'] = 2.0
+    stream.tick()
+    assert stream.tick() == 0
+
+    again = stream.subscribe(['000001'], last_seq=last_seq)
+    events = drain(again)
+    assert [e['event'] for e in events] == ['delta', 'delta']
+    assert [e['data']['funds'][0]['change'] for e in events] == [1.0, 2.0]
+    assert [e['seq'] for e in events] == [last_seq + 1, last_seq + 2]
+
+    # Up to date: nothing to replay
+    assert drain(stream.subscribe(['000001'], last_seq=stream.seq)) == []
+    # From the future (server restarted): snapshot
+    assert drain(stream.subscribe(['000001'], last_seq=stream.seq + 5))[0]['event'] == 'snapshot'
+
+
+def test_forgotten_fund_is_not_replayed_past_its_gap():
+    stream = ScriptedBroadcaster()
+    other = stream.subscribe(['000002'])
+    sub = stream.subscribe(['000001'])
+    last_seq = drain(sub)[0]['seq']
+    stream.unsubscribe(sub)
+
+    # Moves while nobody watches it; the other fund's deltas keep the log going
+    stream.changes['000001'] = 3.0
+    stream.changes['000002'] = 1.0
+    stream.tick()
+    watcher = stream.subscribe(['000001'])
+    assert drain(watcher)[0]['data']['funds'][0]['change'] == 3.0
+
+    events = drain(stream.subscribe(['000001'], last_seq=last_seq))
+    changes = [fund['change'] for e in events for fund in e['data']['funds']]
+    assert changes and changes[-1] == 3.0
+    drain(other)
@@ -0,0 +1,59 @@
+import pytest
+
+from src import data_fetcher
+from src.feeder_store import cached_lookup, get_feeder_target
+
+
+def test_cached_lookup_caches_values_and_empty_answers(db_path):
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return None
+
+    assert cached_lookup('etf_search', '黄金ETF', fetch, db_path=db_path) is None
+    assert cached_lookup('etf_search', '黄金ETF', fetch, db_path=db_path) is None
+    assert len(calls) == 1
+
+    assert cached_lookup('fund_name', '000001', lambda: '华夏成长', db_path=db_path) == '华夏成长'
+    assert cached_lookup('fund_name', '000001', lambda: 'unused', db_path=db_path) == '华夏成长'
+
+
+def test_cached_lookup_does_not_cache_errors(db_path):
+    def failing():
+        raise ConnectionError('suggest down')
+
+    with pytest.raises(ConnectionError):
+        cached_lookup('etf_search', '黄金ETF', failing, db_path=db_path)
+    assert cached_lookup('etf_search', '黄金ETF', lambda: '518880', db_path=db_path) == '518880'
+
+
+def test_failed_target_search_is_not_stored(monkeypatch):
+    def down(etf_name):
+        raise ConnectionError('suggest down')
+
+    monkeypatch.setattr(data_fetcher, '_search_etf_code', down)
+    assert data_fetcher._resolve_feeder_target('000216', '华安黄金易ETF联接A') is None
+    assert get_feeder_target('000216') is None
+
+    monkeypatch.setattr(data_fetcher, '_search_etf_code', lambda etf_name: '518880')
+    assert data_fetcher._resolve_feeder_target('000216', '华安黄金易ETF联接A') == ('518880', '黄金易ETF')
+    assert get_feeder_target('000216')['target_code'] == '518880'
+
+
+def test_empty_target_search_is_stored_as_unresolvable(monkeypatch):
+    monkeypatch.setattr(data_fetcher, '_search_etf_code', lambda etf_name: None)
+    assert data_fetcher._resolve_feeder_target('000217', '某某指数联接C') is None
+    stored = get_feeder_target('000217')
+    assert stored is not None and stored['target_code'] is None
+
+
+def test_name_backup_errors_are_not_cached(monkeypatch):
+    def down(fund_code):
+        raise ConnectionError('eastmoney down')
+
+    monkeypatch.setattr(data_fetcher, '_get_fund_name_backup', down)
+    assert data_fetcher._get_fund_name_backup_cached('000218') is None
+
+    monkeypatch.setattr(data_fetcher, '_get_fund_name_backup', lambda fund_code: '测试基金')
+    assert data_fetcher._get_fund_name_backup_cached('000218') == '测试基金'
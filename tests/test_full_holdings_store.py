@@ -0,0 +1,84 @@
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+from src.full_holdings_store import (_pack, blend_holdings, is_stale, latest_report_period_end, load_full_holdings,
+                                    save_full_holdings)
+
+
+def holding(code, weight):
+    return {'code': code, 'name': f"股票{code}", 'weight': weight, 'fetch_code': f"sh{code}"}
+
+
+TOP = [holding('600001', 8.0), holding('600002', 6.0), holding('600003', 4.0)]
+
+
+def weights(blended):
+    return {h['code']: h['weight'] for h in blended}
+
+
+def test_tail_is_scaled_into_the_remaining_room_and_capped():
+    # Last complete list: 80% in equities, 600003 has since left the top three
+    full = _pack('测试', [holding('600001', 10.0), holding('600002', 5.0), holding('600004', 30.0),
+                         holding('600005', 20.0), holding('600006', 15.0)], '2025-12-31')
+    blended = blend_holdings(TOP, '2026-03-31', full)
+
+    assert blended[:3] == TOP
+    tail = weights(blended[3:])
+    assert list(tail) == ['600004', '600005', '600006']
+    # Room 80 - 18 = 62 over a tail of 65, then capped at the smallest top weight (4)
+    assert tail == pytest.approx({'600004': 4.0, '600005': 4.0, '600006': 4.0})
+
+    roomy = blend_holdings([holding('600001', 50.0)], '2026-03-31',
+                           _pack('测试', [holding('600001', 40.0), holding('600004', 2.0), holding('600005', 1.0)],
+                                 '2025-12-31'))
+    # Room 43 - 50 < 0: nothing left for the tail
+    assert roomy == [holding('600001', 50.0)]
+
+
+def test_tail_scaling_below_the_cap():
+    full = _pack('测试', [holding('600001', 10.0), holding('600004', 3.0), holding('600005', 1.0)], '2025-12-31')
+    blended = blend_holdings([holding('600001', 12.0)], '2026-03-31', full)
+    # Room 14 - 12 = 2 split 3:1
+    assert weights(blended) == pytest.approx({'600001': 12.0, '600004': 1.5, '600005': 0.5})
+
+
+def test_complete_list_as_recent_as_the_top_ten_is_used_as_is():
+    full = _pack('测试', [holding('600004', 1.0), holding('600001', 8.0), holding('600002', 6.0)], '2026-06-30')
+    blended = blend_holdings(TOP, '2026-06-30', full)
+    assert [h['code'] for h in blended] == ['600001', '600002', '600004']
+    assert weights(blended) == {'600001': 8.0, '600002': 6.0, '600004': 1.0}
+
+
+def test_empty_complete_list_keeps_the_top_ten():
+    assert blend_holdings(TOP, '2026-03-31', _pack('测试', [], '2025-12-31')) is TOP
+
+
+def test_round_trips_through_the_store(db_path):
+    full = _pack('测试', [holding('600001', 10.0), holding('600004', 3.5)], '2025-12-31')
+    save_full_holdings('000001', full, db_path)
+    loaded, fetched_at = load_full_holdings('000001', db_path)
+    assert loaded['codes'] == ['600001', '600004'] and loaded['fetch_codes'] == ['sh600001', 'sh600004']
+    assert loaded['weights'].dtype == np.float64 and loaded['weights'].tolist() == [10.0, 3.5]
+    assert loaded['report_date'] == '2025-12-31' and fetched_at > 0
+
+
+@pytest.mark.parametrize('today, expected', [
+    (date(2026, 3, 15), date(2025, 12, 31)),
+    (date(2026, 6, 30), date(2025, 12, 31)),
+    (date(2026, 7, 1), date(2026, 6, 30)),
+    (date(2026, 10, 17), date(2026, 6, 30)),
+])
+def test_latest_report_period_end(today, expected):
+    assert latest_report_period_end(today) == expected
+
+
+def test_rechecks_daily_in_the_disclosure_window_only():
+    day = 24 * 3600
+    in_window = datetime(2026, 8, 15).timestamp()
+    assert is_stale('2025-12-31', in_window - 2 * day, now=in_window)
+    assert not is_stale('2026-06-30', in_window - 2 * day, now=in_window)
+    outside = datetime(2026, 10, 17).timestamp()
+    assert not is_stale('2025-12-31', outside - 2 * day, now=outside)
+    assert is_stale('2025-12-31', outside - 8 * day, now=outside)
@@ -0,0 +1,127 @@
+import time
+
+import pandas as pd
+import pytest
+
+from src import history_store
+from src.db import connection
+from src.history_store import PAGE_SIZE, _needed_rows, read_fund_history, sync_fund_history
+
+
+class Upstream:
+    """The lsjz API over a fixed series of `total` trading days, newest first."""
+
+    def __init__(self, total, end='2026-01-16'):
+        self.dates = [d.strftime('%Y-%m-%d') for d in pd.bdate_range(end=end, periods=total)][::-1]
+        self.pages = []
+        self.fail = False
+
+    def publish(self, count):
+        """Adds `count` newer trading days."""
+        start = pd.Timestamp(self.dates[0]) + pd.offsets.BDay(1)
+        self.dates = [d.strftime('%Y-%m-%d') for d in pd.bdate_range(start=start, periods=count)][::-1] + self.dates
+
+    def nav(self, day):
+        return 1 + pd.Timestamp(day).toordinal() % 1000 / 1000
+
+    def __call__(self, fund_code, page, page_size=20):
+        self.pages.append(page)
+        if self.fail:
+            return [], 0
+        chunk = self.dates[(page - 1) * page_size:page * page_size]
+        return [{'FSRQ': d, 'DWJZ': f"{self.nav(d):.4f}"} for d in chunk], len(self.dates)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    source = Upstream(total=1000)
+    monkeypatch.setattr(history_store, 'fetch_fund_nav_page', source)
+    return source
+
+
+def stored(db_path):
+    with connection(db_path) as conn:
+        return [row[0] for row in conn.execute(
+            "SELECT nav_date FROM fund_nav_history WHERE fund_code = '000001' ORDER BY nav_date DESC")]
+
+
+def expire(db_path):
+    with connection(db_path) as conn, conn:
+        conn.execute('UPDATE fund_nav_sync SET synced_at = ?', (time.time() - history_store.MIN_SYNC_INTERVAL - 1,))
+
+
+def test_needed_rows():
+    assert _needed_rows(365) == 250 + PAGE_SIZE
+    assert _needed_rows(30) == 21 + PAGE_SIZE
+
+
+def test_backfill_fetches_exactly_the_pages_needed(db_path, upstream):
+    requests = sync_fund_history('000001', 365, db_path=db_path, max_workers=1)
+    # 270 rows: page 1 for the newest rows and the total, then pages 2..14
+    assert upstream.pages == list(range(1, 15))
+    assert requests == 14
+    assert stored(db_path) == upstream.dates[:280]
+
+    # Within MIN_SYNC_INTERVAL: no requests
+    upstream.pages.clear()
+    assert sync_fund_history('000001', 365, db_path=db_path, max_workers=1) == 0
+    assert upstream.pages == []
+
+
+def test_incremental_update_stops_at_known_rows(db_path, upstream):
+    sync_fund_history('000001', 365, db_path=db_path, max_workers=1)
+    upstream.publish(3)
+    expire(db_path)
+    upstream.pages.clear()
+
+    assert sync_fund_history('000001', 365, db_path=db_path, max_workers=1) == 1
+    assert upstream.pages == [1]
+    assert stored(db_path)[:4] == upstream.dates[:4]
+
+    # 25 new days span two pages
+    upstream.publish(25)
+    expire(db_path)
+    upstream.pages.clear()
+    sync_fund_history('000001', 365, db_path=db_path, max_workers=1)
+    assert upstream.pages == [1, 2]
+    assert stored(db_path)[:26] == upstream.dates[:26]
+
+
+def test_longer_window_extends_the_backfill(db_path, upstream):
+    sync_fund_history('000001', 365, db_path=db_path, max_workers=1)
+    upstream.pages.clear()
+    # 730 days need 520 rows: page 1 for news, then pages 15..26 below the 280 stored
+    sync_fund_history('000001', 730, db_path=db_path, max_workers=1)
+    assert upstream.pages == [1] + list(range(15, 27))
+    assert stored(db_path) == upstream.dates[:520]
+
+
+def test_gap_beyond_incremental_pages_rebackfills(db_path, upstream):
+    sync_fund_history('000001', 365, db_path=db_path, max_workers=1)
+    upstream.publish(history_store.MAX_INCREMENTAL_PAGES * PAGE_SIZE + 1)
+    expire(db_path)
+    upstream.pages.clear()
+    sync_fund_history('000001', 365, db_path=db_path, max_workers=1)
+    assert upstream.pages == list(range(1, history_store.MAX_INCREMENTAL_PAGES + 1)) + list(
+        range(history_store.MAX_INCREMENTAL_PAGES + 1, 15))
+    assert stored(db_path)[:280] == upstream.dates[:280]
+
+
+def test_failed_update_stores_nothing(db_path, upstream):
+    sync_fund_history('000001', 365, db_path=db_path, max_workers=1)
+    before = stored(db_path)
+    upstream.publish(3)
+    upstream.fail = True
+    expire(db_path)
+    assert sync_fund_history('000001', 365, db_path=db_path, max_workers=1) == 1
+    assert stored(db_path) == before
+
+
+def test_reads_the_requested_window(db_path, upstream, monkeypatch):
+    monkeypatch.setattr(history_store, 'today_days', lambda: (pd.Timestamp('2026-01-16') - pd.Timestamp('1970-01-01')).days)
+    sync_fund_history('000001', 365, db_path=db_path, max_workers=1)
+    df = read_fund_history('000001', 30, db_path)
+    assert list(df.columns) == ['date', 'nav']
+    assert df['date'].iloc[-1] == pd.Timestamp('2026-01-16')
+    assert df['date'].iloc[0] >= pd.Timestamp('2025-12-17')
+    assert df['nav'].iloc[-1] == pytest.approx(upstream.nav('2026-01-16'))
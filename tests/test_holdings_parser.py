@@ -0,0 +1,96 @@
+import json
+import os
+
+import pytest
+
+from src.holdings_parser import decode_payload, parse_full_holdings_page, parse_holdings_page, report_years, sina_code
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fixtures', 'jjcc')
+
+
+@pytest.mark.parametrize('market_id, code, expected', [
+    ('1', '600519', 'sh600519'),
+    ('0', '000858', 'sz000858'),
+    ('0', '300750', 'sz300750'),
+    # Beijing listings are filed under market 0 too
+    ('0', '830799', 'bj830799'),
+    ('0', '430047', 'bj430047'),
+    ('0', '920001', 'bj920001'),
+    ('116', '700', 'rt_hk00700'),
+    ('105', 'AAPL', 'gb_aapl'),
+    ('106', 'BRK_B', 'gb_brk.b'),
+    (None, '600519', 'sh600519'),
+    (None, '510300', 'sh510300'),
+    (None, '830799', 'bj830799'),
+    (None, '000001', 'sz000001'),
+    (None, '00700', 'rt_hk00700'),
+    (None, 'MSFT', 'gb_msft'),
+])
+def test_sina_code(market_id, code, expected):
+    assert sina_code(market_id, code) == expected
+
+
+@pytest.mark.parametrize('code', sorted(f[:-4] for f in os.listdir(FIXTURE_DIR) if f.endswith('.txt')))
+def test_parse_holdings_page_fixtures(code):
+    with open(os.path.join(FIXTURE_DIR, f'{code}.txt'), 'rb') as f:
+        raw = f.read()
+    with open(os.path.join(FIXTURE_DIR, f'{code}.json'), encoding='utf-8') as f:
+        expected = json.load(f)
+    assert parse_holdings_page(decode_payload(raw)) == expected
+
+
+def row(i, market, code, name, weight, price_columns=True):
+    link = f"<a href='//quote.eastmoney.com/unify/r/{market}.{code}'>{code}</a>"
+    prices = "<td class='tor'>--</td><td class='tor'>--</td>" if price_columns else ''
+    return (f"<tr><td>{i}</td><td>{link}</td><td class='tol'><a>{name}</a></td>{prices}<td>相关资讯</td>"
+            f"<td class='tor'>{weight}%</td><td class='tor'>100.00</td><td class='tor'>1,000.00</td></tr>")
+
+
+def table(report_date, rows, price_columns=True):
+    prices = '<th>最新价</th><th>涨跌幅</th>' if price_columns else ''
+    return (f"<label>截止至：<font class='px12'>{report_date}</font></label>"
+            f"<table><thead><tr><th>序号</th><th>股票代码</th><th>股票名称</th>{prices}<th>相关资讯</th>"
+            f"<th>占净值比例</th><th>持股数（万股）</th><th>持仓市值（万元）</th></tr></thead><tbody>"
+            + ''.join(rows) + "</tbody></table>")
+
+
+def page(*tables):
+    return (f"var apidata={{ content:\"<a title='测试混合'>测试混合</a>{''.join(tables)}\","
+            "arryear:[2026,2025],curyear:2026}};")
+
+
+def test_parse_holdings_page_latest_period_and_header_columns():
+    content = page(
+        table('2026-03-31', [row(1, 0, '830799', '艾融软件', '5.10'), row(2, 106, 'BRK_B', '伯克希尔B', '1,234.5')]),
+        # Older layout without price columns: the weight column comes from the header
+        table('2025-12-31', [row(1, 1, '600519', '贵州茅台', '9.00', price_columns=False)], price_columns=False),
+    )
+    result = parse_holdings_page(content)
+    assert result['fund_name'] == '测试混合' and result['report_date'] == '2026-03-31'
+    assert result['holdings'] == [
+        {'code': '830799', 'name': '艾融软件', 'weight': 5.1, 'fetch_code': 'bj830799'},
+        {'code': 'BRK_B', 'name': '伯克希尔B', 'weight': 1234.5, 'fetch_code': 'gb_brk.b'},
+    ]
+    assert report_years(content) == ['2026', '2025']
+
+    full = parse_full_holdings_page(content)
+    # 2025-12-31 lists a single row: the annual report isn't out, no complete list
+    assert full['report_date'] == '--' and full['holdings'] == []
+
+
+def test_parse_full_holdings_page_picks_newest_complete_list():
+    content = page(
+        table('2026-03-31', [row(i, 1, f'6000{i:02d}', f'股票{i}', '3.00') for i in range(1, 11)]),
+        table('2025-12-31', [row(i, 1, f'6010{i:02d}', f'股票{i}', '2.00', price_columns=False) for i in range(1, 13)],
+              price_columns=False),
+        table('2025-06-30', [row(i, 1, f'6020{i:02d}', f'股票{i}', '1.00') for i in range(1, 15)]),
+    )
+    full = parse_full_holdings_page(content)
+    assert full['report_date'] == '2025-12-31'
+    assert len(full['holdings']) == 12
+    assert full['holdings'][0] == {'code': '601001', 'name': '股票1', 'weight': 2.0, 'fetch_code': 'sh601001'}
+
+
+def test_empty_page():
+    result = parse_holdings_page('var apidata={ content:"暂无数据",arryear:[],curyear:0};')
+    assert result == {'fund_name': None, 'report_date': '--', 'holdings': []}
@@ -0,0 +1,86 @@
+import pytest
+
+from src.fund_store import get_all_funds, update_fund, upsert_funds
+from src.importer import decode, import_positions, normalize_code, parse_amount, parse_positions
+
+
+@pytest.mark.parametrize('raw, code', [
+    ('002611', '002611'),
+    ('2611', '002611'),
+    ('="002611"', '002611'),
+    ("'002611", '002611'),
+    ('002611.OF', '002611'),
+    (' 110011 ', '110011'),
+    ('ABC123', None),
+    ('1234567', None),
+    ('', None),
+])
+def test_normalize_code(raw, code):
+    assert normalize_code(raw) == code
+
+
+@pytest.mark.parametrize('raw, amount', [
+    ('1,234.50', 1234.5),
+    ('￥ 1000元', 1000.0),
+    ('0', 0.0),
+    ('-5', None),
+    ('NaN', None),
+    ('inf', None),
+    ('abc', None),
+])
+def test_parse_amount(raw, amount):
+    assert parse_amount(raw) == amount
+
+
+def test_parse_positions_broker_export():
+    text = decode('证券代码\t证券名称\t参考市值\t币种\n'
+                  '="002611"\t博时黄金\t1,000.00\t人民币\n'
+                  '110011\t\t500\t人民币\n'
+                  '\n'
+                  '2611\t\t250.5\t人民币\n'
+                  'ABC\t\t1\t人民币\n'
+                  '161725\t\tabc\t人民币\n'
+                  '161726\t\t\t人民币\n'.encode('gbk'))
+    positions, failures = parse_positions(text)
+
+    assert positions == [
+        {'基金代码': '002611', '基金名称': '博时黄金', '持仓金额': 1250.5, '行号': 2},
+        {'基金代码': '110011', '基金名称': '', '持仓金额': 500.0, '行号': 3},
+    ]
+    assert [(f['行号'], f['原因']) for f in failures] == [(6, '基金代码无效'), (7, '持仓金额无效: abc'), (8, '缺少持仓金额')]
+
+    positions, failures = parse_positions('161726,,\n', default_amount=100.0)
+    assert positions[0]['持仓金额'] == 100.0 and not failures
+
+
+def test_parse_positions_without_header():
+    positions, failures = parse_positions('# exported 2026-10-01\n110011;1 000;易方达\n000001;20\n')
+    assert [(p['基金代码'], p['持仓金额'], p['基金名称']) for p in positions] == [('110011', 1000.0, '易方达'),
+                                                                               ('000001', 20.0, '')]
+    assert failures == []
+
+
+def test_reimport_updates_amounts_and_keeps_profit(db_path):
+    first = import_positions('code,amount,name\n110011,1000,易方达中小盘\n000001,500,华夏成长\n', db_path=db_path)
+    assert first['imported'] == 2 and sorted(first['added']) == ['000001', '110011'] and first['updated'] == []
+    update_fund('110011', 1000, 88.5, '易方达中小盘', db_path=db_path)
+
+    text = 'code,amount,name\n110011,1500,易方达中小盘混合\n161725,300,招商白酒\n'
+    dry = import_positions(text, dry_run=True, db_path=db_path)
+    assert dry['imported'] == 0 and dry['added'] == ['161725'] and dry['updated'] == ['110011']
+    assert len(get_all_funds(db_path)) == 2
+
+    again = import_positions(text, db_path=db_path)
+    assert again['added'] == ['161725'] and again['updated'] == ['110011']
+    funds = {f['fund_code']: f for f in get_all_funds(db_path)}
+    assert (funds['110011']['current_amount'], funds['110011']['current_holding_profit'],
+            funds['110011']['fund_name']) == (1500, 88.5, '易方达中小盘混合')
+    assert funds['000001']['current_amount'] == 500
+    assert funds['161725']['current_holding_profit'] == 0
+
+
+def test_upsert_keeps_name_without_one(db_path):
+    upsert_funds([('110011', '易方达中小盘', 1000.0)], db_path)
+    assert upsert_funds([('110011', '', 2000.0), ('000001', '', 10.0)], db_path) == (['000001'], ['110011'])
+    funds = {f['fund_code']: f for f in get_all_funds(db_path)}
+    assert (funds['110011']['fund_name'], funds['110011']['current_amount']) == ('易方达中小盘', 2000.0)
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from src.intraday_store import append_points, read_intraday, trading_results
+from src.market_hours import TIMEZONES
+
+
+def result(code, estimate, *holdings):
+    return {'基金代码': code, '估算涨跌': estimate, '状态': '成功', 'Details': [{'code': h} for h in holdings]}
+
+
+BOOK = [result('000001', 1.0, '600519', '000858'), result('000002', -0.5, '00700'),
+        result('000003', 0.3, 'AAPL'), result('000004', 0.1)]
+
+
+def at(market, *args):
+    return datetime(*args, tzinfo=TIMEZONES[market])
+
+
+def codes(results):
+    return [item['基金代码'] for item in results]
+
+
+def test_trading_results_follow_the_holdings_markets():
+    # Thursday 2026-01-15
+    assert codes(trading_results(BOOK, at('a', 2026, 1, 15, 10, 0))) == ['000001', '000002', '000004']
+    # A-shares at lunch, Hong Kong still trading until 12:00
+    assert codes(trading_results(BOOK, at('a', 2026, 1, 15, 11, 45))) == ['000002']
+    assert codes(trading_results(BOOK, at('us', 2026, 1, 15, 10, 0))) == ['000003']
+    # Saturday, and A-share holiday
+    assert trading_results(BOOK, at('a', 2026, 1, 17, 10, 0)) == []
+    assert codes(trading_results(BOOK, at('a', 2026, 2, 17, 10, 0))) == []
+
+
+def test_append_and_read_points(db_path):
+    append_points(BOOK[:2], now=datetime(2026, 1, 15, 10, 0), db_path=db_path)
+    append_points([result('000001', 1.2, '600519')], now=datetime(2026, 1, 15, 10, 0, 40), db_path=db_path)
+    append_points([result('000001', 1.5, '600519'), dict(result('000002', None), 状态='失败')],
+                  now=datetime(2026, 1, 15, 10, 1), db_path=db_path)
+
+    points = read_intraday('000001', '2026-01-15', db_path=db_path)
+    # Same minute overwrites
+    assert points.values.tolist() == [['10:00', 1.2], ['10:01', 1.5]]
+    assert read_intraday('000002', '2026-01-15', db_path=db_path).values.tolist() == [['10:00', -0.5]]
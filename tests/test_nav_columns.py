@@ -0,0 +1,78 @@
+import json
+import os
+
+import numpy as np
+
+from src.db import transaction
+from src.nav_columns import (NavColumns, columns_dir, from_days, rebuild, to_days, write_fund,
+                             write_series)
+
+
+def read(store, code, start=None, end=None):
+    days, navs = store.read_range(code, None if start is None else int(to_days([start])[0]),
+                                  None if end is None else int(to_days([end])[0]))
+    return [str(d) for d in from_days(days)], navs.tolist()
+
+
+def index(db_path):
+    with open(os.path.join(columns_dir(db_path), 'index.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_day_numbers_round_trip():
+    days = to_days(['1970-01-02', '2026-01-16'])
+    assert days.dtype == np.int32 and days[0] == 1
+    assert [str(d) for d in from_days(days)] == ['1970-01-02', '2026-01-16']
+
+
+def test_append_sorts_and_slices_ranges(db_path):
+    write_series({'000001': (['2026-01-07', '2026-01-05', '2026-01-06'], [1.2, 1.0, 1.1]),
+                  '000002': (['2026-01-05'], [2.0])}, db_path)
+    store = NavColumns(columns_dir(db_path))
+
+    assert '000001' in store and '000003' not in store
+    assert read(store, '000001') == (['2026-01-05', '2026-01-06', '2026-01-07'], [1.0, 1.1, 1.2])
+    assert read(store, '000001', start='2026-01-06') == (['2026-01-06', '2026-01-07'], [1.1, 1.2])
+    assert read(store, '000001', end='2026-01-05') == (['2026-01-05'], [1.0])
+    assert read(store, '000001', start='2026-01-08') == ([], [])
+    assert store.read_range('000003') is None
+
+    # Rewriting a fund appends a new segment; readers remap and the other fund is untouched
+    write_series({'000001': (['2026-01-05', '2026-01-06', '2026-01-07', '2026-01-08'], [1.0, 1.1, 1.2, 1.3])},
+                 db_path)
+    assert read(store, '000001')[1] == [1.0, 1.1, 1.2, 1.3]
+    assert read(store, '000002') == (['2026-01-05'], [2.0])
+    assert index(db_path)['size'] == 8
+
+
+def test_compacts_once_garbage_outweighs_live_rows(db_path):
+    dates = ['2026-01-05', '2026-01-06']
+    write_series({'000001': (dates, [1.0, 1.1]), '000002': (dates, [2.0, 2.1])}, db_path)
+    store = NavColumns(columns_dir(db_path))
+    read(store, '000001')
+    for nav in (1.2, 1.3):
+        write_series({'000001': (dates, [1.0, nav])}, db_path)
+    # 8 rows on file for 4 live ones: not yet more than COMPACT_RATIO times
+    assert (index(db_path)['gen'], index(db_path)['size']) == (0, 8)
+
+    write_series({'000001': (dates, [1.0, 1.4])}, db_path)
+    compacted = index(db_path)
+    assert (compacted['gen'], compacted['size']) == (1, 4)
+    assert sorted(os.listdir(columns_dir(db_path))) == ['days.1.i4', 'index.json', 'lock', 'nav.1.f8']
+    assert read(store, '000001')[1] == [1.0, 1.4]
+    assert read(store, '000002')[1] == [2.0, 2.1]
+
+
+def test_mirrors_sqlite(db_path):
+    with transaction(db_path) as conn:
+        conn.executemany('INSERT INTO fund_nav_history VALUES (?, ?, ?)',
+                         [('000001', '2026-01-06', 1.1), ('000001', '2026-01-05', 1.0), ('000002', '2026-01-05', 2.0)])
+    assert write_fund('000001', db_path)
+    assert not write_fund('000003', db_path)
+    store = NavColumns(columns_dir(db_path))
+    assert read(store, '000001') == (['2026-01-05', '2026-01-06'], [1.0, 1.1])
+    assert '000002' not in store
+
+    assert rebuild(db_path) == 2
+    assert index(db_path)['gen'] == 1
+    assert read(store, '000002') == (['2026-01-05'], [2.0])
@@ -0,0 +1,28 @@
+import pytest
+
+from src import pipeline
+
+PRICES = {'sh600519': {'name': '贵州茅台', 'price': 1500.0, 'change': 2.0}}
+
+
+def test_bad_holdings_fail_only_their_fund(monkeypatch):
+    holdings_map = {
+        '000001': ('好基金', [{'code': 'sh600519', 'name': '贵州茅台', 'weight': 10.0}], '2026-06-30'),
+        '000002': ('坏基金', [{'code': 'sh600519', 'name': '贵州茅台', 'weight': None}], '2026-06-30'),
+        '000003': ('缺代码', [{'name': '未知', 'weight': 5.0}], '2026-06-30'),
+    }
+
+    async def resolve_all_holdings(codes, progress_callback=None):
+        return holdings_map
+
+    async def fetch_quotes(codes):
+        return PRICES
+
+    monkeypatch.setattr(pipeline, 'resolve_all_holdings', resolve_all_holdings)
+    monkeypatch.setattr(pipeline, 'fetch_quotes', fetch_quotes)
+
+    good, *bad = pipeline.refresh_funds([('000001', 1000.0), ('000002', 500.0), ('000003', 100.0)])
+    assert good['状态'] == '成功'
+    assert good['估算涨跌'] == pytest.approx(2.0)
+    assert good['估算收益'] == pytest.approx(20.0)
+    assert [item['状态'][:5] for item in bad] == ['Error', 'Error']
@@ -0,0 +1,35 @@
+from src.db import connection
+from src.quote_store import ACCESS_RESOLUTION, evict_quotes, load_quotes, save_quotes
+
+QUOTE = {'name': '贵州茅台', 'price': 1500.0, 'change': 1.2}
+
+
+def accessed_at(db_path, code):
+    with connection(db_path) as conn:
+        return conn.execute('SELECT accessed_at FROM quote_cache WHERE code = ?', (code,)).fetchone()[0]
+
+
+def test_hits_only_touch_entries_older_than_the_resolution(db_path):
+    save_quotes({'sh600519': QUOTE}, now=1000.0, db_path=db_path)
+
+    hit = load_quotes(['sh600519', 'sh600000'], max_age=3600, now=1010.0, db_path=db_path)
+    assert hit == {'sh600519': dict(QUOTE, as_of=1000.0)}
+    assert accessed_at(db_path, 'sh600519') == 1000.0
+
+    later = 1000.0 + ACCESS_RESOLUTION + 1
+    load_quotes(['sh600519'], max_age=3600, now=later, db_path=db_path)
+    assert accessed_at(db_path, 'sh600519') == later
+
+    # Too old for max_age: not served, not touched
+    assert load_quotes(['sh600519'], max_age=10, now=later + 20, db_path=db_path) == {}
+
+
+def test_evicts_least_recently_used(db_path):
+    save_quotes({'sh600000': QUOTE}, now=1000.0, db_path=db_path)
+    save_quotes({'sh600001': QUOTE}, now=2000.0, db_path=db_path)
+    save_quotes({'sh600002': QUOTE}, now=3000.0, db_path=db_path)
+    load_quotes(['sh600000'], max_age=10 ** 6, now=3000.0 + ACCESS_RESOLUTION, db_path=db_path)
+
+    assert evict_quotes(max_entries=2, db_path=db_path) == 1
+    assert set(load_quotes(['sh600000', 'sh600001', 'sh600002'], max_age=10 ** 6, now=4000.0,
+                           db_path=db_path)) == {'sh600000', 'sh600002'}
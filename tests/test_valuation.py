@@ -0,0 +1,38 @@
+import pytest
+
+from src.valuation import estimate_nav_change, estimate_nav_changes
+
+PRICES = {
+    'sh600519': {'name': '贵州茅台', 'price': 1500.0, 'change': 2.0},
+    'rt_hk00700': {'name': '腾讯控股', 'price': 400.0, 'change': -1.0},
+}
+
+HOLDINGS = [
+    {'code': 'sh600519', 'name': '贵州茅台', 'weight': 6.0, 'fetch_code': None},
+    {'code': '00700', 'name': '腾讯控股', 'weight': 4.0, 'fetch_code': 'rt_hk00700'},
+    {'code': 'sz000001', 'name': '平安银行', 'weight': 2.0},
+]
+
+
+def test_missing_fetch_code_falls_back_to_code():
+    single = estimate_nav_change(HOLDINGS, PRICES)
+    assert single['total_weight_used'] == pytest.approx(10.0)
+    assert single['estimated_change'] == pytest.approx((6.0 * 2.0 - 4.0 * 1.0) / 10.0)
+
+    batch = estimate_nav_changes({'000001': HOLDINGS}, PRICES)['000001']
+    assert batch['estimated_change'] == pytest.approx(single['estimated_change'])
+    assert batch['total_weight_used'] == pytest.approx(single['total_weight_used'])
+    assert [d['change'] for d in batch['details']] == [d['change'] for d in single['details']]
+
+
+def test_unquoted_book_estimates_zero():
+    result = estimate_nav_changes({'000001': HOLDINGS, '000002': []}, {})
+    assert result['000001']['estimated_change'] == 0.0
+    assert result['000002'] == {'estimated_change': 0.0, 'total_weight_used': 0.0, 'details': [],
+                                'quotes_as_of': None, 'stale_quotes': 0}
+
+
+def test_weight_matrix_rejects_missing_weights():
+    from src.valuation import build_weight_matrix
+    with pytest.raises(ValueError):
+        build_weight_matrix({'000001': [{'code': 'sh600519', 'weight': None}]})